@@ -0,0 +1,55 @@
+"""Chroma resampling micro-benchmark.
+
+Times 4:2:0 -> 4:4:4 upsampling and 4:4:4 -> 4:2:0 downsampling of one chroma
+plane for every filter in ``utils.sample.FILTERS``, writing into preallocated
+buffers the way the converters can.
+
+    python benchmarks/chroma.py [--width 1920] [--height 1080] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.sample import FILTERS, downsample_plane, upsample_plane  # noqa: E402
+
+
+def best_of(fn, repeat: int) -> float:
+    fn()  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    w, h = args.width, args.height
+    rng = np.random.default_rng(0)
+    half = rng.random((h // 2, w // 2), dtype=np.float32)
+    full = rng.random((h, w), dtype=np.float32)
+    up_out = np.empty((h, w), dtype=np.float32)
+    down_out = np.empty((h // 2, w // 2), dtype=np.float32)
+
+    print(f"{w}x{h} float32, best of {args.repeat}")
+    print(f"{'filter':12} {'up ms':>8} {'down ms':>8} {'up ns/px':>9}")
+    for name in FILTERS:
+        up = best_of(lambda: upsample_plane(half, w, h, name, out=up_out), args.repeat)
+        down = best_of(lambda: downsample_plane(full, name, out=down_out), args.repeat)
+        print(f"{name:12} {up * 1e3:8.2f} {down * 1e3:8.2f} {up * 1e9 / (w * h):9.2f}")
+
+
+if __name__ == "__main__":
+    main()
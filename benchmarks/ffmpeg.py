@@ -0,0 +1,234 @@
+"""Head-to-head benchmark against the equivalent FFmpeg zscale filter graphs.
+
+Runs every conversion that applies to the clip's format twice, once with
+``main.py`` and once with the FFmpeg graph used for ``output/ffmpeg`` (see the
+README), both as child processes with the same encoder settings. It reports
+wall time, CPU time, fps and peak RSS of each, plus the PSNR of our output
+against FFmpeg's. Without an ffmpeg binary only our side is timed, and PSNR is
+taken against ``output/ffmpeg/<command>.mp4`` when that file exists.
+
+    python benchmarks/ffmpeg.py -i test_hlg.mp4 [--commands hlg2sdr,hlg2pq]
+        [--ffmpeg PATH] [--batch-size N] [--threads N] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import av
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from converter import HLG, PQ, SDR  # noqa: E402
+from converter.fanout import detect_format  # noqa: E402
+from utils import read_plane  # noqa: E402
+from utils.metrics import psnr  # noqa: E402
+
+# Source and destination format of every command
+COMMANDS = {
+    "sdr2pq": (SDR, PQ),
+    "sdr2hlg": (SDR, HLG),
+    "pq2sdr": (PQ, SDR),
+    "hlg2sdr": (HLG, SDR),
+    "pq2hlg": (PQ, HLG),
+    "hlg2pq": (HLG, PQ),
+}
+
+# The graphs the reference outputs in output/ffmpeg were made with
+FILTERS = {
+    "sdr2pq": "format=gbrpf32le,zscale=tin=bt709:pin=bt709:t=smpte2084:p=bt2020"
+    ":m=bt2020nc,format=yuv420p10le",
+    "sdr2hlg": "format=gbrpf32le,zscale=tin=bt709:pin=bt709:t=arib-std-b67"
+    ":p=bt2020:m=bt2020nc,format=yuv420p10le",
+    "pq2sdr": "zscale=t=linear:npl=100,format=gbrpf32le,zscale=p=bt709,"
+    "zscale=t=bt709:m=bt709:r=tv,format=yuv420p",
+    "hlg2sdr": "zscale=t=linear:npl=100,format=gbrpf32le,zscale=p=bt709,"
+    "zscale=t=bt709:m=bt709:r=tv,format=yuv420p",
+    "pq2hlg": "zscale=t=arib-std-b67",
+    "hlg2pq": "zscale=t=smpte2084",
+}
+
+# Same encoders and settings as VideoConverter._get_encoder_options
+ENCODERS = {
+    8: ["-c:v", "libx264", "-crf", "20", "-preset", "fast"],
+    10: ["-c:v", "libx265", "-crf", "20", "-preset", "fast", "-tag:v", "hvc1"],
+}
+
+
+def run(args) -> dict:
+    """Run a child process; return its wall time, CPU time and peak RSS."""
+    # A file rather than a pipe: nothing reads stderr until the child exits
+    with tempfile.TemporaryFile() as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=log)
+        # wait4 reports the resource usage of this child alone
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode:
+            log.seek(0)
+            stderr = log.read().decode(errors="replace")
+            raise RuntimeError(f"{' '.join(args)} failed:\n{stderr[-2000:]}")
+    return {
+        "wall_s": wall,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": usage.ru_maxrss / 1024.0,
+    }
+
+
+def read_frames(path: str, bit_depth: int):
+    """Yield the Y/U/V planes of every frame of a video."""
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        for frame in container.decode(stream):
+            yield tuple(
+                read_plane(plane, plane.width, plane.height, bit_depth)
+                for plane in frame.planes
+            )
+
+
+def compare(path: str, reference: str, bit_depth: int) -> tuple:
+    """Mean Y/U/V PSNR of ``path`` against ``reference``."""
+    peak = float((1 << bit_depth) - 1)
+    totals = np.zeros(3)
+    frames = 0
+    for planes, ref in zip(
+        read_frames(path, bit_depth), read_frames(reference, bit_depth)
+    ):
+        # Identical planes count as 100 dB so one frame can't make the mean inf
+        totals += [min(psnr(a, b, peak), 100.0) for a, b in zip(planes, ref)]
+        frames += 1
+    return tuple(totals / max(frames, 1))
+
+
+def probe(path: str) -> tuple:
+    """(width, height, frame count) of a video."""
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        frames = stream.frames or sum(
+            1 for packet in container.demux(stream) if packet.size
+        )
+        return stream.width, stream.height, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-i", "--input", required=True, help="Clip to convert")
+    parser.add_argument(
+        "--commands",
+        help="Comma-separated conversions (default: all from the clip's format)",
+    )
+    parser.add_argument(
+        "--ffmpeg",
+        default=shutil.which("ffmpeg"),
+        help="ffmpeg binary (default: ffmpeg on PATH)",
+    )
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    input_path = os.path.abspath(args.input)
+    with av.open(input_path) as container:
+        src = detect_format(container.streams.video[0])
+    if args.commands:
+        commands = [c.strip() for c in args.commands.split(",") if c.strip()]
+        unknown = [c for c in commands if c not in COMMANDS]
+        if unknown:
+            parser.error(f"unknown commands: {', '.join(unknown)}")
+    else:
+        commands = [c for c, (s, _) in COMMANDS.items() if s == src]
+    if not args.ffmpeg:
+        print("ffmpeg not found: timing main.py only")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for command in commands:
+            dst = COMMANDS[command][1]
+            ours = os.path.join(tmp, f"{command}.mp4")
+            row = {"command": command}
+            row["ours"] = run(
+                [
+                    sys.executable,
+                    "main.py",
+                    command,
+                    "-i",
+                    input_path,
+                    "-o",
+                    ours,
+                    "--batch-size",
+                    str(args.batch_size),
+                    "--threads",
+                    str(args.threads),
+                ]
+            )
+            width, height, frames = probe(ours)
+
+            reference = os.path.join(ROOT, "output", "ffmpeg", f"{command}.mp4")
+            if args.ffmpeg:
+                reference = os.path.join(tmp, f"{command}_ffmpeg.mp4")
+                row["ffmpeg"] = run(
+                    [
+                        args.ffmpeg,
+                        "-nostdin",
+                        "-y",
+                        "-i",
+                        input_path,
+                        "-vf",
+                        FILTERS[command],
+                        *ENCODERS[dst.bit_depth],
+                        "-an",
+                        reference,
+                    ]
+                )
+            for side in ("ours", "ffmpeg"):
+                if side in row:
+                    row[side]["fps"] = frames / row[side]["wall_s"]
+
+            row["frames"] = frames
+            row["psnr_yuv"] = None
+            # A stored reference may come from a different clip
+            if os.path.exists(reference) and probe(reference) == (
+                width,
+                height,
+                frames,
+            ):
+                row["psnr_yuv"] = compare(ours, reference, dst.bit_depth)
+            results.append(row)
+
+    print(
+        f"{'command':8} {'tool':7} {'wall s':>8} {'cpu s':>8} {'fps':>7} "
+        f"{'rss MB':>8}  PSNR Y/U/V vs FFmpeg (dB)"
+    )
+    for row in results:
+        for side in ("ours", "ffmpeg"):
+            if side not in row:
+                continue
+            r = row[side]
+            quality = ""
+            if side == "ours" and row["psnr_yuv"] is not None:
+                quality = "/".join(f"{p:.2f}" for p in row["psnr_yuv"])
+            print(
+                f"{row['command']:8} {side:7} {r['wall_s']:8.2f} {r['cpu_s']:8.2f} "
+                f"{r['fps']:7.2f} {r['peak_rss_mb']:8.1f}  {quality}"
+            )
+        if "ffmpeg" in row:
+            ratio = row["ours"]["wall_s"] / row["ffmpeg"]["wall_s"]
+            print(f"{'':8} {'ratio':7} {ratio:7.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Startup-time guard for commands that don't convert anything.
+
+Runs each command once under ``python -X importtime`` to check that none of the
+heavy modules are imported, then several more times to check that the best wall
+time stays within a budget on top of a bare interpreter start. Exits non-zero
+on failure.
+
+    python benchmarks/startup.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ["list"],
+    ["--help"],
+    ["hlg2sdr", "--help"],
+    ["submit", "--help"],
+]
+
+HEAVY_MODULES = ("av", "numpy", "asyncio", "multiprocessing")
+
+
+def wall_time(args) -> float:
+    """Run one interpreter and return its wall time in seconds."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def imported_modules(args) -> set:
+    """Names of every module imported by one interpreter run."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # import time: self [us] | cumulative | imported package
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=50.0,
+        help="Allowed time over a bare interpreter start (default: 50)",
+    )
+    args = parser.parse_args()
+
+    baseline = min(wall_time(["-c", "pass"]) for _ in range(args.runs))
+    print(f"{'python -c pass':28} {baseline * 1000:7.1f} ms")
+
+    failed = False
+    for command in COMMANDS:
+        modules = imported_modules(["main.py", *command])
+        heavy = sorted(m for m in HEAVY_MODULES if m in modules)
+        best = min(wall_time(["main.py", *command]) for _ in range(args.runs))
+        over = (best - baseline) * 1000
+
+        status = "ok"
+        if heavy:
+            status = f"FAIL imports {', '.join(heavy)}"
+            failed = True
+        elif over > args.budget_ms:
+            status = f"FAIL over budget ({args.budget_ms:.0f} ms)"
+            failed = True
+        label = "main.py " + " ".join(command)
+        print(f"{label:28} {best * 1000:7.1f} ms  (+{over:.1f} ms)  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
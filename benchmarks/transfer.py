@@ -0,0 +1,127 @@
+"""Transfer-function micro-benchmark.
+
+Reports the per-pixel cost of every EOTF/OETF in ``utils.transfer`` on a
+float32 RGB frame, next to the previous implementations (mask gathers and
+two-branch ``np.where``, kept below as ``BEFORE``) and the in-place ``out=``
+form, and checks that the results agree.
+
+    python benchmarks/transfer.py [--width 1920] [--height 1080] [--repeat 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import transfer  # noqa: E402
+
+# === Previous implementations ===
+
+
+def _eotf_sdr(v, Lw=1.0, Lb=0.0, gamma=2.40):
+    v = np.clip(v, 0, 1)
+    Lw_g = Lw ** (1 / gamma)
+    Lb_g = Lb ** (1 / gamma)
+    a = (Lw_g - Lb_g) ** gamma
+    b = Lb_g / (Lw_g - Lb_g)
+    return a * np.maximum(v + b, 0) ** gamma
+
+
+def _eotf_pq(v):
+    m1, m2 = transfer.PQ_M1, transfer.PQ_M2
+    c1, c2, c3 = transfer.PQ_C1, transfer.PQ_C2, transfer.PQ_C3
+    v = np.clip(v, 0, 1)
+    v_p = np.maximum(v ** (1.0 / m2) - c1, 0)
+    denom = c2 - c3 * v ** (1.0 / m2)
+    return np.clip((v_p / denom) ** (1.0 / m1), 0, 1)
+
+
+def _eotf_hlg(v):
+    a = 0.17883277
+    b = 1 - 4 * a
+    c = 0.5 - a * np.log(4 * a)
+    v = np.clip(v, 0, 1)
+    L = np.where(v <= 0.5, (v**2) / 3.0, (np.exp((v - c) / a) + b) / 12.0)
+    return np.clip(L, 0, 1)
+
+
+def _oetf_sdr(L):
+    L = np.clip(L, 0, 1)
+    return np.where(L < 0.018, 4.5 * L, 1.099 * (L**0.45) - 0.099)
+
+
+def _oetf_pq(L):
+    m1, m2 = transfer.PQ_M1, transfer.PQ_M2
+    c1, c2, c3 = transfer.PQ_C1, transfer.PQ_C2, transfer.PQ_C3
+    L_p = np.clip(L, 0, 1) ** m1
+    return ((c1 + c2 * L_p) / (1 + c3 * L_p)) ** m2
+
+
+def _oetf_hlg(L):
+    a = 0.17883277
+    b = 1.0 - (4.0 * a)
+    c = 0.5 - a * np.log(4.0 * a)
+    hlg_out = np.zeros_like(L)
+    mask_low = L <= (1.0 / 12.0)
+    hlg_out[mask_low] = np.sqrt(3.0 * L[mask_low])
+    mask_high = ~mask_low
+    val_high = np.maximum(L[mask_high], 1e-9)
+    hlg_out[mask_high] = a * np.log(12.0 * val_high - b) + c
+    return hlg_out
+
+
+BEFORE = {
+    "eotf_sdr": _eotf_sdr,
+    "eotf_pq": _eotf_pq,
+    "eotf_hlg": _eotf_hlg,
+    "oetf_sdr": _oetf_sdr,
+    "oetf_pq": _oetf_pq,
+    "oetf_hlg": _oetf_hlg,
+}
+
+
+def best_of(fn, repeat: int) -> float:
+    fn()  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Cover both segments of every piecewise curve
+    rgb = rng.random((args.height, args.width, 3), dtype=np.float32)
+    out = np.empty_like(rgb)
+    pixels = args.width * args.height
+
+    print(f"{args.width}x{args.height}x3 float32, best of {args.repeat}, ns/pixel")
+    print(
+        f"{'function':10} {'before':>8} {'after':>8} {'out=':>8} {'speedup':>8} {'max err':>9}"
+    )
+    for name, before in BEFORE.items():
+        after = getattr(transfer, name)
+        t_before = best_of(lambda: before(rgb), args.repeat)
+        t_after = best_of(lambda: after(rgb), args.repeat)
+        t_out = best_of(lambda: after(rgb, out=out), args.repeat)
+        err = np.abs(after(rgb).astype(np.float64) - before(rgb)).max()
+        print(
+            f"{name:10} {t_before * 1e9 / pixels:8.2f} {t_after * 1e9 / pixels:8.2f} "
+            f"{t_out * 1e9 / pixels:8.2f} {t_before / t_out:7.2f}x {err:9.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
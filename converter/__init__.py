@@ -1,13 +1,34 @@
-from .base import HLG, PQ, SDR, Format, Primaries, Transfer
-from .converters import (
-    HLG2PQ,
-    HLG2SDR,
-    PQ2HLG,
-    PQ2SDR,
-    SDR2HLG,
-    SDR2PQ,
-    Rewrap,
-)
+import importlib
+
+from .formats import HLG, PIX_FMTS, PQ, SDR, Format, Primaries, Transfer
+
+# Converters pull in av, numpy and the pixel math, so they are only imported on
+# first access. Metadata-only commands (list, --help, job submission) stay fast.
+_LAZY = {
+    "SDR2PQ": ".converters",
+    "SDR2HLG": ".converters",
+    "PQ2SDR": ".converters",
+    "HLG2SDR": ".converters",
+    "PQ2HLG": ".converters",
+    "HLG2PQ": ".converters",
+    "Rewrap": ".converters",
+    "FanOut": ".fanout",
+    "QualityMetrics": ".metrics",
+    "Preview": ".preview",
+    "OutputCache": ".cache",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module = importlib.import_module(_LAZY[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted([*globals(), *_LAZY])
+
 
 __all__ = [
     "Format",
@@ -16,6 +37,7 @@ __all__ = [
     "HLG",
     "Transfer",
     "Primaries",
+    "PIX_FMTS",
     "SDR2PQ",
     "SDR2HLG",
     "PQ2SDR",
@@ -23,4 +45,8 @@ __all__ = [
     "PQ2HLG",
     "HLG2PQ",
     "Rewrap",
+    "FanOut",
+    "QualityMetrics",
+    "Preview",
+    "OutputCache",
 ]
@@ -0,0 +1,256 @@
+import json
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils import quantize
+
+from .media import DEFAULT_RATE, StreamInfo
+
+# === Per-host profile ===
+
+# Overrides the profile path, e.g. to share one profile between identical hosts
+PROFILE_ENV = "HDR_CONVERTER_PROFILE"
+
+# Execution options a profile entry sets, with the values used without one
+DEFAULTS = {"batch_size": 1, "threads": 1}
+
+# A candidate must be this much faster than the best so far to replace it, so
+# timing noise doesn't pick options that change nothing
+MIN_SPEEDUP = 1.03
+
+# Batches above this many pixels only cost memory: batching pays off on small
+# frames, where per-call overhead dominates (4 x 1080p)
+MAX_BATCH_PIXELS = 4 * 1920 * 1080
+
+# Profiles already read by this process, by path: a run or service worker reads
+# its profile once, not on every ``process`` call
+_loaded = {}
+
+
+def profile_path() -> str:
+    """Where this host's profile lives.
+
+    The host name is part of the file name, so hosts sharing a home directory
+    keep profiles of their own.
+    """
+    if os.environ.get(PROFILE_ENV):
+        return os.environ[PROFILE_ENV]
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(
+        cache, "hdr-sdr-converter", f"autotune-{socket.gethostname()}.json"
+    )
+
+
+def load_profile(path: str | None = None) -> dict:
+    """The profile at ``path`` (default: ``profile_path()``); empty when missing.
+
+    An unreadable profile is reported and ignored rather than failing a
+    conversion.
+    """
+    path = path or profile_path()
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring autotune profile {path}: {e}")
+        return {}
+    return profile if isinstance(profile, dict) else {}
+
+
+def save_profile(entries: dict, path: str | None = None) -> str:
+    """Merge ``{converter: {"WxH": entry}}`` into the profile; return its path."""
+    path = path or profile_path()
+    profile = load_profile(path)
+    merged = profile.get("converters", {})
+    for name, sizes in entries.items():
+        merged.setdefault(name, {}).update(sizes)
+    profile.update(
+        {
+            "host": socket.gethostname(),
+            "cpu_count": os.cpu_count(),
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "converters": merged,
+        }
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Replace in one step, so a running conversion never reads half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+    _loaded.pop(path, None)
+    return path
+
+
+def tuned_options(name: str, width: int, height: int, profile=None) -> dict:
+    """Tuned execution options of converter ``name`` for ``width`` x ``height``.
+
+    The entry of the closest calibrated size (by pixel count) is used; an
+    empty dict when the converter was never calibrated. Without ``profile``,
+    this host's profile is read on first use and kept for the process.
+    """
+    if profile is None:
+        path = profile_path()
+        if path not in _loaded:
+            _loaded[path] = load_profile(path)
+        profile = _loaded[path]
+    sizes = profile.get("converters", {}).get(name)
+    if not sizes:
+        return {}
+
+    def distance(size):
+        w, h = (int(n) for n in size.split("x"))
+        return abs(np.log((w * h) / (width * height)))
+
+    entry = sizes[min(sizes, key=distance)]
+    return {key: entry[key] for key in DEFAULTS if key in entry}
+
+
+# === Calibration ===
+
+
+def synthetic_planes(fmt, width: int, height: int, frames: int):
+    """Stacked (N, H, W) float32 Y/U/V code values of a moving test pattern.
+
+    Ramps, noise and small highlights cover the whole signal range, so every
+    branch of the transfer curves and the clipping is exercised.
+    """
+    rng = np.random.default_rng(0)
+    sx, sy = fmt.subsampling
+    cw, ch = width // sx, height // sy
+    ramp = np.linspace(0.0, 1.0, width, dtype=np.float32)
+    shade = np.linspace(0.3, 1.0, height, dtype=np.float32)[:, None]
+    cx = np.linspace(0.0, 2.0 * np.pi, cw, dtype=np.float32)
+    cy = np.linspace(0.0, np.pi, ch, dtype=np.float32)[:, None]
+
+    y, u, v = [], [], []
+    for i in range(frames):
+        luma = np.roll(ramp, i * width // (4 * frames)) * shade
+        luma = luma + rng.normal(0.0, 0.02, (height, width)).astype(np.float32)
+        # A few peak-white specks
+        spots = rng.integers(0, height * width, size=height * width // 500)
+        luma.flat[spots] = 1.0
+        phase = np.float32(i / max(frames, 1))
+        chroma_u = 0.5 + 0.35 * np.sin(cx + phase) * np.cos(cy)
+        chroma_v = 0.5 + 0.35 * np.cos(cx - phase) * np.sin(cy)
+        planes = (np.clip(luma, 0.0, 1.0), chroma_u, chroma_v)
+        for out, plane in zip((y, u, v), quantize(*planes, fmt.bit_depth)):
+            out.append(plane.astype(np.float32))
+    return tuple(np.stack(p) for p in (y, u, v))
+
+
+def measure(conv, planes, w, h, batch_size: int, threads: int, repeat: int = 2):
+    """Best-of-``repeat`` frames per second of converting ``planes``.
+
+    Runs the same batch and row-band path as ``process``, without decoding or
+    encoding.
+    """
+    y, u, v = planes
+    pool = ThreadPoolExecutor(threads) if threads > 1 else None
+    best = float("inf")
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for i in range(0, y.shape[0], batch_size):
+                batch = (p[i : i + batch_size] for p in (y, u, v))
+                if pool is None:
+                    conv._convert_planes(*batch, w, h)
+                else:
+                    conv._convert_bands(*batch, w, h, pool, threads)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return y.shape[0] / best
+
+
+def _powers_of_two(limit: int) -> list:
+    values = [1]
+    while values[-1] * 2 <= limit:
+        values.append(values[-1] * 2)
+    if values[-1] != limit:
+        values.append(limit)
+    return values
+
+
+def calibrate(
+    conv_cls,
+    width: int,
+    height: int,
+    frames: int = 8,
+    cpus: int | None = None,
+    repeat: int = 2,
+) -> dict:
+    """Fastest execution options of ``conv_cls`` at ``width`` x ``height``.
+
+    Options are searched one at a time (threads, then batch size), each
+    keeping the best value found so far. Both only change how frames are
+    split up, never the output, so every candidate is exact.
+    """
+    cpus = cpus or os.cpu_count() or 1
+
+    conv = conv_cls(os.devnull, os.devnull)
+    fmt = conv.src_format
+    conv._use_input(StreamInfo(width, height, DEFAULT_RATE, frames, fmt.pix_fmt))
+    planes = synthetic_planes(conv.input_format, width, height, frames)
+    baseline = measure(conv, planes, width, height, 1, 1, repeat)
+    best = {**DEFAULTS, "fps": baseline}
+
+    def attempt(candidate):
+        fps = measure(
+            conv,
+            planes,
+            width,
+            height,
+            candidate["batch_size"],
+            candidate["threads"],
+            repeat,
+        )
+        if fps > best["fps"] * MIN_SPEEDUP:
+            best.update(candidate, fps=fps)
+
+    for threads in _powers_of_two(cpus)[1:]:
+        attempt({**best, "threads": threads})
+    for batch_size in (2, 4, 8):
+        if batch_size > frames or batch_size * width * height > MAX_BATCH_PIXELS:
+            break
+        attempt({**best, "batch_size": batch_size})
+
+    return {**best, "baseline_fps": baseline}
+
+
+def autotune(
+    converters: dict,
+    sizes: list,
+    frames: int = 8,
+    path: str | None = None,
+) -> str:
+    """Calibrate every converter at every size and store the results.
+
+    Parameters:
+        converters: mapping of command name to converter class
+        sizes: (width, height) pairs to calibrate
+        frames: synthetic frames converted per measurement
+        path: profile to update (default: ``profile_path()``)
+
+    Returns:
+        The path of the updated profile
+    """
+    entries = {}
+    print(f"{'command':8} {'size':>9} {'threads':>7} {'batch':>5} {'fps':>7}  speedup")
+    for name, conv_cls in converters.items():
+        for width, height in sizes:
+            entry = calibrate(conv_cls, width, height, frames)
+            entries.setdefault(conv_cls.__name__, {})[f"{width}x{height}"] = entry
+            speedup = entry["fps"] / entry["baseline_fps"]
+            print(
+                f"{name:8} {f'{width}x{height}':>9} {entry['threads']:7} "
+                f"{entry['batch_size']:5} {entry['fps']:7.2f}  {speedup:.2f}x"
+            )
+    return save_profile(entries, path)
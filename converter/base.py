@@ -1,52 +1,102 @@
 import os
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 
 import av
 import numpy as np
 
 from utils import (
-    read_plane_8bit,
-    read_plane_10bit,
-    write_plane_8bit,
-    write_plane_10bit,
+    ContentLightLevel,
+    compose,
+    downsample_chroma,
+    eotf_hlg,
+    eotf_pq,
+    eotf_sdr,
+    normalize,
+    read_plane,
+    resize_chroma,
+    resize_plane,
+    upsample_chroma,
+    write_content_light_level,
+    write_plane,
 )
-
-
-class Transfer(Enum):
-    SDR = "bt709"
-    PQ = "smpte2084"
-    HLG = "arib-std-b67"
-
-
-class Primaries(Enum):
-    BT709 = "bt709"
-    BT2020 = "bt2020"
-
-
-@dataclass(frozen=True)
-class Format:
-    primaries: Primaries
-    transfer: Transfer
-    bit_depth: int
-
-    @property
-    def pix_fmt(self) -> str:
-        return "yuv420p10le" if self.bit_depth == 10 else "yuv420p"
-
-
-# Predefined formats
-SDR = Format(Primaries.BT709, Transfer.SDR, 8)
-PQ = Format(Primaries.BT2020, Transfer.PQ, 10)
-HLG = Format(Primaries.BT2020, Transfer.HLG, 10)
+from utils.sample import FILTERS
+
+from .autotune import DEFAULTS, tuned_options
+from .formats import PIX_FMTS, Format, Primaries, Transfer
+from .media import AVSource, RawFrame, open_input, open_writer
+from .memory import MemoryBudget
+
+
+def iter_batches(frames, batch_size):
+    """Group decoded frames into lists of up to ``batch_size`` same-size frames.
+
+    ``batch_size`` may also be a callable, asked for the size of every batch
+    before its frames are decoded.
+    """
+    frames = iter(frames)
+    carried = []
+    while True:
+        limit = batch_size() if callable(batch_size) else batch_size
+        batch, carried = carried, []
+        for frame in frames:
+            # Frames of different size can't share a batch
+            if batch and (frame.width, frame.height) != (
+                batch[0].width,
+                batch[0].height,
+            ):
+                carried = [frame]
+                break
+            batch.append(frame)
+            if len(batch) >= limit:
+                break
+        if not batch:
+            return
+        yield batch
+
+
+def _untracked(stage):
+    pass
 
 
 class VideoConverter(ABC):
     """Base class for video conversions."""
 
-    def __init__(self, input_path: str, output_path: str = None):
+    # MaxCLL/MaxFALL are measured on every n-th chroma sample of HDR outputs
+    # (1/64 of the pixels at 4), which is plenty for frame-level statistics
+    light_level_step = 4
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str = None,
+        chroma_filter: str = "bilinear",
+        scale: tuple | None = None,
+        pix_fmt: str | None = None,
+    ):
+        if pix_fmt is not None and pix_fmt not in PIX_FMTS:
+            raise ValueError(
+                f"Unsupported pixel format {pix_fmt}; expected one of "
+                f"{', '.join(PIX_FMTS)}"
+            )
         self.input_path = input_path
+        # Resampling filter for 4:2:0 <-> 4:4:4 and scaling, see utils.sample.FILTERS
+        self.chroma_filter = chroma_filter
+        if scale is not None:
+            width, height = scale
+            # 4:2:0 needs whole chroma samples
+            if width < 2 or height < 2 or width % 2 or height % 2:
+                raise ValueError(
+                    f"scale must be even and positive, got {width}x{height}"
+                )
+            scale = (width, height)
+        # Output (width, height); None keeps the input size
+        self.scale = scale
+        # Output chroma layout and bit depth, e.g. "yuv422p10le"; None keeps the
+        # input's chroma layout at the bit depth of dst_format
+        self.pix_fmt = pix_fmt
+        # src_format with the layout of the opened input, see _use_input
+        self._input_format = None
         if output_path is None:
             base, ext = os.path.splitext(input_path)
             output_dir = "../output"
@@ -57,6 +107,7 @@ class VideoConverter(ABC):
             )
 
         self.output_path = output_path
+        self.light_level = None
 
     @property
     @abstractmethod
@@ -68,89 +119,510 @@ class VideoConverter(ABC):
     def dst_format(self) -> Format:
         raise NotImplementedError
 
+    @property
+    def input_format(self) -> Format:
+        """``src_format`` with the chroma layout and bit depth of the input."""
+        return self._input_format or self.src_format
+
+    @property
+    def output_format(self) -> Format:
+        """``dst_format`` with the chroma layout and bit depth written."""
+        if self.pix_fmt is not None:
+            return self.dst_format.with_pix_fmt(self.pix_fmt)
+        return self.dst_format.replace(chroma=self.input_format.chroma)
+
+    def _use_input(self, input_stream):
+        """Take the chroma layout and bit depth of ``input_stream`` as input_format.
+
+        Raises ValueError for a pixel format ``Format`` can't describe.
+        """
+        self._input_format = self.src_format.with_pix_fmt(input_stream.pix_fmt)
+
+    def _apply_profile(self, width, height, batch_size, threads) -> tuple:
+        """Fill in the execution options left as None from the autotune profile.
+
+        Returns (batch_size, threads).
+        """
+        options = {"batch_size": batch_size, "threads": threads}
+        unset = [key for key, value in options.items() if value is None]
+        if not unset:
+            return batch_size, threads
+        w, h = self._output_size(width, height)
+        tuned = tuned_options(type(self).__name__, w, h)
+        taken = {key: tuned[key] for key in unset if key in tuned}
+        if taken:
+            listed = ", ".join(f"{key}={value}" for key, value in taken.items())
+            print(f"Autotune profile: {listed}")
+        options.update({key: DEFAULTS[key] for key in unset}, **taken)
+        return options["batch_size"], options["threads"]
+
     @abstractmethod
     def decode_to_linear(self, y, u, v, w, h) -> np.ndarray:
-        """Decode YUV to linear RGB."""
+        """Decode YUV to planar linear RGB, shaped (3, H, W) or (3, N, H, W)."""
         raise NotImplementedError
 
     @abstractmethod
     def encode_from_linear(self, rgb_linear) -> tuple:
-        """Encode linear RGB to YUV (y, u, v)."""
+        """Encode planar linear RGB to YUV (y, u, v) without modifying it."""
         raise NotImplementedError
 
     def _get_encoder_options(self) -> dict:
-        fmt = self.dst_format
-        if fmt.bit_depth == 10:
-            t = fmt.transfer.value
-            return {
-                "crf": "20",
-                "preset": "fast",
-                "x265-params": f"colorprim=bt2020:transfer={t}:colormatrix=bt2020nc",
-            }
-        return {
-            "crf": "20",
-            "preset": "fast",
-            "x264-params": "colorprim=bt709:transfer=bt709:colormatrix=bt709",
-        }
-
-    def process(self):
-        # PyAV allows accessing the raw 10-bit planes, not like OpenCV, which only supports up to 8-bit.
-        input_container = av.open(self.input_path)
-        input_stream = input_container.streams.video[0]
+        fmt = self.output_format
+        t = fmt.transfer.value
+        if fmt.primaries == Primaries.BT2020:
+            color = f"colorprim=bt2020:transfer={t}:colormatrix=bt2020nc"
+        else:
+            color = f"colorprim=bt709:transfer={t}:colormatrix=bt709"
+        # x265 for more than 8 bits, see _open_output
+        params = "x265-params" if fmt.bit_depth > 8 else "x264-params"
+        return {"crf": "20", "preset": "fast", params: color}
+
+    def _yuv_planes(self, y, u, v, w, h) -> np.ndarray:
+        """Stack normalized Y and upsampled U/V into planar (3, ..., h, w) data."""
+        planes = np.empty((3, *y.shape), dtype=y.dtype)
+        planes[0] = y
+        upsample_chroma(
+            u,
+            v,
+            w,
+            h,
+            self.chroma_filter,
+            out=(planes[1], planes[2]),
+            subsampling=self.input_format.subsampling,
+        )
+        return planes
+
+    def _downsample_chroma(self, u, v) -> tuple:
+        """Subsample 4:4:4 U/V planes to the chroma layout of the output."""
+        subsampling = self.output_format.subsampling
+        return downsample_chroma(u, v, self.chroma_filter, subsampling=subsampling)
+
+    def _output_size(self, w, h) -> tuple:
+        """Output frame size for a ``w`` x ``h`` input."""
+        return self.scale or (w, h)
+
+    def _resize_planes(self, y, u, v, w, h):
+        """Scale decoded planes to ``scale``; return them with the new size.
+
+        Scaling happens on the Y/U/V signal before ``decode_to_linear``, as
+        in FFmpeg's scale filter, so the transfer and tone-mapping math only
+        runs on the output pixels.
+        """
+        if self.scale is None or self.scale == (w, h):
+            return y, u, v, w, h
+        width, height = self.scale
+        y = resize_plane(y, width, height, self.chroma_filter)
+        u, v = resize_chroma(
+            u,
+            v,
+            width,
+            height,
+            self.chroma_filter,
+            subsampling=self.input_format.subsampling,
+        )
+        return y, u, v, width, height
+
+    def _read_planes(self, frame, fmt: Format | None = None):
+        """Read the Y/U/V planes of a decoded frame as float32 arrays.
+
+        ``fmt`` defaults to the input format.
+        """
+        if isinstance(frame, RawFrame):
+            return tuple(p.astype(np.float32) for p in frame.planes)
+        fmt = fmt or self.input_format
+        w, h = frame.width, frame.height
+        sx, sy = fmt.subsampling
+        uv_w, uv_h = w // sx, h // sy
+
+        y = read_plane(frame.planes[0], w, h, fmt.bit_depth)
+        u = read_plane(frame.planes[1], uv_w, uv_h, fmt.bit_depth)
+        v = read_plane(frame.planes[2], uv_w, uv_h, fmt.bit_depth)
+        return y, u, v
+
+    def _write_frame(self, y_out, u_out, v_out, w, h) -> av.VideoFrame:
+        """Build an output frame from quantized Y/U/V planes."""
+        fmt = self.output_format
+        sx, sy = fmt.subsampling
+        uv_w, uv_h = w // sx, h // sy
+        out_frame = av.VideoFrame(width=w, height=h, format=fmt.pix_fmt)
+
+        write_plane(out_frame.planes[0], y_out, w, h, fmt.bit_depth)
+        write_plane(out_frame.planes[1], u_out, uv_w, uv_h, fmt.bit_depth)
+        write_plane(out_frame.planes[2], v_out, uv_w, uv_h, fmt.bit_depth)
+        return out_frame
+
+    def _convert_planes(self, y, u, v, w, h):
+        rgb_linear = self.decode_to_linear(y, u, v, w, h)
+        return self.encode_from_linear(rgb_linear)
+
+    def _band_layout(self) -> tuple:
+        """(align, halo) of row bands: edges fall on multiples of ``align`` luma
+        rows, and each band reads ``halo`` units beyond them."""
+        in_sy = self.input_format.subsampling[1]
+        out_sy = self.output_format.subsampling[1]
+        align = max(in_sy, out_sy)
+        # Luma rows read by upsampling and then downsampling across an edge
+        halo = -(-(4 * FILTERS[self.chroma_filter][1] + 6) // align)
+        return align, halo
+
+    def _convert_bands(self, y, u, v, w, h, pool, bands, convert=None):
+        """Convert ``bands`` horizontal row bands of the planes on ``pool``.
+
+        Without a pool the bands are converted one after another, which only
+        bounds the working set to one band. Each band is converted with a halo
+        of extra rows on either side so the vertical chroma filters see the
+        same neighbours as in one whole-frame pass; the halo is then cropped
+        away. With vertically subsampled input or output chroma, band edges
+        fall on even luma rows so every band keeps whole chroma rows.
+
+        ``convert(y, u, v, w, h)`` (default: ``_convert_planes``) may return
+        several Y, U, V triples one after another, all in the chroma layout of
+        ``output_format``; the bands of each are joined in the same order.
+        """
+        convert = convert or self._convert_planes
+        in_sy = self.input_format.subsampling[1]
+        out_sy = self.output_format.subsampling[1]
+        align, halo = self._band_layout()
+        rows = h // align
+        bands = max(1, min(bands, rows // halo))
+        edges = np.linspace(0, rows, bands + 1).round().astype(int)
+
+        def luma_row(c):
+            # An odd last luma row belongs to the last chroma row
+            return h if c == rows else align * c
+
+        def band(c0, c1):
+            e0, e1 = max(c0 - halo, 0), min(c1 + halo, rows)
+            l0, l1 = luma_row(e0), luma_row(e1)
+            uv0, uv1 = l0 // in_sy, l1 // in_sy
+            planes = convert(
+                y[..., l0:l1, :], u[..., uv0:uv1, :], v[..., uv0:uv1, :], w, l1 - l0
+            )
+            keep_y = slice(luma_row(c0) - l0, luma_row(c1) - l0)
+            keep_uv = slice(
+                (luma_row(c0) - l0) // out_sy, (luma_row(c1) - l0) // out_sy
+            )
+            return tuple(
+                plane[..., keep_uv if i % 3 else keep_y, :]
+                for i, plane in enumerate(planes)
+            )
+
+        mapper = map if pool is None else pool.map
+        results = list(mapper(band, edges[:-1], edges[1:]))
+        return tuple(np.concatenate(planes, axis=-2) for planes in zip(*results))
+
+    def _read_batch(self, frames):
+        """Read a list of same-size frames as stacked (N, H, W) float32 planes."""
+        planes = [self._read_planes(frame) for frame in frames]
+        # Stack so every ufunc runs once per batch instead of once per frame
+        return tuple(np.stack(p) for p in zip(*planes))
+
+    def _display_light(self, y, u, v) -> np.ndarray:
+        """Planar BT.2020 display light in cd/m² of quantized output samples."""
+        fmt = self.output_format
+        # Integer samples would be promoted to float64 by the normalization
+        y, u, v = (np.asarray(p, dtype=np.float32) for p in (y, u, v))
+        planes = np.stack(normalize(y, u, v, fmt.bit_depth))
+        if fmt.primaries == Primaries.BT2020:
+            rgb = compose("yuv2020_to_rgb").apply(planes, out=planes)
+        else:
+            rgb = compose("yuv709_to_rgb").apply(planes, out=planes)
+
+        if fmt.transfer == Transfer.PQ:
+            rgb = eotf_pq(rgb, out=rgb)
+            rgb *= 10000.0
+        elif fmt.transfer == Transfer.HLG:
+            # HLG on a 1000 cd/m² display, with the OOTF the converters use
+            rgb = eotf_hlg(rgb, out=rgb)
+            np.power(rgb, 1.2, out=rgb)
+            rgb *= 1000.0
+        else:
+            # BT.1886 on a 100 cd/m² display
+            rgb = eotf_sdr(rgb, out=rgb)
+            rgb = compose(100.0, "709_to_2020").apply(rgb, out=rgb)
+        return rgb
+
+    def _measure_light_level(self, y_out, u_out, v_out):
+        """Accumulate MaxCLL/MaxFALL of quantized HDR output planes.
+
+        Only one chroma sample per ``light_level_step`` x ``light_level_step``
+        block of chroma samples is converted. MaxFALL uses the co-sited luma
+        sample; MaxCLL uses the brightest luma sample of the block so small
+        highlights aren't missed, with the chroma sample of that pixel so the
+        peak is a colour the output actually has.
+        """
+        step = self.light_level_step
+        sx, sy = self.output_format.subsampling
+        block_w, block_h = sx * step, sy * step
+        rows, cols = y_out.shape[-2] // block_h, y_out.shape[-1] // block_w
+        u = u_out[..., : rows * step : step, : cols * step : step]
+        v = v_out[..., : rows * step : step, : cols * step : step]
+
+        # Rows of each block first: contiguous maxima are much faster than a
+        # single reduction over two strided axes
+        lead = y_out.shape[:-2]
+        y_rows = y_out[..., : rows * block_h, : cols * block_w]
+        y_rows = y_rows.reshape(*lead, rows, block_h, cols * block_w)
+        y_point = y_rows[..., 0, ::block_w]
+        y_cols = y_rows.max(axis=-2).reshape(*lead, rows, cols, block_w)
+        peak_col = y_cols.argmax(axis=-1)
+        y_peak = np.take_along_axis(y_cols, peak_col[..., None], axis=-1)[..., 0]
+
+        # Chroma sample of every peak pixel: find its row in the peak column
+        # of the block, then map both offsets to chroma samples
+        x = np.arange(cols) * block_w + peak_col
+        column = np.take_along_axis(y_rows, x[..., None, :], axis=-1)
+        peak_row = column.argmax(axis=-2)
+        chroma_rows = np.arange(rows)[:, None] * step + peak_row // sy
+        chroma_cols = np.arange(cols) * step + peak_col // sx
+        index = (chroma_rows * u_out.shape[-1] + chroma_cols).reshape(*lead, -1)
+        u_peak, v_peak = (
+            np.take_along_axis(p.reshape(*lead, -1), index, axis=-1).reshape(
+                y_peak.shape
+            )
+            for p in (u_out, v_out)
+        )
+        self.light_level.update(
+            self._display_light(y_point, u, v),
+            self._display_light(y_peak, u_peak, v_peak),
+        )
+
+    def _mux_batch(self, frames, y_out, u_out, v_out, output_container, output_stream):
+        """Encode quantized (N, H, W) planes with the timing of ``frames`` and mux them."""
+        w, h = self._output_size(frames[0].width, frames[0].height)
+        if self.light_level is not None:
+            self._measure_light_level(y_out, u_out, v_out)
+        if output_stream is None:
+            output_container.write(y_out, u_out, v_out)
+            return
+        for i, frame in enumerate(frames):
+            out_frame = self._write_frame(y_out[i], u_out[i], v_out[i], w, h)
+            out_frame.pts = frame.pts
+            out_frame.time_base = frame.time_base
+
+            for pkt in output_stream.encode(out_frame):
+                output_container.mux(pkt)
+
+    def _convert_batch(
+        self,
+        frames,
+        output_container,
+        output_stream,
+        pool=None,
+        bands=1,
+        metrics=None,
+        stage=None,
+    ):
+        """Convert a list of decoded frames in one vectorized pass and mux them.
+
+        ``bands`` row bands are converted on ``pool``, or one after another
+        without it. ``stage`` is called with the name of each step as it
+        starts (see ``MemoryBudget.stage``).
+        """
+        stage = stage or _untracked
+        stage("convert")
+        w, h = frames[0].width, frames[0].height
+        y, u, v = self._read_batch(frames)
+        y, u, v, w, h = self._resize_planes(y, u, v, w, h)
+
+        # Convert
+        if bands > 1:
+            y_out, u_out, v_out = self._convert_bands(y, u, v, w, h, pool, bands)
+        else:
+            y_out, u_out, v_out = self._convert_planes(y, u, v, w, h)
+
+        if metrics is not None:
+            stage("metrics")
+            metrics.update(self, (y, u, v), (y_out, u_out, v_out), w, h)
+
+        stage("encode")
+        self._mux_batch(frames, y_out, u_out, v_out, output_container, output_stream)
+
+    def _open_output(self, input_stream):
+        """Open ``output_path`` with an encoder stream sized and timed like ``input_stream``.
+
+        Raw YUV and image-sequence paths get a writer from ``media`` in place of
+        the container, and no encoder stream (None).
+        """
+        if self.dst_format.transfer != Transfer.SDR:
+            self.light_level = ContentLightLevel()
+        # An output placed by an OutputCache may share its file with the cache
+        # entry; replace it instead of writing through
+        if os.path.isfile(self.output_path) and os.stat(self.output_path).st_nlink > 1:
+            os.remove(self.output_path)
+        fmt = self.output_format
+        width, height = self._output_size(input_stream.width, input_stream.height)
+        writer = open_writer(self.output_path, fmt, width, height, self.chroma_filter)
+        if writer is not None:
+            return writer, None
 
         output_container = av.open(self.output_path, "w")
-        codec = "hevc" if self.dst_format.bit_depth == 10 else "h264"
+        codec = "hevc" if fmt.bit_depth > 8 else "h264"
         output_stream = output_container.add_stream(
             codec, rate=input_stream.average_rate
         )
-        output_stream.width = input_stream.width
-        output_stream.height = input_stream.height
-        output_stream.pix_fmt = self.dst_format.pix_fmt
+        output_stream.width, output_stream.height = width, height
+        output_stream.pix_fmt = fmt.pix_fmt
 
-        if self.dst_format.bit_depth == 10:
+        if codec == "hevc":
             output_stream.codec_context.codec_tag = "hvc1"
         output_stream.options = self._get_encoder_options()
+        return output_container, output_stream
+
+    def _finish_output(self):
+        """Store the measured content light level in the closed output file.
+
+        The encoder is configured before any frame is seen, so MaxCLL/MaxFALL
+        can't go into the x265 parameters; they are written to the container
+        instead.
+        """
+        if self.light_level is None or not self.light_level.frames:
+            return
+        max_cll, max_fall = self.light_level.values
+        stored = False
+        if os.path.splitext(self.output_path)[1].lower() in (".mp4", ".mov", ".m4v"):
+            stored = write_content_light_level(self.output_path, max_cll, max_fall)
+        note = "" if stored else " (not stored: unsupported container)"
+        print(
+            f"{self.output_path}: MaxCLL {max_cll} cd/m², MaxFALL {max_fall} cd/m²{note}"
+        )
 
-        print(f"Converting: {self.input_path} -> {self.output_path}")
-
-        for frame in input_container.decode(input_stream):
-            w, h = frame.width, frame.height
-            uv_w, uv_h = w // 2, h // 2
-
-            # Read
-            if self.src_format.bit_depth == 10:
-                y = read_plane_10bit(frame.planes[0], w, h)
-                u = read_plane_10bit(frame.planes[1], uv_w, uv_h)
-                v = read_plane_10bit(frame.planes[2], uv_w, uv_h)
-            else:
-                y = read_plane_8bit(frame.planes[0], w, h)
-                u = read_plane_8bit(frame.planes[1], uv_w, uv_h)
-                v = read_plane_8bit(frame.planes[2], uv_w, uv_h)
-
-            # Convert
-            rgb_linear = self.decode_to_linear(y, u, v, w, h)
-            y_out, u_out, v_out = self.encode_from_linear(rgb_linear)
-
-            # Write
-            out_frame = av.VideoFrame(width=w, height=h, format=self.dst_format.pix_fmt)
-            out_frame.pts = frame.pts
-            out_frame.time_base = frame.time_base
-
-            if self.dst_format.bit_depth == 10:
-                write_plane_10bit(out_frame.planes[0], y_out, w, h)
-                write_plane_10bit(out_frame.planes[1], u_out, uv_w, uv_h)
-                write_plane_10bit(out_frame.planes[2], v_out, uv_w, uv_h)
-            else:
-                write_plane_8bit(out_frame.planes[0], y_out, w, h)
-                write_plane_8bit(out_frame.planes[1], u_out, uv_w, uv_h)
-                write_plane_8bit(out_frame.planes[2], v_out, uv_w, uv_h)
+    def process(
+        self,
+        batch_size: int | None = None,
+        progress=None,
+        threads: int | None = None,
+        metrics=None,
+        cache=None,
+        max_memory: int | None = None,
+    ):
+        """Convert the input video and write the result to ``output_path``.
+
+        Parameters:
+            batch_size: number of frames converted together as one (N, H, W) batch.
+                Larger batches amortize per-call NumPy overhead on small resolutions.
+            progress: optional callable ``progress(frames_done, total_frames)`` invoked
+                after every batch. ``total_frames`` is 0 when the container doesn't
+                report a frame count. Exceptions raised by it abort the conversion.
+            threads: number of row bands converted concurrently on a thread pool.
+                NumPy releases the GIL inside its kernels, so one conversion can
+                use several cores without the memory and IPC cost of processes.
+            metrics: optional ``QualityMetrics`` comparing the output against a
+                reference while converting; its results are written at the end.
+            cache: optional ``OutputCache``. A conversion it already holds is
+                copied from it instead of run, and a finished one is added to it.
+                Not used with ``metrics``, which need the frames.
+            max_memory: resident memory in bytes to stay within. Batch size,
+                threads, row strips and read/write queues are sized to fit and
+                lowered while converting when the process goes over it; the peak
+                memory of each stage is printed at the end. See ``MemoryBudget``.
+
+        ``batch_size`` and ``threads`` of None take the values calibrated for
+        this converter and output size by ``main.py autotune`` (see
+        ``converter.autotune``), or 1 without a profile.
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+        if threads is not None and threads < 1:
+            raise ValueError(f"threads must be >= 1, got {threads}")
+        if max_memory is not None and max_memory < 1:
+            raise ValueError(f"max_memory must be >= 1, got {max_memory}")
 
-            for pkt in output_stream.encode(out_frame):
-                output_container.mux(pkt)
+        # PyAV allows accessing the raw 10-bit planes, not like OpenCV, which only supports up to 8-bit.
+        # Raw YUV files and image sequences are read without it, see media.
+        source = open_input(self.input_path, self.src_format, self.chroma_filter)
+        input_stream = source.stream
+        total_frames = input_stream.frames
+        try:
+            self._use_input(input_stream)
+            batch_size, threads = self._apply_profile(
+                input_stream.width, input_stream.height, batch_size, threads
+            )
+            cache_key = None
+            if cache is not None and metrics is None:
+                cache_key = cache.key(self)
+            if metrics is not None:
+                metrics.open(self)
+        except Exception:
+            source.close()
+            raise
+
+        if cache_key is not None and cache.fetch(cache_key, self.output_path):
+            source.close()
+            print(f"From cache: {self.input_path} -> {self.output_path}")
+            if progress is not None:
+                progress(total_frames, total_frames)
+            return
+
+        output_container, output_stream = self._open_output(input_stream)
+
+        budget = None
+        strips = threads
+        if max_memory is not None:
+            budget = MemoryBudget(max_memory)
+            batch_size, threads, strips = budget.plan(
+                self,
+                input_stream.width,
+                input_stream.height,
+                batch_size,
+                threads,
+                queues=[q for q in (source, output_container) if hasattr(q, "depth")],
+                decoder=isinstance(source, AVSource),
+                encoder=output_stream and output_stream.codec_context.name,
+            )
+            budget.start()
 
-        for pkt in output_stream.encode():
-            output_container.mux(pkt)
+        print(f"Converting: {self.input_path} -> {self.output_path}")
 
-        input_container.close()
-        output_container.close()
+        frames_done = 0
+        pool = ThreadPoolExecutor(threads) if threads > 1 else None
+
+        def flush(batch):
+            nonlocal frames_done, pool, threads, strips
+            if budget is not None:
+                if budget.threads != threads:
+                    if pool is not None:
+                        pool.shutdown()
+                    threads = budget.threads
+                    pool = ThreadPoolExecutor(threads) if threads > 1 else None
+                strips = budget.strips
+            self._convert_batch(
+                batch,
+                output_container,
+                output_stream,
+                pool,
+                max(threads, strips),
+                metrics,
+                None if budget is None else budget.stage,
+            )
+            frames_done += len(batch)
+            if progress is not None:
+                progress(frames_done, total_frames)
+
+        try:
+            sizes = batch_size if budget is None else budget.batch_size
+            for batch in iter_batches(source.decode(), sizes):
+                flush(batch)
+
+            if output_stream is not None:
+                if budget is not None:
+                    budget.stage("flush")
+                for pkt in output_stream.encode():
+                    output_container.mux(pkt)
+        finally:
+            if budget is not None:
+                budget.stop()
+            if pool is not None:
+                pool.shutdown()
+            if metrics is not None:
+                metrics.close()
+            source.close()
+            output_container.close()
+        self._finish_output()
+        if metrics is not None:
+            metrics.finish()
+        if cache_key is not None:
+            cache.store(cache_key, self.output_path)
         print("Done!")
+        if budget is not None:
+            budget.report()
@@ -0,0 +1,200 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import av
+import numpy as np
+
+from .media import is_sequence
+
+# Bytes read per step when hashing an input
+_CHUNK = 1 << 20
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _digest() -> "hashlib.blake2b":
+    return hashlib.blake2b(digest_size=32)
+
+
+@functools.cache
+def tool_version() -> str:
+    """Fingerprint of everything besides the options that shapes an output.
+
+    The converter and utils sources are hashed rather than trusting the
+    package version, which doesn't change with every edit; the NumPy, PyAV
+    and FFmpeg library versions are included as-is.
+    """
+    h = _digest()
+    for package in ("converter", "utils"):
+        directory = os.path.join(_ROOT, package)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".py"):
+                with open(os.path.join(directory, name), "rb") as f:
+                    h.update(name.encode() + b"\0" + f.read())
+    libraries = sorted(av.library_versions.items())
+    h.update(repr((np.__version__, av.__version__, libraries)).encode())
+    return h.hexdigest()
+
+
+class OutputCache:
+    """Content-addressed store of finished outputs.
+
+    An output is keyed by a hash of the input file's content, the converter
+    class, the input and output ``Format``, the encoder options, the other
+    options that change the pixels, and ``tool_version()``. A later
+    conversion with the same key gets the stored file instead of running. It
+    is hardlinked when the cache and the output share a file system, and
+    copied otherwise. Entries beyond ``max_bytes`` are evicted, least
+    recently used first.
+
+    Input hashes are remembered by path, size, inode and modification time,
+    so a repeated request for an unchanged file doesn't even read it again.
+
+    Parameters:
+        directory: where the entries are kept; created when missing
+        max_bytes: total entry size to evict down to; None keeps everything
+        link: hardlink entries when possible; False always copies
+    """
+
+    def __init__(self, directory: str, max_bytes: int | None = None, link=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        self._entries = os.path.join(directory, "entries")
+        self._inputs = os.path.join(directory, "inputs")
+        os.makedirs(self._entries, exist_ok=True)
+        os.makedirs(self._inputs, exist_ok=True)
+
+    def input_digest(self, path: str) -> str:
+        """Hash of the size and content of ``path``."""
+        st = os.stat(path)
+        identity = f"{os.path.realpath(path)}\0{st.st_size}\0{st.st_ino}"
+        identity += f"\0{st.st_mtime_ns}"
+        memo = os.path.join(self._inputs, _hash_text(identity))
+        try:
+            with open(memo) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            pass
+
+        h = _digest()
+        h.update(st.st_size.to_bytes(8, "little"))
+        with open(path, "rb") as f:
+            while chunk := f.read(_CHUNK):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _write_atomic(memo, digest.encode())
+        return digest
+
+    def key(self, conv) -> str | None:
+        """Cache key of ``conv``'s conversion, or None when it can't be cached.
+
+        Image sequences are many files and aren't cached. ``conv`` must have
+        its input opened (see ``VideoConverter._use_input``).
+        """
+        if is_sequence(conv.input_path) or is_sequence(conv.output_path):
+            return None
+        fields = {
+            "input": self.input_digest(conv.input_path),
+            "converter": type(conv).__name__,
+            "src": conv.input_format,
+            "dst": conv.output_format,
+            "encoder": conv._get_encoder_options(),
+            "chroma_filter": conv.chroma_filter,
+            "scale": conv.scale,
+            "light_level_step": conv.light_level_step,
+            "output": os.path.splitext(conv.output_path)[1].lower(),
+            "tool": tool_version(),
+        }
+        return _hash_text(json.dumps(fields, sort_keys=True, default=repr))
+
+    def _entry(self, key: str, output_path: str) -> str:
+        ext = os.path.splitext(output_path)[1].lower()
+        return os.path.join(self._entries, key + ext)
+
+    def _place(self, src: str, dst: str):
+        """Make ``dst`` a link to, or copy of, ``src`` in one step."""
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        try:
+            if not self.link:
+                raise OSError
+            os.link(src, tmp)
+        except FileNotFoundError:
+            # Nothing to copy either
+            raise
+        except OSError:
+            # Other file system, or links not wanted
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Put the stored output for ``key`` at ``output_path``, if there is one.
+
+        Evicts after a hit too, so a cache that is only read from still
+        shrinks when ``max_bytes`` is lowered.
+        """
+        entry = self._entry(key, output_path)
+        if not os.path.exists(entry):
+            return False
+        try:
+            self._place(entry, output_path)
+        except FileNotFoundError:
+            if os.path.exists(entry):
+                raise
+            # Evicted by another process in the meantime
+            return False
+        # The entry's record holds the recency used for eviction
+        _write_atomic(entry + ".json", json.dumps({"used": time.time()}).encode())
+        self.evict()
+        return True
+
+    def store(self, key: str, output_path: str):
+        """Keep the finished ``output_path`` under ``key``, then evict."""
+        entry = self._entry(key, output_path)
+        self._place(output_path, entry)
+        _write_atomic(entry + ".json", json.dumps({"used": time.time()}).encode())
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until they fit in ``max_bytes``."""
+        if self.max_bytes is None:
+            return
+        entries = []
+        for name in os.listdir(self._entries):
+            if name.endswith(".json") or name.endswith(".tmp"):
+                continue
+            path = os.path.join(self._entries, name)
+            try:
+                used = os.stat(path + ".json").st_mtime
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                # Being stored or evicted by another process
+                continue
+            entries.append((used, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for stale in (path, path + ".json"):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+
+def _hash_text(text: str) -> str:
+    h = _digest()
+    h.update(text.encode())
+    return h.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
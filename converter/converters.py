@@ -1,32 +1,28 @@
 import numpy as np
 
 from utils import (
-    downsample_chroma,
+    compose,
     eotf_hlg,
     eotf_pq,
     eotf_sdr,
-    linear_709_to_2020,
-    linear_2020_to_709,
-    normalize_8bit,
-    normalize_10bit,
+    normalize,
     oetf_hlg,
     oetf_pq,
     oetf_sdr,
-    quantize_8bit,
-    quantize_10bit,
-    rgb_to_yuv_709,
-    rgb_to_yuv_2020,
-    upsample_chroma,
-    yuv_to_rgb_709,
-    yuv_to_rgb_2020,
+    quantize,
 )
 
-from .base import HLG, PQ, SDR, Format, Primaries, VideoConverter
+from .base import VideoConverter
+from .formats import HLG, PQ, SDR, Format, Primaries
 
 
 class SDR2PQ(VideoConverter):
-    def __init__(self, input_path, output_path=None):
-        super().__init__(input_path, output_path)
+    _to_rgb = compose("yuv709_to_rgb")
+    _to_2020 = compose("709_to_2020")
+    _to_yuv = compose("rgb_to_yuv2020")
+
+    def __init__(self, input_path, output_path=None, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
 
     @property
     def src_format(self) -> Format:
@@ -37,27 +33,32 @@ class SDR2PQ(VideoConverter):
         return PQ
 
     def decode_to_linear(self, y, u, v, w, h):
-        y_norm, u_norm, v_norm = normalize_8bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        rgb = yuv_to_rgb_709(y_norm, u_up, v_up)
-        rgb_linear = eotf_sdr(rgb)
-        rgb_2020 = linear_709_to_2020(rgb_linear)
-        return np.clip(rgb_2020, 0, None)
+        planes = self._yuv_planes(
+            *normalize(y, u, v, self.input_format.bit_depth), w, h
+        )
+        rgb = self._to_rgb.apply(planes, out=planes)
+        rgb_linear = eotf_sdr(rgb, out=rgb)
+        rgb_2020 = self._to_2020.apply(rgb_linear, out=rgb_linear)
+        return np.maximum(rgb_2020, 0, out=rgb_2020)
 
     def encode_from_linear(self, rgb_linear):
         # map sdr to pq
         # 203 nits is recommended in BT.2408-8
         rgb_scaled = rgb_linear * (203.0 / 10000.0)
-        rgb_scaled = np.clip(rgb_scaled, 0, 1)
-        rgb_pq = oetf_pq(rgb_scaled)
-        y, u, v = rgb_to_yuv_2020(rgb_pq)
-        u_down, v_down = downsample_chroma(u, v)
-        return quantize_10bit(y, u_down, v_down)
+        rgb_scaled = np.clip(rgb_scaled, 0, 1, out=rgb_scaled)
+        rgb_pq = oetf_pq(rgb_scaled, out=rgb_scaled)
+        y, u, v = self._to_yuv.apply(rgb_pq, out=rgb_pq)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
 
 
 class SDR2HLG(VideoConverter):
-    def __init__(self, input_path, output_path=None):
-        super().__init__(input_path, output_path)
+    _to_rgb = compose("yuv709_to_rgb")
+    _to_2020 = compose("709_to_2020")
+    _to_yuv = compose("rgb_to_yuv2020")
+
+    def __init__(self, input_path, output_path=None, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
 
     @property
     def src_format(self) -> Format:
@@ -68,27 +69,32 @@ class SDR2HLG(VideoConverter):
         return HLG
 
     def decode_to_linear(self, y, u, v, w, h):
-        y_norm, u_norm, v_norm = normalize_8bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        rgb = yuv_to_rgb_709(y_norm, u_up, v_up)
-        rgb_linear = eotf_sdr(rgb)
-        rgb_2020 = linear_709_to_2020(rgb_linear)
-        return np.clip(rgb_2020, 0, None)
+        planes = self._yuv_planes(
+            *normalize(y, u, v, self.input_format.bit_depth), w, h
+        )
+        rgb = self._to_rgb.apply(planes, out=planes)
+        rgb_linear = eotf_sdr(rgb, out=rgb)
+        rgb_2020 = self._to_2020.apply(rgb_linear, out=rgb_linear)
+        return np.maximum(rgb_2020, 0, out=rgb_2020)
 
     def encode_from_linear(self, rgb_linear):
         # map sdr to hlg
         # 203 nits is recommended in BT.2408-8
         rgb_scaled = rgb_linear * (203.0 / 1000.0)
-        rgb_scaled = np.clip(rgb_scaled, 0, 1)
-        rgb_hlg = oetf_hlg(rgb_scaled)
-        y, u, v = rgb_to_yuv_2020(rgb_hlg)
-        u_down, v_down = downsample_chroma(u, v)
-        return quantize_10bit(y, u_down, v_down)
+        rgb_scaled = np.clip(rgb_scaled, 0, 1, out=rgb_scaled)
+        rgb_hlg = oetf_hlg(rgb_scaled, out=rgb_scaled)
+        y, u, v = self._to_yuv.apply(rgb_hlg, out=rgb_hlg)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
 
 
 class PQ2SDR(VideoConverter):
-    def __init__(self, input_path, output_path=None):
-        super().__init__(input_path, output_path)
+    _to_rgb = compose("yuv2020_to_rgb")
+    _to_709 = compose(10000.0 / 100.0, "2020_to_709")
+    _to_yuv = compose("rgb_to_yuv709")
+
+    def __init__(self, input_path, output_path=None, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
 
     @property
     def src_format(self) -> Format:
@@ -99,27 +105,33 @@ class PQ2SDR(VideoConverter):
         return SDR
 
     def decode_to_linear(self, y, u, v, w, h):
-        y_norm, u_norm, v_norm = normalize_10bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        rgb = yuv_to_rgb_2020(y_norm, u_up, v_up)
-        rgb_linear = eotf_pq(np.clip(rgb, 0, 1))
-        return np.clip(rgb_linear, 0, None)
+        planes = self._yuv_planes(
+            *normalize(y, u, v, self.input_format.bit_depth), w, h
+        )
+        rgb = self._to_rgb.apply(planes, out=planes)
+        rgb_linear = eotf_pq(rgb, out=rgb)
+        return np.maximum(rgb_linear, 0, out=rgb_linear)
 
     def encode_from_linear(self, rgb_linear):
         # map pq to sdr
-        rgb_scaled = rgb_linear * (10000.0 / 100.0)
-        rgb_scaled = np.clip(rgb_scaled, 0, 1)
-        rgb_709 = linear_2020_to_709(rgb_scaled)
-        rgb_709 = np.clip(rgb_709, 0, 1)
-        rgb_sdr = oetf_sdr(rgb_709)
-        y, u, v = rgb_to_yuv_709(rgb_sdr)
-        u_down, v_down = downsample_chroma(u, v)
-        return quantize_8bit(y, u_down, v_down)
+        # clip(L * 100, 0, 1) == clip(L, 0, 1 / 100) * 100, so the scale is
+        # folded into the gamut matrix
+        rgb_scaled = np.clip(rgb_linear, 0, 100.0 / 10000.0)
+        rgb_709 = self._to_709.apply(rgb_scaled, out=rgb_scaled)
+        rgb_709 = np.clip(rgb_709, 0, 1, out=rgb_709)
+        rgb_sdr = oetf_sdr(rgb_709, out=rgb_709)
+        y, u, v = self._to_yuv.apply(rgb_sdr, out=rgb_sdr)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
 
 
 class HLG2SDR(VideoConverter):
-    def __init__(self, input_path, output_path=None):
-        super().__init__(input_path, output_path)
+    _to_rgb = compose("yuv2020_to_rgb")
+    _to_709 = compose(1000.0 / 100.0, "2020_to_709")
+    _to_yuv = compose("rgb_to_yuv709")
+
+    def __init__(self, input_path, output_path=None, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
 
     @property
     def src_format(self) -> Format:
@@ -130,29 +142,34 @@ class HLG2SDR(VideoConverter):
         return SDR
 
     def decode_to_linear(self, y, u, v, w, h):
-        y_norm, u_norm, v_norm = normalize_10bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        rgb = yuv_to_rgb_2020(y_norm, u_up, v_up)
-        rgb_linear = eotf_hlg(np.clip(rgb, 0, 1))
-        return np.clip(rgb_linear, 0, None)
+        planes = self._yuv_planes(
+            *normalize(y, u, v, self.input_format.bit_depth), w, h
+        )
+        rgb = self._to_rgb.apply(planes, out=planes)
+        rgb_linear = eotf_hlg(rgb, out=rgb)
+        return np.maximum(rgb_linear, 0, out=rgb_linear)
 
     def encode_from_linear(self, rgb_linear):
         # convert scene light to display light (HLG OOTF)
         rgb_linear = np.power(rgb_linear, 1.2)
         # map hlg to sdr
-        rgb_scaled = rgb_linear * (1000.0 / 100.0)
-        rgb_scaled = np.clip(rgb_scaled, 0, 1)
-        rgb_709 = linear_2020_to_709(rgb_scaled)
-        rgb_709 = np.clip(rgb_709, 0, 1)
-        rgb_sdr = oetf_sdr(rgb_709)
-        y, u, v = rgb_to_yuv_709(rgb_sdr)
-        u_down, v_down = downsample_chroma(u, v)
-        return quantize_8bit(y, u_down, v_down)
+        # clip(L * 10, 0, 1) == clip(L, 0, 1 / 10) * 10, so the scale is
+        # folded into the gamut matrix
+        rgb_scaled = np.clip(rgb_linear, 0, 100.0 / 1000.0, out=rgb_linear)
+        rgb_709 = self._to_709.apply(rgb_scaled, out=rgb_scaled)
+        rgb_709 = np.clip(rgb_709, 0, 1, out=rgb_709)
+        rgb_sdr = oetf_sdr(rgb_709, out=rgb_709)
+        y, u, v = self._to_yuv.apply(rgb_sdr, out=rgb_sdr)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
 
 
 class PQ2HLG(VideoConverter):
-    def __init__(self, input_path, output_path=None):
-        super().__init__(input_path, output_path)
+    _to_rgb = compose("yuv2020_to_rgb")
+    _to_yuv = compose("rgb_to_yuv2020")
+
+    def __init__(self, input_path, output_path=None, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
 
     @property
     def src_format(self) -> Format:
@@ -163,27 +180,31 @@ class PQ2HLG(VideoConverter):
         return HLG
 
     def decode_to_linear(self, y, u, v, w, h):
-        y_norm, u_norm, v_norm = normalize_10bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        rgb = yuv_to_rgb_2020(y_norm, u_up, v_up)
-        rgb_linear = eotf_pq(np.clip(rgb, 0, 1))
-        return np.clip(rgb_linear, 0, None)
+        planes = self._yuv_planes(
+            *normalize(y, u, v, self.input_format.bit_depth), w, h
+        )
+        rgb = self._to_rgb.apply(planes, out=planes)
+        rgb_linear = eotf_pq(rgb, out=rgb)
+        return np.maximum(rgb_linear, 0, out=rgb_linear)
 
     def encode_from_linear(self, rgb_linear):
         # map pq to hlg
         rgb_scaled = rgb_linear * (10000.0 / 1000.0)
-        rgb_scaled = np.clip(rgb_scaled, 0, 1)
+        rgb_scaled = np.clip(rgb_scaled, 0, 1, out=rgb_scaled)
         # convert display light to scene light
-        rgb_scene = np.power(rgb_scaled, 1 / 1.2)
-        rgb_hlg = oetf_hlg(rgb_scene)
-        y, u, v = rgb_to_yuv_2020(rgb_hlg)
-        u_down, v_down = downsample_chroma(u, v)
-        return quantize_10bit(y, u_down, v_down)
+        rgb_scene = np.power(rgb_scaled, 1 / 1.2, out=rgb_scaled)
+        rgb_hlg = oetf_hlg(rgb_scene, out=rgb_scene)
+        y, u, v = self._to_yuv.apply(rgb_hlg, out=rgb_hlg)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
 
 
 class HLG2PQ(VideoConverter):
-    def __init__(self, input_path, output_path=None):
-        super().__init__(input_path, output_path)
+    _to_rgb = compose("yuv2020_to_rgb")
+    _to_yuv = compose("rgb_to_yuv2020")
+
+    def __init__(self, input_path, output_path=None, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
 
     @property
     def src_format(self) -> Format:
@@ -194,32 +215,44 @@ class HLG2PQ(VideoConverter):
         return PQ
 
     def decode_to_linear(self, y, u, v, w, h):
-        y_norm, u_norm, v_norm = normalize_10bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        rgb = yuv_to_rgb_2020(y_norm, u_up, v_up)
-        rgb_linear = eotf_hlg(np.clip(rgb, 0, 1))
-        return np.clip(rgb_linear, 0, None)
+        planes = self._yuv_planes(
+            *normalize(y, u, v, self.input_format.bit_depth), w, h
+        )
+        rgb = self._to_rgb.apply(planes, out=planes)
+        rgb_linear = eotf_hlg(rgb, out=rgb)
+        return np.maximum(rgb_linear, 0, out=rgb_linear)
 
     def encode_from_linear(self, rgb_linear):
         # convert scene light to display light
         rgb_linear = np.power(rgb_linear, 1.2)
         # map hlg to pq
-        rgb_scaled = rgb_linear * (1000.0 / 10000.0)
-        rgb_scaled = np.clip(rgb_scaled, 0, 1)
-        rgb_pq = oetf_pq(rgb_scaled)
-        y, u, v = rgb_to_yuv_2020(rgb_pq)
-        u_down, v_down = downsample_chroma(u, v)
-        return quantize_10bit(y, u_down, v_down)
+        rgb_scaled = np.multiply(rgb_linear, 1000.0 / 10000.0, out=rgb_linear)
+        rgb_scaled = np.clip(rgb_scaled, 0, 1, out=rgb_scaled)
+        rgb_pq = oetf_pq(rgb_scaled, out=rgb_scaled)
+        y, u, v = self._to_yuv.apply(rgb_pq, out=rgb_pq)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
 
 
 class Rewrap(VideoConverter):
     """Copy pixels without transfer functions (for comparison)."""
 
-    def __init__(self, input_path, output_path=None, src_fmt=PQ, dst_fmt=HLG):
-        super().__init__(input_path, output_path)
+    def __init__(self, input_path, output_path=None, src_fmt=PQ, dst_fmt=HLG, **kwargs):
+        super().__init__(input_path, output_path, **kwargs)
         self._src_fmt = src_fmt
         self._dst_fmt = dst_fmt
 
+        src_2020 = src_fmt.primaries == Primaries.BT2020
+        dst_2020 = dst_fmt.primaries == Primaries.BT2020
+        to_rgb = ["yuv2020_to_rgb" if src_2020 else "yuv709_to_rgb"]
+        # No EOTF in between, so the gamut widening joins the YUV -> RGB matrix
+        if not src_2020 and dst_2020:
+            to_rgb.append("709_to_2020")
+        self._to_rgb = compose(*to_rgb)
+        self._narrow = src_2020 and not dst_2020
+        self._to_709 = compose("2020_to_709")
+        self._to_yuv = compose("rgb_to_yuv2020" if dst_2020 else "rgb_to_yuv709")
+
     @property
     def src_format(self) -> Format:
         return self._src_fmt
@@ -229,38 +262,18 @@ class Rewrap(VideoConverter):
         return self._dst_fmt
 
     def decode_to_linear(self, y, u, v, w, h):
-        if self._src_fmt.bit_depth == 10:
-            y_norm, u_norm, v_norm = normalize_10bit(y, u, v)
-        else:
-            y_norm, u_norm, v_norm = normalize_8bit(y, u, v)
-        u_up, v_up = upsample_chroma(u_norm, v_norm, w, h)
-        if self._src_fmt.primaries == Primaries.BT2020:
-            rgb = yuv_to_rgb_2020(y_norm, u_up, v_up)
-        else:
-            rgb = yuv_to_rgb_709(y_norm, u_up, v_up)
-        if (
-            self._src_fmt.primaries == Primaries.BT709
-            and self._dst_fmt.primaries == Primaries.BT2020
-        ):
-            rgb = linear_709_to_2020(rgb)
+        y_norm, u_norm, v_norm = normalize(y, u, v, self.input_format.bit_depth)
+        planes = self._yuv_planes(y_norm, u_norm, v_norm, w, h)
+        rgb = self._to_rgb.apply(planes, out=planes)
         # Skip EOTF
-        return np.clip(rgb, 0, 1)
+        return np.clip(rgb, 0, 1, out=rgb)
 
     def encode_from_linear(self, rgb):
         # Skip OETF
         rgb = np.clip(rgb, 0, 1)
-        if (
-            self._src_fmt.primaries == Primaries.BT2020
-            and self._dst_fmt.primaries == Primaries.BT709
-        ):
-            rgb = linear_2020_to_709(rgb)
-            rgb = np.clip(rgb, 0, 1)
-        if self._dst_fmt.primaries == Primaries.BT2020:
-            y, u, v = rgb_to_yuv_2020(rgb)
-        else:
-            y, u, v = rgb_to_yuv_709(rgb)
-        u_down, v_down = downsample_chroma(u, v)
-        if self._dst_fmt.bit_depth == 10:
-            return quantize_10bit(y, u_down, v_down)
-        else:
-            return quantize_8bit(y, u_down, v_down)
+        if self._narrow:
+            rgb = self._to_709.apply(rgb, out=rgb)
+            rgb = np.clip(rgb, 0, 1, out=rgb)
+        y, u, v = self._to_yuv.apply(rgb, out=rgb)
+        u_down, v_down = self._downsample_chroma(u, v)
+        return quantize(y, u_down, v_down, self.output_format.bit_depth)
@@ -0,0 +1,227 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .base import iter_batches
+from .converters import HLG2PQ, HLG2SDR, PQ2HLG, PQ2SDR, SDR2HLG, SDR2PQ, Rewrap
+from .formats import HLG, PQ, SDR, Format
+from .media import open_input
+
+CONVERSIONS = {
+    (SDR, PQ): SDR2PQ,
+    (SDR, HLG): SDR2HLG,
+    (PQ, SDR): PQ2SDR,
+    (HLG, SDR): HLG2SDR,
+    (PQ, HLG): PQ2HLG,
+    (HLG, PQ): HLG2PQ,
+}
+
+# ITU-T H.273 transfer characteristics, as reported by the decoder
+TRANSFER_CODES = {
+    1: SDR,  # BT.709
+    6: SDR,  # BT.601 uses the same curve
+    16: PQ,  # SMPTE ST 2084
+    18: HLG,  # ARIB STD-B67
+}
+
+
+def detect_format(input_stream) -> Format:
+    """Guess the source format from the stream's transfer characteristic."""
+    code = input_stream.codec_context.color_trc
+    if code not in TRANSFER_CODES:
+        raise ValueError(
+            f"Cannot detect the source format (transfer characteristic {code}); "
+            "specify it explicitly"
+        )
+    return TRANSFER_CODES[code]
+
+
+class FanOut:
+    """Convert one input to several formats with a single decode.
+
+    Frames are decoded and linearized once per batch, then every target runs
+    its own ``encode_from_linear`` and encoder on a thread of its own. This
+    relies on ``decode_to_linear`` depending only on the source format, which
+    holds for every converter. A target in the source format re-encodes the
+    decoded planes unchanged, in the input's pixel format; the other outputs
+    keep the input's chroma layout.
+
+    Parameters:
+        input_path: input video
+        outputs: mapping of target ``Format`` to output path
+        src_fmt: source format, detected from the stream metadata when None
+        chroma_filter: resampling filter, see ``utils.sample.FILTERS``
+        scale: optional output (width, height) shared by every target; the
+            planes are scaled once, before linearization
+    """
+
+    def __init__(
+        self,
+        input_path: str,
+        outputs: dict,
+        src_fmt: Format | None = None,
+        chroma_filter: str = "bilinear",
+        scale: tuple | None = None,
+    ):
+        if not outputs:
+            raise ValueError("At least one output is required")
+        self.input_path = input_path
+        self.outputs = outputs
+        self.src_fmt = src_fmt
+        self.chroma_filter = chroma_filter
+        self.scale = scale
+
+    def _targets(self, src_fmt: Format, input_stream):
+        """(converter, passthrough) for every output, set up for ``input_stream``."""
+        targets = []
+        for dst_fmt, output_path in self.outputs.items():
+            if dst_fmt == src_fmt:
+                # Rewrap only supplies the encoder settings for the format here
+                conv = Rewrap(
+                    self.input_path,
+                    output_path,
+                    src_fmt=src_fmt,
+                    dst_fmt=dst_fmt,
+                    chroma_filter=self.chroma_filter,
+                    scale=self.scale,
+                    pix_fmt=input_stream.pix_fmt,
+                )
+                targets.append((conv, True))
+            else:
+                conv_cls = CONVERSIONS[(src_fmt, dst_fmt)]
+                conv = conv_cls(
+                    self.input_path,
+                    output_path,
+                    chroma_filter=self.chroma_filter,
+                    scale=self.scale,
+                )
+                targets.append((conv, False))
+        for conv, _ in targets:
+            conv._use_input(input_stream)
+        return targets
+
+    def process(
+        self,
+        batch_size: int | None = None,
+        progress=None,
+        threads: int | None = None,
+    ):
+        """Convert the input to every output.
+
+        Parameters:
+            batch_size: number of frames converted together as one (N, H, W) batch.
+            progress: optional callable ``progress(frames_done, total_frames)``, as
+                in ``VideoConverter.process``.
+            threads: number of row bands converted concurrently. Each band is
+                linearized once and encoded for every target, as a whole frame is.
+
+        ``batch_size`` and ``threads`` of None take the values calibrated for
+        the first conversion (see ``VideoConverter.process``), or 1 without a
+        profile.
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+        if threads is not None and threads < 1:
+            raise ValueError(f"threads must be >= 1, got {threads}")
+
+        source = open_input(self.input_path, self.src_fmt, self.chroma_filter)
+        input_stream = source.stream
+        total_frames = input_stream.frames
+        try:
+            src_fmt = self.src_fmt or detect_format(input_stream)
+            # Also rejects pixel formats the converters can't read
+            targets = self._targets(src_fmt, input_stream)
+        except ValueError:
+            source.close()
+            raise
+
+        converters = [conv for conv, passthrough in targets if not passthrough]
+        # Any converter from this source decodes the same linear light
+        decoder = converters[0] if converters else targets[0][0]
+        batch_size, threads = decoder._apply_profile(
+            input_stream.width, input_stream.height, batch_size, threads
+        )
+        outputs = []
+        pool = ThreadPoolExecutor(len(targets))
+        bands = ThreadPoolExecutor(threads) if threads > 1 and converters else None
+
+        def convert(y, u, v, w, h):
+            rgb_linear = decoder.decode_to_linear(y, u, v, w, h)
+            return tuple(
+                plane
+                for conv in converters
+                for plane in conv.encode_from_linear(rgb_linear)
+            )
+
+        for conv, _ in targets:
+            print(f"Converting: {self.input_path} -> {conv.output_path}")
+
+        def encode(conv, passthrough, output, frames, planes, rgb_linear, banded):
+            if passthrough:
+                bit_depth = conv.input_format.bit_depth
+                dtype = np.uint8 if bit_depth == 8 else np.uint16
+                peak = (1 << bit_depth) - 1
+                # Scaled planes hold fractional and possibly overshooting codes
+                y_out, u_out, v_out = (
+                    np.clip(np.round(p), 0, peak).astype(dtype) for p in planes
+                )
+            elif banded:
+                y_out, u_out, v_out = banded[conv]
+            else:
+                y_out, u_out, v_out = conv.encode_from_linear(rgb_linear)
+            conv._mux_batch(frames, y_out, u_out, v_out, *output)
+
+        try:
+            for conv, _ in targets:
+                outputs.append(conv._open_output(input_stream))
+
+            frames_done = 0
+            for frames in iter_batches(source.decode(), batch_size):
+                w, h = frames[0].width, frames[0].height
+                y, u, v = decoder._read_batch(frames)
+                *planes, w, h = decoder._resize_planes(y, u, v, w, h)
+                rgb_linear, banded = None, {}
+                if bands is not None:
+                    out = decoder._convert_bands(
+                        *planes, w, h, bands, threads, convert=convert
+                    )
+                    for i, conv in enumerate(converters):
+                        banded[conv] = out[3 * i : 3 * i + 3]
+                elif converters:
+                    rgb_linear = decoder.decode_to_linear(*planes, w, h)
+
+                futures = [
+                    pool.submit(
+                        encode,
+                        conv,
+                        passthrough,
+                        output,
+                        frames,
+                        planes,
+                        rgb_linear,
+                        banded,
+                    )
+                    for (conv, passthrough), output in zip(targets, outputs)
+                ]
+                for future in futures:
+                    future.result()
+
+                frames_done += len(frames)
+                if progress is not None:
+                    progress(frames_done, total_frames)
+
+            for output_container, output_stream in outputs:
+                if output_stream is None:
+                    continue
+                for pkt in output_stream.encode():
+                    output_container.mux(pkt)
+        finally:
+            pool.shutdown()
+            if bands is not None:
+                bands.shutdown()
+            source.close()
+            for output_container, _ in outputs:
+                output_container.close()
+        for conv, _ in targets:
+            conv._finish_output()
+        print("Done!")
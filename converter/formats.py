@@ -0,0 +1,108 @@
+from enum import Enum
+
+
+class Transfer(Enum):
+    SDR = "bt709"
+    PQ = "smpte2084"
+    HLG = "arib-std-b67"
+
+
+class Primaries(Enum):
+    BT709 = "bt709"
+    BT2020 = "bt2020"
+
+
+# Chroma layout: (horizontal, vertical) subsampling factors
+SUBSAMPLING = {
+    "420": (2, 2),
+    "422": (2, 1),
+    "444": (1, 1),
+}
+
+BIT_DEPTHS = (8, 10, 12)
+
+
+class Format:
+    """A colour format: primaries, transfer, bit depth and chroma layout.
+
+    Immutable and hashable. A plain class rather than a frozen dataclass, since
+    importing ``dataclasses`` alone costs the metadata-only commands (list,
+    --help, job submission) about a quarter of their startup budget.
+    """
+
+    __slots__ = ("primaries", "transfer", "bit_depth", "chroma")
+
+    def __init__(
+        self,
+        primaries: Primaries,
+        transfer: Transfer,
+        bit_depth: int,
+        chroma: str = "420",
+    ):
+        for name, value in zip(
+            self.__slots__, (primaries, transfer, bit_depth, chroma)
+        ):
+            object.__setattr__(self, name, value)
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"cannot assign to field {name!r}")
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self.__slots__, self._fields())
+        )
+        return f"Format({fields})"
+
+    def __reduce__(self):
+        return Format, self._fields()
+
+    def replace(self, **changes) -> "Format":
+        """A copy with the given fields changed, e.g. ``replace(chroma="444")``."""
+        fields = dict(zip(self.__slots__, self._fields()))
+        fields.update(changes)
+        return Format(**fields)
+
+    @property
+    def pix_fmt(self) -> str:
+        suffix = "" if self.bit_depth == 8 else f"{self.bit_depth}le"
+        return f"yuv{self.chroma}p{suffix}"
+
+    @property
+    def subsampling(self) -> tuple:
+        """Chroma (horizontal, vertical) subsampling factors."""
+        return SUBSAMPLING[self.chroma]
+
+    def with_pix_fmt(self, pix_fmt: str) -> "Format":
+        """This format stored as ``pix_fmt``, e.g. "yuv422p10le"."""
+        for chroma in SUBSAMPLING:
+            for bit_depth in BIT_DEPTHS:
+                fmt = self.replace(bit_depth=bit_depth, chroma=chroma)
+                if fmt.pix_fmt == pix_fmt:
+                    return fmt
+        raise ValueError(
+            f"Unsupported pixel format {pix_fmt}; expected one of {', '.join(PIX_FMTS)}"
+        )
+
+
+# Every layout Format can describe
+PIX_FMTS = tuple(
+    Format(Primaries.BT709, Transfer.SDR, bit_depth, chroma).pix_fmt
+    for chroma in SUBSAMPLING
+    for bit_depth in BIT_DEPTHS
+)
+
+# Predefined formats
+SDR = Format(Primaries.BT709, Transfer.SDR, 8)
+PQ = Format(Primaries.BT2020, Transfer.PQ, 10)
+HLG = Format(Primaries.BT2020, Transfer.HLG, 10)
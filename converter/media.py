@@ -0,0 +1,409 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+
+import av
+import numpy as np
+
+from utils import (
+    compose,
+    downsample_chroma,
+    normalize,
+    quantize,
+    upsample_chroma,
+)
+
+from .formats import Format, Primaries
+
+# === Inputs and outputs besides PyAV containers ===
+
+# Headerless planar YUV in the format's pix_fmt, e.g. yuv420p10le, or in the
+# pix_fmt the file name ends with
+RAW_EXTENSIONS = (".yuv",)
+
+# Numbered RGB images, named with a printf pattern such as frame_%04d.png:
+# extension -> (PyAV codec, 16-bit pix_fmt)
+IMAGE_CODECS = {
+    ".png": ("png", "rgb48be"),
+    ".tif": ("tiff", "rgb48le"),
+    ".tiff": ("tiff", "rgb48le"),
+}
+
+# <name>_<W>x<H>[_<fps>][_<pix_fmt>].yuv, as the JVET/MPEG test sequences are
+# named
+_RAW_NAME = re.compile(
+    r"_(\d+)x(\d+)(?:_(\d+(?:\.\d+)?)(?:fps)?)?(?:_(yuv4\d\dp\w*))?\.yuv$", re.I
+)
+_FRAME_NUMBER = re.compile(r"%0?\d*d")
+
+# Same defaults as FFmpeg's image2 and rawvideo formats
+DEFAULT_RATE = Fraction(25)
+# A sequence may start at any of these numbers; outputs start at 1
+_FIRST_NUMBERS = range(5)
+
+# Threads loading or writing frames; disk and codec work release the GIL
+IO_WORKERS = min(8, os.cpu_count() or 1)
+
+
+@dataclass
+class RawFrame:
+    """A frame read without PyAV: integer Y/U/V planes and its timing."""
+
+    planes: tuple
+    width: int
+    height: int
+    pts: int
+    time_base: Fraction
+
+
+@dataclass
+class StreamInfo:
+    """What the converters read from a PyAV stream, for other inputs."""
+
+    width: int
+    height: int
+    average_rate: Fraction
+    frames: int
+    pix_fmt: str
+
+
+def is_raw(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in RAW_EXTENSIONS
+
+
+def is_sequence(path: str) -> bool:
+    ext = os.path.splitext(path)[1].lower()
+    return ext in IMAGE_CODECS and _FRAME_NUMBER.search(path) is not None
+
+
+def raw_geometry(path: str) -> tuple:
+    """(width, height, rate, pix_fmt) of a raw YUV file from its name.
+
+    ``pix_fmt`` is None when the name doesn't give one.
+    """
+    match = _RAW_NAME.search(os.path.basename(path))
+    if match is None:
+        raise ValueError(
+            f"Raw YUV files must be named <name>_<W>x<H>[_<fps>][_<pix_fmt>].yuv: "
+            f"{path}"
+        )
+    width, height, rate, pix_fmt = match.groups()
+    rate = Fraction(rate) if rate else DEFAULT_RATE
+    return int(width), int(height), rate, pix_fmt and pix_fmt.lower()
+
+
+def sequence_paths(pattern: str) -> list:
+    """Existing files of a numbered image sequence, in order."""
+    for first in _FIRST_NUMBERS:
+        if os.path.exists(pattern % first):
+            break
+    else:
+        return []
+    paths = []
+    number = first
+    while os.path.exists(pattern % number):
+        paths.append(pattern % number)
+        number += 1
+    return paths
+
+
+def _plane_shapes(width: int, height: int, fmt: Format) -> tuple:
+    """(rows, columns) of the Y, U and V planes of a frame in ``fmt``."""
+    sx, sy = fmt.subsampling
+    chroma = (height // sy, width // sx)
+    return (height, width), chroma, chroma
+
+
+def _dtype(fmt: Format):
+    return np.uint8 if fmt.bit_depth == 8 else np.uint16
+
+
+# === RGB images <-> Y'CbCr ===
+
+
+def rgb_to_planes(rgb: np.ndarray, fmt: Format, chroma_filter: str = "bilinear"):
+    """Quantized Y/U/V planes in ``fmt`` of an interleaved 16-bit RGB image."""
+    planes = np.moveaxis(rgb, -1, 0).astype(np.float32, order="C")
+    planes *= 1.0 / 65535.0
+    name = "rgb_to_yuv2020" if fmt.primaries == Primaries.BT2020 else "rgb_to_yuv709"
+    y, u, v = compose(name).apply(planes, out=planes)
+    u_down, v_down = downsample_chroma(u, v, chroma_filter, subsampling=fmt.subsampling)
+    return quantize(y, u_down, v_down, fmt.bit_depth)
+
+
+def planes_to_rgb(
+    y, u, v, fmt: Format, chroma_filter: str = "bilinear", bits: int = 16
+) -> np.ndarray:
+    """Interleaved 8- or 16-bit RGB signal of quantized (H, W) Y/U/V planes."""
+    y, u, v = (np.asarray(p, dtype=np.float32) for p in (y, u, v))
+    y, u, v = normalize(y, u, v, fmt.bit_depth)
+    h, w = y.shape
+    yuv = np.empty((3, h, w), dtype=np.float32)
+    yuv[0] = y
+    upsample_chroma(
+        u,
+        v,
+        w,
+        h,
+        chroma_filter,
+        out=(yuv[1], yuv[2]),
+        subsampling=fmt.subsampling,
+    )
+    name = "yuv2020_to_rgb" if fmt.primaries == Primaries.BT2020 else "yuv709_to_rgb"
+    rgb = compose(name).apply(yuv, out=yuv)
+    np.clip(rgb, 0.0, 1.0, out=rgb)
+    rgb *= float((1 << bits) - 1)
+    dtype = np.uint16 if bits > 8 else np.uint8
+    return np.round(rgb).astype(dtype).transpose(1, 2, 0)
+
+
+def write_image(path: str, rgb: np.ndarray):
+    """Write an interleaved 8- or 16-bit RGB image, PNG or TIFF by extension."""
+    codec, deep_fmt = IMAGE_CODECS[os.path.splitext(path)[1].lower()]
+    deep = rgb.dtype == np.uint16
+    image = av.VideoFrame.from_ndarray(rgb, format="rgb48le" if deep else "rgb24")
+    with av.open(path, "w") as container:
+        stream = container.add_stream(codec)
+        stream.width, stream.height = rgb.shape[1], rgb.shape[0]
+        stream.pix_fmt = deep_fmt if deep else "rgb24"
+        for pkt in stream.encode(image):
+            container.mux(pkt)
+        for pkt in stream.encode():
+            container.mux(pkt)
+
+
+# === Sources ===
+
+
+class AVSource:
+    """Frames decoded by PyAV from any container it can open."""
+
+    def __init__(self, path: str):
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+
+    def decode(self):
+        return self.container.decode(self.stream)
+
+    def close(self):
+        self.container.close()
+
+
+class RawSource:
+    """A raw YUV file mapped frame by frame with ``np.memmap``.
+
+    Frames are views into their own mapping, so nothing is copied until the
+    planes are converted to float, and pages are read from disk on demand.
+    Each mapping is released with the frame, so the resident set holds only
+    the frames in use rather than every page read so far.
+    """
+
+    def __init__(self, path: str, fmt: Format):
+        width, height, rate, pix_fmt = raw_geometry(path)
+        if pix_fmt is not None:
+            fmt = fmt.with_pix_fmt(pix_fmt)
+        self._dtype = _dtype(fmt)
+        self._shapes = _plane_shapes(width, height, fmt)
+        self._frame_size = sum(rows * cols for rows, cols in self._shapes)
+        self._file = open(path, "rb")
+        frame_bytes = self._frame_size * np.dtype(self._dtype).itemsize
+        frames = os.fstat(self._file.fileno()).st_size // frame_bytes
+        self.stream = StreamInfo(width, height, rate, frames, fmt.pix_fmt)
+
+    def decode(self):
+        width, height = self.stream.width, self.stream.height
+        time_base = 1 / self.stream.average_rate
+        frame_bytes = self._frame_size * np.dtype(self._dtype).itemsize
+        for index in range(self.stream.frames):
+            samples = np.memmap(
+                self._file,
+                dtype=self._dtype,
+                mode="r",
+                offset=index * frame_bytes,
+                shape=(self._frame_size,),
+            )
+            planes = []
+            start = 0
+            for rows, cols in self._shapes:
+                planes.append(samples[start : start + rows * cols].reshape(rows, cols))
+                start += rows * cols
+            yield RawFrame(tuple(planes), width, height, index, time_base)
+
+    def close(self):
+        # Mappings still referenced by frames outlive the file
+        self._file.close()
+
+
+class ImageSequenceSource:
+    """Numbered RGB images, loaded and converted to Y'CbCr on a thread pool.
+
+    A few frames (``depth``) are loaded ahead, so file reads and PNG/TIFF
+    decoding overlap each other and the conversion. ``depth`` may be lowered
+    while decoding to hold fewer frames.
+    """
+
+    def __init__(self, pattern: str, fmt: Format, chroma_filter: str = "bilinear"):
+        self._paths = sequence_paths(pattern)
+        if not self._paths:
+            raise ValueError(f"No images found for {pattern}")
+        self.fmt = fmt
+        self.chroma_filter = chroma_filter
+        with av.open(self._paths[0]) as container:
+            first = container.streams.video[0]
+            width, height = first.width, first.height
+        self.stream = StreamInfo(
+            width, height, DEFAULT_RATE, len(self._paths), fmt.pix_fmt
+        )
+        self._pool = ThreadPoolExecutor(IO_WORKERS)
+        self.depth = 2 * IO_WORKERS
+
+    def _load(self, index: int) -> RawFrame:
+        path = self._paths[index]
+        with av.open(path) as container:
+            frame = next(container.decode(video=0))
+            rgb = frame.to_ndarray(format="rgb48le")
+        if (frame.width, frame.height) != (self.stream.width, self.stream.height):
+            raise ValueError(
+                f"{path} is {frame.width}x{frame.height}, unlike the first"
+            )
+        planes = rgb_to_planes(rgb, self.fmt, self.chroma_filter)
+        return RawFrame(
+            planes, frame.width, frame.height, index, 1 / self.stream.average_rate
+        )
+
+    def decode(self):
+        pending = deque()
+        for index in range(len(self._paths)):
+            pending.append(self._pool.submit(self._load, index))
+            while len(pending) > self.depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+def open_input(path: str, fmt: Format | None, chroma_filter: str = "bilinear"):
+    """Open ``path`` with the source its path calls for.
+
+    ``.yuv`` files are raw YUV, ``.png``/``.tif`` patterns with a frame
+    number (``%04d``) are image sequences, anything else goes to PyAV. The
+    source has ``stream`` (size, ``average_rate`` and frame count),
+    ``decode()`` and ``close()``. ``fmt`` may be None for PyAV inputs only.
+    """
+    if not (is_raw(path) or is_sequence(path)):
+        return AVSource(path)
+    if fmt is None:
+        raise ValueError(f"Specify the source format of {path}")
+    if is_raw(path):
+        return RawSource(path, fmt)
+    return ImageSequenceSource(path, fmt, chroma_filter)
+
+
+# === Writers ===
+
+
+class RawWriter:
+    """Writes quantized planes into a growing raw YUV file through ``np.memmap``.
+
+    Each batch extends the file and maps just the new frames; the planes are
+    copied in on a thread pool.
+    """
+
+    def __init__(self, path: str, fmt: Format, width: int, height: int):
+        self._dtype = _dtype(fmt)
+        self._shapes = _plane_shapes(width, height, fmt)
+        self._frame_size = sum(rows * cols for rows, cols in self._shapes)
+        self._file = open(path, "wb+")
+        self._frames = 0
+        self._pool = ThreadPoolExecutor(IO_WORKERS)
+
+    def write(self, y_out, u_out, v_out):
+        """Append quantized (N, H, W) planes."""
+        count = y_out.shape[0]
+        frame_bytes = self._frame_size * np.dtype(self._dtype).itemsize
+        offset = self._frames * frame_bytes
+        self._file.truncate(offset + count * frame_bytes)
+        mapped = np.memmap(
+            self._file,
+            dtype=self._dtype,
+            mode="r+",
+            offset=offset,
+            shape=(count, self._frame_size),
+        )
+
+        def copy(i, start, plane):
+            rows, cols = plane.shape[-2:]
+            mapped[i, start : start + rows * cols].reshape(rows, cols)[...] = plane[i]
+
+        futures = []
+        for i in range(count):
+            start = 0
+            for plane in (y_out, u_out, v_out):
+                futures.append(self._pool.submit(copy, i, start, plane))
+                start += plane.shape[-2] * plane.shape[-1]
+        for future in futures:
+            future.result()
+        mapped.flush()
+        self._frames += count
+
+    def close(self):
+        self._pool.shutdown()
+        self._file.close()
+
+
+class ImageSequenceWriter:
+    """Writes frames as numbered RGB images, encoding several at once.
+
+    Frames are numbered from 1 as FFmpeg does. Images are 16-bit, holding the
+    RGB signal of the output format (e.g. PQ-encoded BT.2020). At most
+    ``depth`` frames wait to be written.
+    """
+
+    def __init__(self, pattern: str, fmt: Format, chroma_filter: str = "bilinear"):
+        self.pattern = pattern
+        self.fmt = fmt
+        self.chroma_filter = chroma_filter
+        self._number = 1
+        self._pool = ThreadPoolExecutor(IO_WORKERS)
+        self._pending = deque()
+        self.depth = 2 * IO_WORKERS
+
+    def _save(self, number, y, u, v):
+        rgb = planes_to_rgb(y, u, v, self.fmt, self.chroma_filter)
+        write_image(self.pattern % number, rgb)
+
+    def write(self, y_out, u_out, v_out):
+        """Queue quantized (N, H, W) planes for writing."""
+        for i in range(y_out.shape[0]):
+            self._pending.append(
+                self._pool.submit(
+                    self._save, self._number, y_out[i], u_out[i], v_out[i]
+                )
+            )
+            self._number += 1
+        # Bound the frames held in memory; this also surfaces write errors
+        while len(self._pending) > self.depth:
+            self._pending.popleft().result()
+
+    def close(self):
+        try:
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def open_writer(
+    path: str, fmt: Format, width: int, height: int, chroma_filter: str = "bilinear"
+):
+    """A raw YUV or image-sequence writer for ``path``, or None for PyAV outputs."""
+    if is_raw(path):
+        return RawWriter(path, fmt, width, height)
+    if is_sequence(path):
+        return ImageSequenceWriter(path, fmt, chroma_filter)
+    return None
@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+
+# === Working-set model ===
+
+# Peak bytes per pixel allocated by the conversion math of one frame (float32
+# planes, linear RGB and temporaries), measured with tracemalloc at 1080p
+MATH_BYTES_PER_PIXEL = 48
+
+# What the codecs hold once their lookahead and reference pictures are full,
+# as (fixed bytes, frames of their own sample size). Little of it is allocated
+# when they open, so it can't be read from the RSS before the first frame.
+# Fitted to the peaks at 480x270, 960x540 and 1080p: x264 holds 32, 94 and
+# 346 MiB, x265 94, 203 and 589 MiB, and the HEVC decoder 8, 16 and 52 MiB
+ENCODER_COST = {"libx264": (10 << 20, 115), "libx265": (72 << 20, 88)}
+DECODER_COST = (4 << 20, 8)
+
+# Bytes per pixel of a frame waiting in an image-sequence queue: 16-bit RGB and
+# the float32 planes made from it
+QUEUED_BYTES_PER_PIXEL = 24
+
+# Smallest row strip, in halos: each strip also converts a halo of rows on
+# either side, so past this the recomputed rows add more than a quarter to the
+# math and cost far more time than they save memory
+STRIP_HALOS = 8
+
+# How often the resident set size is sampled, in seconds
+SAMPLE_INTERVAL = 0.01
+
+# Longest wait for memory to come back before decoding more, in seconds
+BACKPRESSURE_WAIT = 1.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss() -> int | None:
+    """Resident set size of this process in bytes; None where unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def plane_bytes(fmt, width: int, height: int, itemsize: int) -> int:
+    """Bytes of one frame's Y, U and V planes in ``fmt`` at ``itemsize`` per sample."""
+    sx, sy = fmt.subsampling
+    return itemsize * width * height * (sx * sy + 2) // (sx * sy)
+
+
+def format_bytes(n: int) -> str:
+    if n >= 1 << 30:
+        return f"{n / (1 << 30):.1f} GiB"
+    return f"{n / (1 << 20):.0f} MiB"
+
+
+class MemoryBudget:
+    """Keeps one ``VideoConverter.process`` run within ``max_bytes`` of RSS.
+
+    ``plan`` picks the execution options before the first frame: frames per
+    batch, the number of row strips each frame's math is split into (only
+    ``threads`` strips are in flight at once, so more strips mean a smaller
+    working set), band threads, and the depth of image-sequence queues. The
+    estimate counts the memory already in use, the codecs' frame buffers and
+    the per-pixel cost of the math.
+
+    While converting, a thread samples the RSS and keeps, for each stage named
+    with ``stage``, the most it grew above its value when the stage was
+    entered. Before every batch is decoded, ``batch_size`` checks the last
+    batch: when it went over the budget, the options step down one notch
+    (queue depth, then batch size, then strips, then threads), and with nothing
+    left to lower the decoder waits while the writers are still releasing
+    memory. Strips stop at ``STRIP_HALOS`` halos high, so a budget too small
+    for the smallest options is reported instead of slowing the run down for
+    nothing. The output never depends on the options, only the speed.
+
+    Parameters:
+        max_bytes: resident memory the run should stay within
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.batch = 1
+        self.threads = 1
+        self.strips = 1
+        self.max_strips = 1
+        self.queues = []
+        self.peak = 0
+        self.growth = {}
+        self.throttled = 0
+        self.exhausted = False
+        # (name, RSS on entry), replaced in one step for the sampling thread
+        self._stage = ("open", rss() or 0)
+        self._batch_peak = 0
+        self._stop = threading.Event()
+        self._sampler = None
+
+    # === Planning ===
+
+    def _estimate(self, conv, frame_sizes, base, batch, threads, strips, depth):
+        (w, h), (ow, oh) = frame_sizes
+        in_fmt, out_fmt = conv.input_format, conv.output_format
+        out_itemsize = 1 if out_fmt.bit_depth == 8 else 2
+        # Planes held for the whole batch: float32 input, quantized output
+        held = plane_bytes(in_fmt, w, h, 4) + plane_bytes(out_fmt, ow, oh, out_itemsize)
+        align, halo = conv._band_layout()
+        band_rows = min(oh, -(-oh // strips) + 2 * align * halo)
+        math = min(threads, strips) * band_rows * ow * MATH_BYTES_PER_PIXEL
+        queued = depth * w * h * QUEUED_BYTES_PER_PIXEL * len(self.queues)
+        return base + batch * (held + math) + queued
+
+    def plan(
+        self,
+        conv,
+        width,
+        height,
+        batch_size,
+        threads,
+        queues=(),
+        decoder=True,
+        encoder=None,
+    ) -> tuple:
+        """Fit ``batch_size`` and ``threads`` (upper limits) into the budget.
+
+        Parameters:
+            conv: converter with its input opened
+            width, height: input frame size
+            queues: sources and writers with a ``depth`` of queued frames
+            decoder: whether a PyAV decoder holds frames
+            encoder: name of the PyAV encoder holding frames, e.g. "libx264"
+
+        Returns:
+            (batch_size, threads, strips)
+        """
+        ow, oh = conv._output_size(width, height)
+        in_itemsize = 1 if conv.input_format.bit_depth == 8 else 2
+        out_itemsize = 1 if conv.output_format.bit_depth == 8 else 2
+        codecs = 0
+        if decoder:
+            fixed, frames = DECODER_COST
+            frame = plane_bytes(conv.input_format, width, height, in_itemsize)
+            codecs += fixed + frames * frame
+        if encoder:
+            # Other encoders are assumed to cost as much as x265
+            fixed, frames = ENCODER_COST.get(encoder, ENCODER_COST["libx265"])
+            frame = plane_bytes(conv.output_format, ow, oh, out_itemsize)
+            codecs += fixed + frames * frame
+        align, halo = conv._band_layout()
+        self.max_strips = max(1, oh // align // (STRIP_HALOS * halo))
+        self.queues = list(queues)
+        depth = max((q.depth for q in self.queues), default=0)
+        base = (rss() or 0) + codecs
+        sizes = ((width, height), (ow, oh))
+        batch, strips = batch_size, max(threads, 1)
+
+        def estimate():
+            return self._estimate(conv, sizes, base, batch, threads, strips, depth)
+
+        while estimate() > self.max_bytes:
+            if depth > 1:
+                depth //= 2
+            elif batch > 1:
+                batch //= 2
+            elif strips < self.max_strips:
+                strips = min(2 * strips, self.max_strips)
+            elif threads > 1:
+                threads -= 1
+            else:
+                break
+        for queue in self.queues:
+            queue.depth = min(queue.depth, max(depth, 1))
+        self.batch, self.threads, self.strips = batch, threads, strips
+
+        print(
+            f"Memory budget {format_bytes(self.max_bytes)}: batch_size={batch}, "
+            f"threads={threads}, strips={strips} "
+            f"(estimated peak {format_bytes(estimate())})"
+        )
+        if estimate() > self.max_bytes:
+            print(
+                f"Warning: the smallest options are estimated to need "
+                f"{format_bytes(estimate())}, over the budget; the run will go "
+                f"over it"
+            )
+        return batch, threads, strips
+
+    # === Tracking ===
+
+    def _sample(self):
+        current = rss()
+        if current is None:
+            return
+        stage, entry = self._stage
+        self.growth[stage] = max(self.growth.get(stage, 0), current - entry)
+        self.peak = max(self.peak, current)
+        self._batch_peak = max(self._batch_peak, current)
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self._sample()
+
+    def start(self):
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        self._sample()
+
+    def stage(self, name: str):
+        """Attribute the memory from now on to stage ``name``."""
+        self._sample()
+        self._stage = (name, rss() or 0)
+
+    # === Backpressure ===
+
+    def _step_down(self) -> bool:
+        for queue in self.queues:
+            if queue.depth > 1:
+                queue.depth //= 2
+                return True
+        if self.batch > 1:
+            self.batch //= 2
+        elif self.strips < self.max_strips:
+            self.strips = min(2 * self.strips, self.max_strips)
+        elif self.threads > 1:
+            self.threads -= 1
+        else:
+            return False
+        return True
+
+    def _wait(self):
+        """Hold off decoding while writers are still giving memory back."""
+        deadline = time.monotonic() + BACKPRESSURE_WAIT
+        previous = rss() or 0
+        while previous > self.max_bytes and time.monotonic() < deadline:
+            time.sleep(SAMPLE_INTERVAL)
+            current = rss() or 0
+            if current >= previous:
+                break
+            previous = current
+
+    def batch_size(self) -> int:
+        """Frames to decode for the next batch, once memory allows it."""
+        self.stage("decode")
+        if self._batch_peak > self.max_bytes:
+            self.throttled += 1
+            if not self._step_down():
+                if not self.exhausted:
+                    self.exhausted = True
+                    print(
+                        f"Warning: over the memory budget with the smallest "
+                        f"options (batch_size=1, threads=1, strips={self.strips})"
+                    )
+                self._wait()
+        self._batch_peak = 0
+        return self.batch
+
+    def report(self):
+        """Print the peak RSS and how much each stage added to it."""
+        if not self.growth:
+            print("Peak memory: not available on this platform")
+            return
+        print(
+            f"Peak memory {format_bytes(self.peak)} (budget "
+            f"{format_bytes(self.max_bytes)}); most added by stage:"
+        )
+        for stage, growth in self.growth.items():
+            print(f"  {stage:8} {format_bytes(growth):>10}")
+        if self.throttled:
+            print(
+                f"Went over the budget {self.throttled} times; finished with "
+                f"batch_size={self.batch}, threads={self.threads}, "
+                f"strips={self.strips}"
+            )
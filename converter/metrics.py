@@ -0,0 +1,267 @@
+import csv
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import av
+import numpy as np
+
+from utils.metrics import delta_e_itp, downscale, ictcp, psnr
+
+from .base import VideoConverter
+
+
+class QualityMetrics:
+    """Objective quality of a conversion against a reference, while it runs.
+
+    Every ``every``-th output frame is compared with the matching reference
+    frame: PSNR of the Y, U and V planes in code values, and the mean and
+    maximum ΔE ITP (BT.2124) of the displayed colours. Planes are box-filtered
+    down by ``downscale`` first, and ΔE is computed at chroma resolution, so
+    the cost stays a small fraction of the conversion itself.
+
+    Parameters:
+        reference: a video in the output format (e.g. an FFmpeg conversion of
+            the same input), a directory holding ``<converter><ext>`` such as
+            ``output/ffmpeg``, or a ``VideoConverter`` with the same source
+            format whose conversion of the sampled input frames is the
+            reference (e.g. another chroma filter). The latter converts every
+            sampled frame twice, so use a larger ``every`` with it.
+        path: optional per-frame report, CSV or JSON by extension
+        every: compare every n-th frame
+        downscale: integer box-filter factor applied before comparing
+    """
+
+    FIELDS = (
+        "frame",
+        "psnr_y",
+        "psnr_u",
+        "psnr_v",
+        "delta_e_itp_mean",
+        "delta_e_itp_max",
+    )
+
+    def __init__(
+        self,
+        reference,
+        path: str | None = None,
+        every: int = 10,
+        downscale: int = 2,
+    ):
+        if every < 1:
+            raise ValueError(f"every must be >= 1, got {every}")
+        if downscale < 1:
+            raise ValueError(f"downscale must be >= 1, got {downscale}")
+        if path is not None and os.path.splitext(path)[1].lower() not in (
+            ".csv",
+            ".json",
+        ):
+            raise ValueError(f"Metrics path must end in .csv or .json: {path}")
+        self.reference = reference
+        self.path = path
+        self.every = every
+        self.downscale = downscale
+        self.rows = []
+        self._container = None
+        self._frames = None
+        self._pool = None
+        self._pending = None
+        self._index = 0
+
+    def _reference_path(self, conv: VideoConverter) -> str:
+        if os.path.isdir(self.reference):
+            ext = os.path.splitext(conv.output_path)[1]
+            return os.path.join(
+                self.reference, f"{conv.__class__.__name__.lower()}{ext}"
+            )
+        return self.reference
+
+    def open(self, conv: VideoConverter):
+        """Start comparing the output of ``conv``."""
+        self.rows = []
+        self._index = 0
+        if isinstance(self.reference, VideoConverter):
+            if self.reference.src_format != conv.src_format:
+                raise ValueError("Reference converter has a different source format")
+            # The reference converts the same decoded planes
+            self.reference._input_format = conv.input_format
+            if self.reference.output_format != conv.output_format:
+                raise ValueError("Reference converter has a different output format")
+            return
+
+        path = self._reference_path(conv)
+        self._container = av.open(path)
+        stream = self._container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if stream.format.name != conv.output_format.pix_fmt:
+            self.close()
+            raise ValueError(
+                f"Reference {path} is {stream.format.name}, "
+                f"expected {conv.output_format.pix_fmt}"
+            )
+        self._conv = conv
+        self._frames = self._container.decode(stream)
+        # The reference is decoded one batch ahead on a thread of its own, so
+        # on a multi-core host its decoding overlaps the conversion
+        self._pool = ThreadPoolExecutor(1)
+        self._buffer = []
+        self._pending = None
+
+    def close(self):
+        if self._pending is not None:
+            # Let the prefetch finish before its container goes away
+            self._pending.exception()
+            self._pending = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+            self._frames = None
+
+    def _decode(self, first: int, count: int) -> list:
+        """Decode the next ``count`` reference frames, numbered from ``first``.
+
+        Only the frames that will be compared are read; the others are None.
+        """
+        items = []
+        for index in range(first, first + count):
+            frame = next(self._frames, None)
+            if frame is None:
+                break
+            if index % self.every:
+                items.append(None)
+                continue
+            planes = self._conv._read_planes(frame, self._conv.output_format)
+            items.append(((frame.width, frame.height), planes))
+        return items
+
+    def _reference_planes(self, conv, planes_in, picks, count, w, h):
+        """Quantized reference planes of the picked frames of a batch, if any."""
+        if self._frames is None:
+            if not picks:
+                return None
+            y, u, v = (p[picks] for p in planes_in)
+            return self.reference._convert_planes(y, u, v, w, h)
+
+        items = self._buffer
+        if self._pending is not None:
+            items += self._pending.result()
+            self._pending = None
+        if len(items) < count:
+            items += self._decode(self._index + len(items), count - len(items))
+        if len(items) < count:
+            raise ValueError("Reference has fewer frames than the input")
+        self._buffer = items[count:]
+        # Assume the next batch has the same size
+        ahead = self._index + count + len(self._buffer)
+        self._pending = self._pool.submit(self._decode, ahead, count)
+
+        planes = []
+        for i in picks:
+            size, frame_planes = items[i]
+            if size != (w, h):
+                raise ValueError(
+                    f"Reference frame is {size[0]}x{size[1]}, expected {w}x{h}"
+                )
+            planes.append(frame_planes)
+        if not planes:
+            return None
+        return tuple(np.stack(p) for p in zip(*planes))
+
+    def update(self, conv: VideoConverter, planes_in, planes_out, w, h):
+        """Compare the sampled frames of one converted (N, H, W) batch.
+
+        Parameters:
+            conv: the converter producing the batch
+            planes_in: decoded input (y, u, v) planes of the batch
+            planes_out: quantized output (y, u, v) planes of the batch
+        """
+        count = planes_out[0].shape[0]
+        picks = [i for i in range(count) if (self._index + i) % self.every == 0]
+        first = self._index
+        ref = self._reference_planes(conv, planes_in, picks, count, w, h)
+        self._index += count
+        if ref is None:
+            return
+        out = tuple(p[picks] for p in planes_out)
+
+        k = self.downscale
+        peak = float((1 << conv.output_format.bit_depth) - 1)
+        scaled_out = [downscale(p, k) for p in out]
+        scaled_ref = [downscale(p, k) for p in ref]
+
+        # ΔE at chroma resolution: luma is averaged over each chroma sample
+        subsampling = conv.output_format.subsampling
+
+        def display(y, u, v):
+            y = downscale(y, subsampling)
+            rows = min(y.shape[-2], u.shape[-2])
+            cols = min(y.shape[-1], u.shape[-1])
+            y, u, v = (p[..., :rows, :cols] for p in (y, u, v))
+            return ictcp(conv._display_light(y, u, v))
+
+        diff = delta_e_itp(display(*scaled_out), display(*scaled_ref))
+
+        for j, i in enumerate(picks):
+            self.rows.append(
+                {
+                    "frame": first + i,
+                    "psnr_y": psnr(scaled_out[0][j], scaled_ref[0][j], peak),
+                    "psnr_u": psnr(scaled_out[1][j], scaled_ref[1][j], peak),
+                    "psnr_v": psnr(scaled_out[2][j], scaled_ref[2][j], peak),
+                    "delta_e_itp_mean": float(diff[j].mean()),
+                    "delta_e_itp_max": float(diff[j].max()),
+                }
+            )
+
+    def summary(self) -> dict:
+        """Averages over the compared frames (max for the ΔE maximum)."""
+        if not self.rows:
+            return {}
+        result = {"frames": len(self.rows)}
+        for field in self.FIELDS[1:]:
+            values = [row[field] for row in self.rows]
+            if field == "delta_e_itp_max":
+                result[field] = max(values)
+            else:
+                result[field] = sum(values) / len(values)
+        return result
+
+    def finish(self):
+        """Write the per-frame report and print the summary."""
+        if self.path is not None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.path.lower().endswith(".json"):
+                report = {"frames": self.rows, "summary": self.summary()}
+                with open(self.path, "w") as f:
+                    # JSON has no infinity; identical planes are reported as null
+                    json.dump(_finite(report), f, indent=2)
+            else:
+                with open(self.path, "w", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                    writer.writeheader()
+                    writer.writerows(self.rows)
+
+        s = self.summary()
+        if not s:
+            print("Metrics: no frames compared")
+            return
+        print(
+            f"Metrics over {s['frames']} frames: PSNR Y {s['psnr_y']:.2f} "
+            f"U {s['psnr_u']:.2f} V {s['psnr_v']:.2f} dB, ΔE ITP mean "
+            f"{s['delta_e_itp_mean']:.3f} max {s['delta_e_itp_max']:.3f}"
+        )
+
+
+def _finite(value):
+    """Replace infinite floats in a nested report by None."""
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_finite(v) for v in value]
+    if isinstance(value, float) and math.isinf(value):
+        return None
+    return value
@@ -0,0 +1,165 @@
+import math
+import os
+import time
+
+import av
+import numpy as np
+
+from utils.metrics import downscale as box_downscale
+
+from .base import VideoConverter
+from .media import RawFrame, StreamInfo, is_sequence, planes_to_rgb, write_image
+
+# Outputs written as a single contact-sheet image instead of a video
+SHEET_EXTENSIONS = (".png",)
+
+
+class Preview:
+    """Quick low-resolution look at a conversion before running it in full.
+
+    Only keyframes, or roughly every n-th frame, are decoded: PyAV is told to
+    skip the other frames (``skip_frame``) so most of them are never
+    reconstructed. The decoded planes are box-filtered down before
+    ``decode_to_linear`` and converted with the converter's own math, then
+    written to ``conv.output_path``: a short video (or raw YUV file / image
+    sequence, see ``media``), or a contact sheet of the frames for a plain
+    ``.png`` path (16-bit for HDR outputs, which hold the PQ/HLG signal).
+
+    Parameters:
+        conv: converter whose math is previewed
+        every: take about every n-th frame; None for keyframes only
+        downscale: integer factor the frames are shrunk by
+        max_frames: stop after this many preview frames
+    """
+
+    def __init__(
+        self,
+        conv: VideoConverter,
+        every: int | None = None,
+        downscale: int = 4,
+        max_frames: int = 24,
+    ):
+        if every is not None and every < 1:
+            raise ValueError(f"every must be >= 1, got {every}")
+        if downscale < 1:
+            raise ValueError(f"downscale must be >= 1, got {downscale}")
+        if max_frames < 1:
+            raise ValueError(f"max_frames must be >= 1, got {max_frames}")
+        self.conv = conv
+        self.every = every
+        self.downscale = downscale
+        self.max_frames = max_frames
+
+    def _select(self, container, stream):
+        """Yield the decoded frames the preview is made of."""
+        if self.every is None:
+            stream.codec_context.skip_frame = "NONKEY"
+        elif self.every > 1:
+            # Frames nothing else refers to can be dropped without decoding
+            stream.codec_context.skip_frame = "NONREF"
+        rate = stream.average_rate or 25
+        interval = float(self.every / rate) if self.every else 0.0
+
+        taken = 0
+        next_time = None
+        for frame in container.decode(stream):
+            # With skipped frames the n-th frame may not be decoded; take the
+            # first one at or after its time instead
+            t = frame.time if frame.time is not None else 0.0
+            if next_time is not None and t < next_time - 1e-6:
+                continue
+            next_time = t + interval
+            yield frame
+            taken += 1
+            if taken == self.max_frames:
+                return
+
+    def _convert(self, frame):
+        """Shrink and convert one frame; return the output planes and size."""
+        conv = self.conv
+        y, u, v = conv._read_planes(frame)
+        k = self.downscale
+        u, v = box_downscale(u, k), box_downscale(v, k)
+        # Keep exactly the luma rows/columns of whole chroma samples
+        sx, sy = conv.input_format.subsampling
+        h, w = sy * u.shape[0], sx * u.shape[1]
+        y = box_downscale(y, k)[:h, :w]
+        y_out, u_out, v_out = conv._convert_planes(y, u, v, w, h)
+        return (y_out, u_out, v_out), w, h
+
+    def _write_video(self, input_stream, frames):
+        conv = self.conv
+        _, _, w, h = frames[0]
+        # Open the output at the preview size; raw YUV and image-sequence paths
+        # get a writer instead of an encoder stream, as in process()
+        stream = StreamInfo(
+            w, h, input_stream.average_rate, len(frames), input_stream.pix_fmt
+        )
+        output_container, output_stream = conv._open_output(stream)
+        if output_stream is not None:
+            # Speed matters more than bitrate for a throwaway preview
+            output_stream.options = {
+                **conv._get_encoder_options(),
+                "preset": "ultrafast",
+            }
+        try:
+            for (pts, time_base), planes, w, h in frames:
+                timing = RawFrame((), w, h, pts, time_base)
+                batch = (plane[None] for plane in planes)
+                conv._mux_batch([timing], *batch, output_container, output_stream)
+            if output_stream is not None:
+                for pkt in output_stream.encode():
+                    output_container.mux(pkt)
+        finally:
+            output_container.close()
+
+    def _to_rgb(self, planes) -> np.ndarray:
+        """Interleaved RGB signal of quantized output planes."""
+        fmt = self.conv.output_format
+        bits = 8 if fmt.bit_depth == 8 else 16
+        return planes_to_rgb(*planes, fmt, self.conv.chroma_filter, bits)
+
+    def _write_sheet(self, frames):
+        """Tile the preview frames into one image, in reading order."""
+        _, _, w, h = frames[0]
+        cols = math.ceil(math.sqrt(len(frames)))
+        rows = math.ceil(len(frames) / cols)
+        tiles = [self._to_rgb(planes) for _, planes, w, h in frames]
+        sheet = np.zeros((rows * h, cols * w, 3), dtype=tiles[0].dtype)
+        for i, tile in enumerate(tiles):
+            r, c = divmod(i, cols)
+            sheet[r * h : r * h + h, c * w : c * w + w] = tile
+        write_image(self.conv.output_path, sheet)
+
+    def process(self):
+        """Write the preview to the converter's ``output_path``."""
+        conv = self.conv
+        start = time.perf_counter()
+        input_container = av.open(conv.input_path)
+        try:
+            input_stream = input_container.streams.video[0]
+            input_stream.thread_type = "AUTO"
+            conv._use_input(input_stream)
+            print(f"Previewing: {conv.input_path} -> {conv.output_path}")
+            frames = []
+            # Frames of another size can't share the output; stop at the first
+            for frame in self._select(input_container, input_stream):
+                planes, w, h = self._convert(frame)
+                if frames and (w, h) != frames[0][2:]:
+                    break
+                # Keep the timing only, not the full-size decoded frame
+                frames.append(((frame.pts, frame.time_base), planes, w, h))
+            if not frames:
+                raise ValueError(f"No frames decoded from {conv.input_path}")
+
+            ext = os.path.splitext(conv.output_path)[1].lower()
+            if ext in SHEET_EXTENSIONS and not is_sequence(conv.output_path):
+                self._write_sheet(frames)
+            else:
+                self._write_video(input_stream, frames)
+        finally:
+            input_container.close()
+
+        _, _, w, h = frames[0]
+        elapsed = time.perf_counter() - start
+        print(f"{len(frames)} frames at {w}x{h} in {elapsed:.1f}s")
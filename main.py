@@ -2,26 +2,19 @@ import argparse
 import os
 import sys
 
-from converter import (
-    HLG,
-    HLG2PQ,
-    HLG2SDR,
-    PQ,
-    PQ2HLG,
-    PQ2SDR,
-    SDR,
-    SDR2HLG,
-    SDR2PQ,
-    Rewrap,
-)
+import converter
+from converter import HLG, PIX_FMTS, PQ, SDR
+from service import DEFAULT_HOST, DEFAULT_PORT, request
 
+# Class names are resolved lazily so that commands which don't convert anything
+# never import av or numpy.
 CONVERTERS = {
-    "sdr2pq": SDR2PQ,
-    "sdr2hlg": SDR2HLG,
-    "pq2sdr": PQ2SDR,
-    "hlg2sdr": HLG2SDR,
-    "pq2hlg": PQ2HLG,
-    "hlg2pq": HLG2PQ,
+    "sdr2pq": "SDR2PQ",
+    "sdr2hlg": "SDR2HLG",
+    "pq2sdr": "PQ2SDR",
+    "hlg2sdr": "HLG2SDR",
+    "pq2hlg": "PQ2HLG",
+    "hlg2pq": "HLG2PQ",
 }
 
 FORMATS = {
@@ -31,6 +24,190 @@ FORMATS = {
 }
 
 
+CHROMA_FILTERS = ("bilinear", "catmull-rom", "lanczos")
+
+MAX_MEMORY_HELP = (
+    "Resident memory to stay within, e.g. 4G; batches, threads and row strips "
+    "are sized to fit and lowered while converting when it is exceeded"
+)
+
+
+def parse_scale(value):
+    width, sep, height = value.lower().partition("x")
+    try:
+        size = (int(width), int(height))
+    except ValueError:
+        size = None
+    if not sep or size is None or min(size) < 2 or size[0] % 2 or size[1] % 2:
+        raise argparse.ArgumentTypeError("expected WxH with even sizes, e.g. 1920x1080")
+    return size
+
+
+def add_scale_arg(sub):
+    sub.add_argument(
+        "--scale",
+        type=parse_scale,
+        metavar="WxH",
+        help="Output size; frames are scaled before the conversion math",
+    )
+
+
+def add_execution_args(sub):
+    sub.add_argument(
+        "--batch-size",
+        type=int,
+        help="Frames converted together per vectorized pass "
+        "(default: autotuned, else 1)",
+    )
+    sub.add_argument(
+        "--threads",
+        type=int,
+        help="Row bands of each frame converted in parallel "
+        "(default: autotuned, else 1)",
+    )
+
+
+def add_conversion_args(sub):
+    sub.add_argument("-i", "--input", required=True, help="Input video file")
+    sub.add_argument("-o", "--output", help="Output video file (optional)")
+    add_execution_args(sub)
+    sub.add_argument(
+        "--chroma-filter",
+        choices=CHROMA_FILTERS,
+        default="bilinear",
+        help="Chroma resampling filter (default: bilinear)",
+    )
+    add_scale_arg(sub)
+    sub.add_argument(
+        "--pix-fmt",
+        choices=PIX_FMTS,
+        metavar="PIX_FMT",
+        help="Output chroma layout and bit depth, e.g. yuv422p10le "
+        "(default: the input's chroma layout at the format's bit depth)",
+    )
+
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_bytes(value):
+    number = value.strip().upper().removesuffix("B")
+    unit = number[-1:] if number[-1:] in SIZE_UNITS else ""
+    try:
+        size = int(float(number.removesuffix(unit)) * SIZE_UNITS[unit])
+    except ValueError:
+        size = 0
+    if size < 1:
+        raise argparse.ArgumentTypeError("expected a size such as 500M or 20G")
+    return size
+
+
+def add_cache_args(sub):
+    sub.add_argument(
+        "--cache",
+        metavar="DIR",
+        help="Reuse outputs of identical earlier conversions kept in DIR",
+    )
+    sub.add_argument(
+        "--cache-size",
+        type=parse_bytes,
+        metavar="SIZE",
+        help="Evict least recently used cache entries beyond SIZE, e.g. 20G "
+        "(default: no limit)",
+    )
+
+
+def add_memory_arg(sub, help_text):
+    sub.add_argument("--max-memory", type=parse_bytes, metavar="SIZE", help=help_text)
+
+
+def open_cache(args):
+    if not getattr(args, "cache", None):
+        return None
+    return converter.OutputCache(args.cache, args.cache_size)
+
+
+def parse_sizes(value):
+    try:
+        return [parse_scale(size) for size in value.split(",") if size.strip()]
+    except argparse.ArgumentTypeError:
+        raise argparse.ArgumentTypeError(
+            "expected comma-separated WxH sizes, e.g. 1920x1080,3840x2160"
+        ) from None
+
+
+def add_metrics_args(sub):
+    sub.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Write per-frame PSNR / ΔE ITP against --metrics-ref to a .csv or .json",
+    )
+    sub.add_argument(
+        "--metrics-ref",
+        metavar="PATH",
+        help="Reference video, or a directory of <command>.mp4 like output/ffmpeg",
+    )
+    sub.add_argument(
+        "--metrics-every",
+        type=int,
+        default=10,
+        help="Compare every n-th frame (default: 10)",
+    )
+    sub.add_argument(
+        "--metrics-downscale",
+        type=int,
+        default=2,
+        help="Box-filter factor applied before comparing (default: 2)",
+    )
+
+
+def parse_targets(value):
+    targets = list(dict.fromkeys(t.strip() for t in value.split(",") if t.strip()))
+    unknown = [t for t in targets if t not in FORMATS]
+    if not targets or unknown:
+        raise argparse.ArgumentTypeError(
+            f"expected a comma-separated list of {', '.join(FORMATS)}"
+        )
+    return targets
+
+
+def add_service_args(sub):
+    sub.add_argument(
+        "--host", default=DEFAULT_HOST, help=f"Service host (default: {DEFAULT_HOST})"
+    )
+    sub.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Service port (default: {DEFAULT_PORT})",
+    )
+    sub.add_argument("--socket", help="Unix socket path (overrides --host/--port)")
+
+
+def default_output(command, src=None, dst=None):
+    if command == "rewrap":
+        return f"output/rewrap/test_{src}2{dst}_rewrapped.mp4"
+    return f"output/test_{command}.mp4"
+
+
+def make_output_dir(output):
+    output_dir = os.path.dirname(output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+
+def call_service(args, payload):
+    try:
+        reply = request(payload, args.host, args.port, args.socket)
+    except OSError as e:
+        print(f"Error: Cannot reach service: {e}")
+        sys.exit(1)
+    if not reply["ok"]:
+        print(f"Error: {reply['error']}")
+        sys.exit(1)
+    return reply
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Convert video between SDR, PQ (HDR10), and HLG formats",
@@ -45,6 +222,11 @@ Examples:
   uv run main.py rewrap -i test_hlg.mp4 --src hlg --dst sdr
   python main.py list
   uv run main.py list
+  python main.py convert -i test_hlg.mp4 --to sdr,pq,hlg
+  python main.py preview hlg2sdr -i test_hlg.mp4 --every 10 -o sheet.png
+  python main.py serve --workers 4
+  python main.py submit hlg2sdr -i test_hlg.mp4 --priority 10
+  python main.py status
         """,
     )
 
@@ -55,15 +237,158 @@ Examples:
 
     for name in CONVERTERS:
         sub = subparsers.add_parser(name, help=f"Convert {name.replace('2', ' -> ')}")
-        sub.add_argument("-i", "--input", required=True, help="Input video file")
-        sub.add_argument("-o", "--output", help="Output video file (optional)")
+        add_conversion_args(sub)
+        add_metrics_args(sub)
+        add_cache_args(sub)
+        add_memory_arg(sub, MAX_MEMORY_HELP)
+
+    # One decode, several outputs
+    convert = subparsers.add_parser(
+        "convert", help="Convert one input to several formats in a single pass"
+    )
+    convert.add_argument("-i", "--input", required=True, help="Input video file")
+    convert.add_argument(
+        "--to",
+        type=parse_targets,
+        required=True,
+        help="Comma-separated target formats, e.g. sdr,pq,hlg",
+    )
+    convert.add_argument(
+        "--from",
+        dest="src",
+        choices=FORMATS.keys(),
+        help="Source format (default: detected from the stream metadata)",
+    )
+    convert.add_argument(
+        "-o",
+        "--output-dir",
+        default="output",
+        help="Directory for the outputs, named <input>_<format> (default: output)",
+    )
+    add_execution_args(convert)
+    convert.add_argument(
+        "--chroma-filter",
+        choices=CHROMA_FILTERS,
+        default="bilinear",
+        help="Chroma resampling filter (default: bilinear)",
+    )
+    add_scale_arg(convert)
+
+    # Quick low-resolution look at a conversion
+    preview = subparsers.add_parser(
+        "preview", help="Preview a conversion on a few shrunken frames"
+    )
+    preview.add_argument(
+        "conversion", choices=[*CONVERTERS], help="Conversion to preview"
+    )
+    preview.add_argument("-i", "--input", required=True, help="Input video file")
+    preview.add_argument(
+        "-o",
+        "--output",
+        help="Short video, or a .png contact sheet "
+        "(default: output/preview_<conversion>.mp4)",
+    )
+    preview.add_argument(
+        "--every",
+        type=int,
+        help="Take about every n-th frame (default: keyframes only)",
+    )
+    preview.add_argument(
+        "--downscale",
+        type=int,
+        default=4,
+        help="Shrink frames by this factor before converting (default: 4)",
+    )
+    preview.add_argument(
+        "--max-frames",
+        type=int,
+        default=24,
+        help="Stop after this many frames (default: 24)",
+    )
+    preview.add_argument(
+        "--chroma-filter",
+        choices=CHROMA_FILTERS,
+        default="bilinear",
+        help="Chroma resampling filter (default: bilinear)",
+    )
+
+    # Per-host calibration of the execution options
+    autotune = subparsers.add_parser(
+        "autotune", help="Calibrate batch size and threads for this host"
+    )
+    autotune.add_argument(
+        "--commands",
+        type=lambda value: [c.strip() for c in value.split(",") if c.strip()],
+        default=list(CONVERTERS),
+        help="Comma-separated conversions to calibrate (default: all)",
+    )
+    autotune.add_argument(
+        "--sizes",
+        type=parse_sizes,
+        default=[(1920, 1080), (3840, 2160)],
+        help="Comma-separated frame sizes (default: 1920x1080,3840x2160)",
+    )
+    autotune.add_argument(
+        "--frames",
+        type=int,
+        default=8,
+        help="Synthetic frames converted per measurement (default: 8)",
+    )
+    autotune.add_argument(
+        "--profile",
+        help="Profile to update (default: per-host file under ~/.cache, "
+        "or $HDR_CONVERTER_PROFILE)",
+    )
+
+    # Conversion service
+    serve_cmd = subparsers.add_parser(
+        "serve", help="Run a long-lived conversion service"
+    )
+    serve_cmd.add_argument(
+        "--workers", type=int, help="Worker processes (default: CPU count)"
+    )
+    add_cache_args(serve_cmd)
+    add_memory_arg(
+        serve_cmd,
+        "Resident memory shared by the workers, e.g. 16G; each job "
+        "gets an equal share (see --max-memory of the conversion commands)",
+    )
+    add_service_args(serve_cmd)
+
+    submit = subparsers.add_parser("submit", help="Submit a job to a running service")
+    submit.add_argument(
+        "job_command",
+        metavar="command",
+        choices=[*CONVERTERS, "rewrap"],
+        help="Conversion to run",
+    )
+    add_conversion_args(submit)
+    submit.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="Higher runs first (default: 0)",
+    )
+    submit.add_argument("--src", choices=FORMATS.keys(), default="pq")
+    submit.add_argument("--dst", choices=FORMATS.keys(), default="hlg")
+    add_service_args(submit)
+
+    status = subparsers.add_parser("status", help="Show service jobs and metrics")
+    status.add_argument("job", type=int, nargs="?", help="Job id (default: all)")
+    add_service_args(status)
+
+    cancel = subparsers.add_parser("cancel", help="Cancel a service job")
+    cancel.add_argument("job", type=int, help="Job id")
+    add_service_args(cancel)
 
     # Rewrap command (no transfer conversion)
     rewrap = subparsers.add_parser(
         "rewrap", help="Rewrap without transfer conversion (for comparison)"
     )
-    rewrap.add_argument("-i", "--input", required=True, help="Input video file")
-    rewrap.add_argument("-o", "--output", help="Output video file (optional)")
+    add_conversion_args(rewrap)
+    add_metrics_args(rewrap)
+    add_cache_args(rewrap)
+    add_memory_arg(rewrap, MAX_MEMORY_HELP)
     rewrap.add_argument(
         "--src",
         choices=FORMATS.keys(),
@@ -77,7 +402,18 @@ Examples:
         help="Destination format (default: hlg)",
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if getattr(args, "metrics", None) and not args.metrics_ref:
+        parser.error("--metrics requires --metrics-ref")
+    if getattr(args, "cache_size", None) and not args.cache:
+        parser.error("--cache-size requires --cache")
+    if args.command == "autotune":
+        unknown = [c for c in args.commands if c not in CONVERTERS]
+        if unknown:
+            parser.error(f"unknown commands: {', '.join(unknown)}")
+        if args.frames < 1:
+            parser.error("--frames must be >= 1")
+    return args
 
 
 def main():
@@ -101,38 +437,173 @@ def main():
         print("  hlg  - BT.2100 HLG, 10-bit")
         return
 
+    if args.command == "autotune":
+        from converter.autotune import autotune
+
+        converters = {
+            name: getattr(converter, CONVERTERS[name]) for name in args.commands
+        }
+        path = autotune(converters, args.sizes, args.frames, args.profile)
+        print(f"Profile written to {path}")
+        return
+
+    if args.command == "serve":
+        from service.server import serve
+
+        serve(
+            CONVERTERS | {"rewrap": "Rewrap"},
+            FORMATS,
+            args.host,
+            args.port,
+            socket_path=args.socket,
+            workers=args.workers,
+            cache=open_cache(args),
+            max_memory=args.max_memory,
+        )
+        return
+
+    if args.command == "submit":
+        output = args.output or default_output(args.job_command, args.src, args.dst)
+        make_output_dir(output)
+        # The service may run from another directory
+        reply = call_service(
+            args,
+            {
+                "op": "submit",
+                "command": args.job_command,
+                "input": os.path.abspath(args.input),
+                "output": os.path.abspath(output),
+                "priority": args.priority,
+                "batch_size": args.batch_size,
+                "threads": args.threads,
+                "chroma_filter": args.chroma_filter,
+                "scale": args.scale,
+                "pix_fmt": args.pix_fmt,
+                "src": args.src,
+                "dst": args.dst,
+            },
+        )
+        print(f"Submitted job {reply['job']['id']}: {args.input} -> {output}")
+        return
+
+    if args.command == "status":
+        import json
+
+        if args.job is not None:
+            reply = call_service(args, {"op": "status", "job": args.job})
+            print(json.dumps(reply["job"], indent=2))
+            return
+        jobs = call_service(args, {"op": "status"})["jobs"]
+        metrics = call_service(args, {"op": "metrics"})["metrics"]
+        for job in jobs:
+            total = job["total_frames"] or "?"
+            print(
+                f"  {job['id']:>4} {job['state']:10} {job['command']:8} "
+                f"{job['frames']}/{total} frames  {job['input']}"
+            )
+        print(json.dumps(metrics, indent=2))
+        return
+
+    if args.command == "cancel":
+        reply = call_service(args, {"op": "cancel", "job": args.job})
+        print(f"Job {args.job}: {reply['job']['state']}")
+        return
+
     # Validate input file
-    if not os.path.exists(args.input):
+    # Image sequences are a pattern such as frame_%04d.png, checked when opened
+    if "%" not in args.input and not os.path.exists(args.input):
         print(f"Error: Input file not found: {args.input}")
         sys.exit(1)
 
+    if args.command == "convert":
+        stem, ext = os.path.splitext(os.path.basename(args.input))
+        outputs = {
+            FORMATS[name]: os.path.join(args.output_dir, f"{stem}_{name}{ext}")
+            for name in args.to
+        }
+        os.makedirs(args.output_dir, exist_ok=True)
+        fan_out = converter.FanOut(
+            args.input,
+            outputs,
+            src_fmt=FORMATS[args.src] if args.src else None,
+            chroma_filter=args.chroma_filter,
+            scale=args.scale,
+        )
+        try:
+            fan_out.process(batch_size=args.batch_size, threads=args.threads)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+
+    if args.command == "preview":
+        output = args.output or f"output/preview_{args.conversion}.mp4"
+        make_output_dir(output)
+        converter_cls = getattr(converter, CONVERTERS[args.conversion])
+        preview = converter.Preview(
+            converter_cls(args.input, output, chroma_filter=args.chroma_filter),
+            every=args.every,
+            downscale=args.downscale,
+            max_frames=args.max_frames,
+        )
+        try:
+            preview.process()
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+
     # Generate output path if not specified
     output = args.output
     if output is None:
-        if args.command == "rewrap":
-            output = f"output/rewrap/test_{args.src}2{args.dst}_rewrapped.mp4"
-        else:
-            output = f"output/test_{args.command}.mp4"
-
-    output_dir = os.path.dirname(output)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+        output = default_output(
+            args.command, getattr(args, "src", None), getattr(args, "dst", None)
+        )
+    make_output_dir(output)
 
     if args.command == "rewrap":
-        converter = Rewrap(
+        video_converter = converter.Rewrap(
             args.input,
             output,
             src_fmt=FORMATS[args.src],
             dst_fmt=FORMATS[args.dst],
+            chroma_filter=args.chroma_filter,
+            scale=args.scale,
+            pix_fmt=args.pix_fmt,
         )
     elif args.command in CONVERTERS:
-        converter_cls = CONVERTERS[args.command]
-        converter = converter_cls(args.input, output)
+        converter_cls = getattr(converter, CONVERTERS[args.command])
+        video_converter = converter_cls(
+            args.input,
+            output,
+            chroma_filter=args.chroma_filter,
+            scale=args.scale,
+            pix_fmt=args.pix_fmt,
+        )
     else:
         print(f"Unknown command: {args.command}")
         sys.exit(1)
 
-    converter.process()
+    metrics = None
+    if args.metrics_ref:
+        metrics = converter.QualityMetrics(
+            args.metrics_ref,
+            args.metrics,
+            every=args.metrics_every,
+            downscale=args.metrics_downscale,
+        )
+
+    try:
+        video_converter.process(
+            batch_size=args.batch_size,
+            threads=args.threads,
+            metrics=metrics,
+            cache=open_cache(args),
+            max_memory=args.max_memory,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
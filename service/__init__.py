@@ -0,0 +1,40 @@
+"""Long-lived conversion service.
+
+Clients talk to the service over a localhost TCP or Unix socket using one JSON
+object per line. Every request has an ``op`` field:
+
+- ``submit``: queue a job (``command``, ``input``, ``output``, optional
+  ``priority``, ``batch_size``, ``threads``, ``chroma_filter``, ``scale``
+  as ``[width, height]``, ``pix_fmt``, and ``src``/``dst`` for rewrap)
+- ``status``: report one job (``job``) or every job when omitted
+- ``cancel``: cancel a queued or running job (``job``)
+- ``metrics``: queue depth, job counts and throughput
+
+Replies carry ``ok``; a failed request, or a line that isn't a JSON object,
+gets ``{"ok": false, "error": ...}`` and the connection stays open.
+
+This package only holds the client side, which needs nothing beyond the
+standard library so that job submission starts quickly. The server lives in
+``service.server``.
+"""
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def request(payload: dict, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """Send one request to a running service and return its reply."""
+    # Imported here: main.py imports this package for every command
+    import json
+    import socket
+
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection((host, port))
+
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps(payload).encode() + b"\n")
+        f.flush()
+        return json.loads(f.readline())
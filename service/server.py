@@ -0,0 +1,359 @@
+"""Asyncio conversion server.
+
+Jobs run on a shared process pool whose workers import the codecs and the
+conversion math once at startup, so a job only pays for the conversion itself.
+See ``service`` for the wire protocol.
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+import converter
+
+from . import DEFAULT_HOST, DEFAULT_PORT
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its running job has been cancelled."""
+
+
+@dataclass
+class Job:
+    id: int
+    command: str
+    input: str
+    output: str
+    priority: int = 0
+    # None: the autotuned value, see converter.autotune
+    batch_size: int | None = None
+    threads: int | None = None
+    state: str = "queued"  # queued, running, cancelling, done, failed, cancelled
+    frames: int = 0
+    total_frames: int = 0
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    error: str | None = None
+
+
+def _warm_worker():
+    """Import converter math and open the encoders once per worker process."""
+    import av
+
+    import converter.converters  # noqa: F401
+
+    for codec in ("hevc", "h264"):
+        av.Codec(codec, "w")
+
+
+def _noop():
+    pass
+
+
+def _run_job(
+    job_id,
+    converter_name,
+    kwargs,
+    batch_size,
+    threads,
+    progress,
+    cancels,
+    cache,
+    max_memory,
+):
+    """Run one conversion inside a pool worker."""
+
+    def report(frames_done, total_frames):
+        progress[job_id] = (frames_done, total_frames)
+        if cancels.get(job_id):
+            raise JobCancelled(job_id)
+
+    video_converter = getattr(converter, converter_name)(**kwargs)
+    try:
+        video_converter.process(
+            batch_size=batch_size,
+            progress=report,
+            threads=threads,
+            cache=cache,
+            max_memory=max_memory,
+        )
+    except JobCancelled:
+        # Don't leave a truncated output behind
+        if os.path.exists(video_converter.output_path):
+            os.remove(video_converter.output_path)
+        raise
+
+
+class ConversionService:
+    """Queue, schedule and track conversion jobs on a process pool.
+
+    Parameters:
+        converters: mapping of command name to converter class name (rewrap included)
+        formats: mapping of format name to ``Format``, used for rewrap src/dst
+        workers: number of pool processes (default: CPU count)
+        cache: optional ``OutputCache`` shared by every job, so a repeated
+            request returns the earlier output without converting again
+        max_memory: optional resident memory in bytes for all workers; every
+            job runs with an equal share as its ``process`` budget
+    """
+
+    def __init__(
+        self,
+        converters: dict,
+        formats: dict,
+        workers: int | None = None,
+        cache=None,
+        max_memory: int | None = None,
+    ):
+        self.converters = converters
+        self.formats = formats
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.job_memory = None
+        if max_memory is not None:
+            self.job_memory = max_memory // self.workers
+        self.jobs: dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._queue: asyncio.PriorityQueue | None = None
+        self._specs: dict[int, tuple] = {}
+        self._progress = None
+        self._cancels = None
+        self._started = time.time()
+
+    async def run(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+        """Serve requests until SIGINT or SIGTERM."""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        with (
+            multiprocessing.Manager() as manager,
+            ProcessPoolExecutor(self.workers, initializer=_warm_worker) as pool,
+        ):
+            self._progress = manager.dict()
+            self._cancels = manager.dict()
+
+            # Start every worker up front so the first jobs don't pay for imports
+            await asyncio.gather(
+                *(loop.run_in_executor(pool, _noop) for _ in range(self.workers))
+            )
+            dispatchers = [
+                asyncio.create_task(self._dispatch(pool)) for _ in range(self.workers)
+            ]
+
+            if socket_path:
+                server = await asyncio.start_unix_server(self._handle, path=socket_path)
+                print(f"Serving on {socket_path} with {self.workers} workers")
+            else:
+                server = await asyncio.start_server(self._handle, host, port)
+                print(f"Serving on {host}:{port} with {self.workers} workers")
+
+            try:
+                async with server:
+                    await stop.wait()
+            finally:
+                for task in dispatchers:
+                    task.cancel()
+                for job_id in self._specs:
+                    self._cancels[job_id] = True
+
+    # === Request handling ===
+
+    async def _handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = self.handle_request(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def handle_request(self, request: dict) -> dict:
+        """Dispatch one decoded request and return the reply."""
+        if not isinstance(request, dict):
+            raise ValueError("Expected a JSON object per request")
+        op = request.get("op")
+        if op == "submit":
+            job = self.submit(request)
+            return {"ok": True, "job": asdict(job)}
+        if op == "status":
+            self._sync_progress()
+            if "job" in request:
+                return {"ok": True, "job": asdict(self._get(request["job"]))}
+            return {"ok": True, "jobs": [asdict(job) for job in self.jobs.values()]}
+        if op == "cancel":
+            job = self.cancel(request["job"])
+            return {"ok": True, "job": asdict(job)}
+        if op == "metrics":
+            return {"ok": True, "metrics": self.metrics()}
+        raise ValueError(f"Unknown op: {op}")
+
+    def submit(self, request: dict) -> Job:
+        """Validate a submit request and queue the job."""
+        command = request["command"]
+        if command not in self.converters:
+            raise ValueError(f"Unknown command: {command}")
+        input_path = request["input"]
+        # Image sequences are a pattern such as frame_%04d.png, checked when opened
+        if "%" not in input_path and not os.path.exists(input_path):
+            raise ValueError(f"Input file not found: {input_path}")
+        # None leaves them to the autotune profile of the service host
+        batch_size = request.get("batch_size")
+        if batch_size is not None:
+            batch_size = int(batch_size)
+            if batch_size < 1:
+                raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+        threads = request.get("threads")
+        if threads is not None:
+            threads = int(threads)
+            if threads < 1:
+                raise ValueError(f"threads must be >= 1, got {threads}")
+
+        kwargs = {
+            "input_path": input_path,
+            "output_path": request["output"],
+            "chroma_filter": request.get("chroma_filter", "bilinear"),
+        }
+        if request.get("scale"):
+            width, height = (int(n) for n in request["scale"])
+            if width < 2 or height < 2 or width % 2 or height % 2:
+                raise ValueError(
+                    f"scale must be even and positive, got {width}x{height}"
+                )
+            kwargs["scale"] = (width, height)
+        if request.get("pix_fmt"):
+            if request["pix_fmt"] not in converter.PIX_FMTS:
+                raise ValueError(f"Unsupported pixel format {request['pix_fmt']}")
+            kwargs["pix_fmt"] = request["pix_fmt"]
+        if command == "rewrap":
+            kwargs["src_fmt"] = self.formats[request.get("src", "pq")]
+            kwargs["dst_fmt"] = self.formats[request.get("dst", "hlg")]
+
+        job = Job(
+            id=next(self._ids),
+            command=command,
+            input=input_path,
+            output=request["output"],
+            priority=int(request.get("priority", 0)),
+            batch_size=batch_size,
+            threads=threads,
+        )
+        self.jobs[job.id] = job
+        self._specs[job.id] = (self.converters[command], kwargs)
+        # Higher priority first, FIFO within the same priority
+        self._queue.put_nowait((-job.priority, next(self._seq), job.id))
+        return job
+
+    def cancel(self, job_id: int) -> Job:
+        """Cancel a queued job immediately or ask a running one to stop."""
+        job = self._get(job_id)
+        if job.state == "queued":
+            job.state = "cancelled"
+            job.finished = time.time()
+            self._specs.pop(job.id, None)
+        elif job.state == "running":
+            job.state = "cancelling"
+            self._cancels[job.id] = True
+        return job
+
+    def metrics(self) -> dict:
+        """Queue depth, job counts and throughput since startup."""
+        self._sync_progress()
+        uptime = time.time() - self._started
+        states = Counter(job.state for job in self.jobs.values())
+        frames = sum(job.frames for job in self.jobs.values())
+        return {
+            "uptime": uptime,
+            "workers": self.workers,
+            "queue_depth": states["queued"],
+            "running": states["running"] + states["cancelling"],
+            "done": states["done"],
+            "failed": states["failed"],
+            "cancelled": states["cancelled"],
+            "frames_converted": frames,
+            "fps": frames / uptime if uptime > 0 else 0.0,
+            "jobs_per_hour": states["done"] * 3600.0 / uptime if uptime > 0 else 0.0,
+        }
+
+    def _get(self, job_id) -> Job:
+        try:
+            return self.jobs[int(job_id)]
+        except KeyError:
+            raise KeyError(f"Unknown job: {job_id}") from None
+
+    def _sync_progress(self):
+        for job_id, (frames, total) in self._progress.items():
+            job = self.jobs[job_id]
+            job.frames, job.total_frames = frames, total
+
+    # === Scheduling ===
+
+    async def _dispatch(self, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            if job.state != "queued":
+                # Cancelled while waiting in the queue
+                continue
+
+            converter_name, kwargs = self._specs[job_id]
+            job.state = "running"
+            job.started = time.time()
+            try:
+                await loop.run_in_executor(
+                    pool,
+                    _run_job,
+                    job_id,
+                    converter_name,
+                    kwargs,
+                    job.batch_size,
+                    job.threads,
+                    self._progress,
+                    self._cancels,
+                    self.cache,
+                    self.job_memory,
+                )
+            except JobCancelled:
+                job.state = "cancelled"
+            except Exception as e:
+                job.state = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+            else:
+                job.state = "done"
+            finally:
+                job.finished = time.time()
+                self._sync_progress()
+                self._progress.pop(job_id, None)
+                self._cancels.pop(job_id, None)
+                self._specs.pop(job_id, None)
+
+
+def serve(
+    converters,
+    formats,
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    socket_path=None,
+    workers=None,
+    cache=None,
+    max_memory=None,
+):
+    """Run a ``ConversionService`` until interrupted."""
+    service = ConversionService(converters, formats, workers, cache, max_memory)
+    asyncio.run(service.run(host, port, socket_path))
+    print("Stopped.")
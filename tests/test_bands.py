@@ -0,0 +1,105 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import converter
+from converter.media import DEFAULT_RATE, StreamInfo
+
+WIDTH = 96
+
+
+def make(name, pix_fmt, height, chroma_filter="bilinear"):
+    conv = getattr(converter, name)(os.devnull, os.devnull, chroma_filter=chroma_filter)
+    conv._use_input(StreamInfo(WIDTH, height, DEFAULT_RATE, 1, pix_fmt))
+    return conv
+
+
+def random_planes(fmt, height, rng, n=2):
+    s = 1 << (fmt.bit_depth - 8)
+    sx, sy = fmt.subsampling
+    y = rng.integers(16 * s, 235 * s + 1, (n, height, WIDTH))
+    # An odd last luma row shares the chroma row above it
+    shape = (n, height // sy, WIDTH // sx)
+    u = rng.integers(16 * s, 240 * s + 1, shape)
+    v = rng.integers(16 * s, 240 * s + 1, shape)
+    return tuple(p.astype(np.float32) for p in (y, u, v))
+
+
+class BandsTest(unittest.TestCase):
+    """Row bands give the same output as one whole-frame pass."""
+
+    CASES = (
+        ("HLG2SDR", "yuv420p10le"),
+        ("PQ2HLG", "yuv422p10le"),
+        ("SDR2PQ", "yuv420p"),
+    )
+    HEIGHTS = (64, 63)
+
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def assertPlanesEqual(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for a, b in zip(expected, actual):
+            self.assertEqual(a.shape, b.shape)
+            np.testing.assert_array_equal(a, b)
+
+    def test_matches_whole_frame(self):
+        rng = np.random.default_rng(0)
+        for name, pix_fmt in self.CASES:
+            for height in self.HEIGHTS:
+                for chroma_filter in ("bilinear", "lanczos"):
+                    conv = make(name, pix_fmt, height, chroma_filter)
+                    planes = random_planes(conv.input_format, height, rng)
+                    expected = conv._convert_planes(*planes, WIDTH, height)
+                    for bands in (2, 3):
+                        with self.subTest(
+                            name=name,
+                            pix_fmt=pix_fmt,
+                            height=height,
+                            chroma_filter=chroma_filter,
+                            bands=bands,
+                        ):
+                            actual = conv._convert_bands(
+                                *planes, WIDTH, height, self.pool, bands
+                            )
+                            self.assertPlanesEqual(expected, actual)
+
+    def test_without_pool(self):
+        rng = np.random.default_rng(1)
+        conv = make("HLG2SDR", "yuv420p10le", 63)
+        planes = random_planes(conv.input_format, 63, rng)
+        expected = conv._convert_planes(*planes, WIDTH, 63)
+        actual = conv._convert_bands(*planes, WIDTH, 63, None, 3)
+        self.assertPlanesEqual(expected, actual)
+
+    def test_several_outputs(self):
+        # The fan-out converts every band to several formats at once
+        rng = np.random.default_rng(2)
+        for pix_fmt in ("yuv420p10le", "yuv422p10le"):
+            with self.subTest(pix_fmt=pix_fmt):
+                sdr = make("HLG2SDR", pix_fmt, 63)
+                pq = make("HLG2PQ", pix_fmt, 63)
+
+                def convert(y, u, v, w, h):
+                    rgb_linear = sdr.decode_to_linear(y, u, v, w, h)
+                    return (
+                        *sdr.encode_from_linear(rgb_linear),
+                        *pq.encode_from_linear(rgb_linear),
+                    )
+
+                planes = random_planes(sdr.input_format, 63, rng)
+                expected = convert(*planes, WIDTH, 63)
+                actual = sdr._convert_bands(
+                    *planes, WIDTH, 63, self.pool, 3, convert=convert
+                )
+                self.assertPlanesEqual(expected, actual)
+
+
+if __name__ == "__main__":
+    unittest.main()
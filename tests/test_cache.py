@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+
+import converter
+from converter import OutputCache
+from converter.media import DEFAULT_RATE, StreamInfo
+
+WIDTH, HEIGHT = 96, 64
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class CacheTest(unittest.TestCase):
+    """Outputs are keyed by everything that shapes them and reused on a hit."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.input = os.path.join(self.dir, "in.mp4")
+        write(self.input, b"input frames")
+        self.cache = OutputCache(os.path.join(self.dir, "cache"))
+
+    def make(self, name="HLG2SDR", output="out.mp4", **options):
+        output = os.path.join(self.dir, output)
+        conv = getattr(converter, name)(self.input, output, **options)
+        conv._use_input(StreamInfo(WIDTH, HEIGHT, DEFAULT_RATE, 1, "yuv420p10le"))
+        return conv
+
+    def test_options_change_key(self):
+        key = self.cache.key(self.make())
+        self.assertEqual(key, self.cache.key(self.make()))
+
+        changed = {
+            "scale": self.make(scale=(48, 32)),
+            "chroma_filter": self.make(chroma_filter="lanczos"),
+            "pix_fmt": self.make(pix_fmt="yuv422p"),
+            "converter": self.make("HLG2PQ"),
+            "container": self.make(output="out.mkv"),
+        }
+        encoder = self.make()
+        encoder._get_encoder_options = lambda: {"crf": "18", "preset": "fast"}
+        changed["encoder"] = encoder
+        for option, conv in changed.items():
+            with self.subTest(option=option):
+                self.assertNotEqual(self.cache.key(conv), key)
+
+    def test_input_content_changes_key(self):
+        key = self.cache.key(self.make())
+        write(self.input, b"other input frames")
+        self.assertNotEqual(self.cache.key(self.make()), key)
+
+    def test_sequences_not_cached(self):
+        self.assertIsNone(self.cache.key(self.make(output="frames/%06d.png")))
+
+    def test_hit_links_stored_file(self):
+        output = os.path.join(self.dir, "out.mp4")
+        write(output, b"converted")
+        self.cache.store("k", output)
+
+        copy = os.path.join(self.dir, "copy.mp4")
+        self.assertTrue(self.cache.fetch("k", copy))
+        self.assertEqual(read(copy), b"converted")
+        self.assertTrue(os.path.samefile(copy, output))
+
+    def test_hit_copies_without_links(self):
+        cache = OutputCache(os.path.join(self.dir, "copies"), link=False)
+        output = os.path.join(self.dir, "out.mp4")
+        write(output, b"converted")
+        cache.store("k", output)
+
+        copy = os.path.join(self.dir, "copy.mp4")
+        self.assertTrue(cache.fetch("k", copy))
+        self.assertEqual(read(copy), b"converted")
+        self.assertFalse(os.path.samefile(copy, output))
+
+    def test_miss(self):
+        output = os.path.join(self.dir, "out.mp4")
+        self.assertFalse(self.cache.fetch("missing", output))
+        self.assertFalse(os.path.exists(output))
+        self.assertFalse([n for n in os.listdir(self.dir) if n.endswith(".tmp")])
+
+    def test_fetch_into_missing_directory(self):
+        # Only a missing entry is a miss
+        output = os.path.join(self.dir, "out.mp4")
+        write(output, b"converted")
+        self.cache.store("k", output)
+        with self.assertRaises(FileNotFoundError):
+            self.cache.fetch("k", os.path.join(self.dir, "gone", "out.mp4"))
+
+    def test_fetch_evicts(self):
+        # A cache that is only read from still shrinks once max_bytes is lowered
+        for key in ("old", "new"):
+            output = os.path.join(self.dir, f"{key}.mp4")
+            write(output, b"x" * 100)
+            self.cache.store(key, output)
+        old = self.cache._entry("old", "old.mp4")
+        os.utime(old + ".json", (0, 0))
+
+        smaller = OutputCache(self.cache.directory, max_bytes=150)
+        self.assertTrue(smaller.fetch("new", os.path.join(self.dir, "again.mp4")))
+        self.assertFalse(os.path.exists(old))
+        self.assertFalse(smaller.fetch("old", os.path.join(self.dir, "old2.mp4")))
+
+
+if __name__ == "__main__":
+    unittest.main()
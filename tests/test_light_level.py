@@ -0,0 +1,79 @@
+import os
+import unittest
+
+import numpy as np
+
+import converter
+from converter.media import DEFAULT_RATE, StreamInfo
+from utils import ContentLightLevel
+
+WIDTH, HEIGHT = 96, 64
+
+
+def make(name, pix_fmt):
+    conv = getattr(converter, name)(os.devnull, os.devnull)
+    conv._use_input(StreamInfo(WIDTH, HEIGHT, DEFAULT_RATE, 1, pix_fmt))
+    conv.light_level = ContentLightLevel()
+    return conv
+
+
+def exact_max_cll(conv, y, u, v):
+    """MaxCLL over every pixel, each with its own chroma sample."""
+    sx, sy = conv.output_format.subsampling
+    u = np.repeat(np.repeat(u, sy, axis=-2), sx, axis=-1)
+    v = np.repeat(np.repeat(v, sy, axis=-2), sx, axis=-1)
+    return float(conv._display_light(y, u, v).max())
+
+
+def random_planes(fmt, rng, n=2):
+    s = 1 << (fmt.bit_depth - 8)
+    sx, sy = fmt.subsampling
+    y = rng.integers(16 * s, 235 * s + 1, (n, HEIGHT, WIDTH))
+    shape = (n, HEIGHT // sy, WIDTH // sx)
+    u = rng.integers(16 * s, 240 * s + 1, shape)
+    v = rng.integers(16 * s, 240 * s + 1, shape)
+    return tuple(p.astype(np.uint16) for p in (y, u, v))
+
+
+class LightLevelTest(unittest.TestCase):
+    """MaxCLL is measured on pixels the output actually contains."""
+
+    CASES = (
+        ("HLG2PQ", "yuv420p10le"),
+        ("PQ2HLG", "yuv422p10le"),
+        ("SDR2PQ", "yuv444p"),
+    )
+
+    def test_never_above_exact(self):
+        rng = np.random.default_rng(0)
+        for name, pix_fmt in self.CASES:
+            with self.subTest(name=name, pix_fmt=pix_fmt):
+                conv = make(name, pix_fmt)
+                planes = random_planes(conv.output_format, rng)
+                conv._measure_light_level(*planes)
+                exact = exact_max_cll(conv, *planes)
+                self.assertLessEqual(conv.light_level.max_cll, exact * (1 + 1e-6))
+
+    def test_highlight(self):
+        # One bright pixel off the sampling grid, with a strong chroma
+        # sample elsewhere in its block that would push its RGB higher
+        for name, pix_fmt in self.CASES:
+            with self.subTest(name=name, pix_fmt=pix_fmt):
+                conv = make(name, pix_fmt)
+                fmt = conv.output_format
+                s = 1 << (fmt.bit_depth - 8)
+                sx, sy = fmt.subsampling
+                y = np.full((1, HEIGHT, WIDTH), 16 * s, dtype=np.uint16)
+                u = np.full((1, HEIGHT // sy, WIDTH // sx), 128 * s, np.uint16)
+                v = u.copy()
+                y[0, 13, 27] = 150 * s
+                # The chroma sample at the corner of the block, which is sampled
+                step = conv.light_level_step
+                v[0, 13 // (sy * step) * step, 27 // (sx * step) * step] = 200 * s
+                conv._measure_light_level(y, u, v)
+                exact = exact_max_cll(conv, y, u, v)
+                self.assertAlmostEqual(conv.light_level.max_cll, exact, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import tempfile
+import unittest
+
+import av
+import numpy as np
+
+from converter import HLG, SDR
+from converter.media import (
+    ImageSequenceSource,
+    ImageSequenceWriter,
+    RawWriter,
+    open_input,
+    open_writer,
+    write_image,
+)
+
+WIDTH, HEIGHT = 96, 64
+FRAMES = 3
+
+
+def random_planes(fmt, rng, n=FRAMES):
+    s = 1 << (fmt.bit_depth - 8)
+    sx, sy = fmt.subsampling
+    dtype = np.uint8 if fmt.bit_depth == 8 else np.uint16
+    y = rng.integers(16 * s, 235 * s + 1, (n, HEIGHT, WIDTH))
+    shape = (n, HEIGHT // sy, WIDTH // sx)
+    u = rng.integers(16 * s, 240 * s + 1, shape)
+    v = rng.integers(16 * s, 240 * s + 1, shape)
+    return tuple(p.astype(dtype) for p in (y, u, v))
+
+
+def smooth_planes(fmt, n=FRAMES):
+    """Quantized planes of slowly varying colours inside the RGB gamut, which
+    survive resampling and the round trip through RGB."""
+    s = 1 << (fmt.bit_depth - 8)
+    sx, sy = fmt.subsampling
+    dtype = np.uint8 if fmt.bit_depth == 8 else np.uint16
+    rows, cols = np.mgrid[0:HEIGHT, 0:WIDTH]
+    y = 80 + 80 * (0.5 + 0.5 * np.sin(cols / 17 + rows / 23))
+    u = 128 + 10 * np.cos(cols[::sy, ::sx] / 19)
+    v = 128 + 10 * np.sin(rows[::sy, ::sx] / 13)
+    planes = [
+        np.stack([np.round((p + 2 * i) * s) for i in range(n)]).astype(dtype)
+        for p in (y, u, v)
+    ]
+    return tuple(planes)
+
+
+def decode(source):
+    frames = list(source.decode())
+    return tuple(np.stack([f.planes[i] for f in frames]) for i in range(3))
+
+
+class RawTest(unittest.TestCase):
+    """Raw YUV files are written and read back sample for sample."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_round_trip_420p10(self):
+        fmt = HLG.with_pix_fmt("yuv420p10le")
+        path = os.path.join(self.dir, f"clip_{WIDTH}x{HEIGHT}_50.yuv")
+        planes = random_planes(fmt, np.random.default_rng(0))
+
+        writer = open_writer(path, fmt, WIDTH, HEIGHT)
+        self.assertIsInstance(writer, RawWriter)
+        # Two batches, as the converters write them
+        writer.write(*(p[:2] for p in planes))
+        writer.write(*(p[2:] for p in planes))
+        writer.close()
+        # 16-bit little-endian samples, Y then U then V for every frame
+        frame_samples = WIDTH * HEIGHT * 3 // 2
+        self.assertEqual(os.path.getsize(path), FRAMES * frame_samples * 2)
+        samples = np.fromfile(path, dtype="<u2").reshape(FRAMES, frame_samples)
+        np.testing.assert_array_equal(
+            samples[:, : WIDTH * HEIGHT], planes[0].reshape(FRAMES, -1)
+        )
+
+        source = open_input(path, HLG)
+        try:
+            stream = source.stream
+            self.assertEqual((stream.width, stream.height), (WIDTH, HEIGHT))
+            self.assertEqual((stream.frames, stream.average_rate), (FRAMES, 50))
+            self.assertEqual(stream.pix_fmt, "yuv420p10le")
+            read = decode(source)
+        finally:
+            source.close()
+        for name, expected, actual in zip("yuv", planes, read):
+            with self.subTest(plane=name):
+                self.assertEqual(actual.dtype, np.uint16)
+                self.assertEqual(actual.shape, expected.shape)
+                np.testing.assert_array_equal(actual, expected)
+        self.assertEqual(read[1].shape[1:], (HEIGHT // 2, WIDTH // 2))
+
+    def test_pix_fmt_from_name(self):
+        # The name's pix_fmt overrides the format's own layout and depth
+        fmt = SDR.with_pix_fmt("yuv422p10le")
+        path = os.path.join(self.dir, f"clip_{WIDTH}x{HEIGHT}_yuv422p10le.yuv")
+        planes = random_planes(fmt, np.random.default_rng(1), n=1)
+        writer = RawWriter(path, fmt, WIDTH, HEIGHT)
+        writer.write(*planes)
+        writer.close()
+
+        source = open_input(path, SDR)
+        try:
+            self.assertEqual(source.stream.pix_fmt, "yuv422p10le")
+            read = decode(source)
+        finally:
+            source.close()
+        self.assertEqual(read[1].shape, (1, HEIGHT, WIDTH // 2))
+        for expected, actual in zip(planes, read):
+            np.testing.assert_array_equal(actual, expected)
+
+
+class ImageSequenceTest(unittest.TestCase):
+    """PNG sequences hold 16-bit RGB and come back as Y'CbCr planes."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.pattern = os.path.join(self.dir, "frame_%04d.png")
+
+    def test_write_image(self):
+        rng = np.random.default_rng(2)
+        rgb = rng.integers(0, 65536, (HEIGHT, WIDTH, 3)).astype(np.uint16)
+        path = self.pattern % 1
+        write_image(path, rgb)
+        with av.open(path) as container:
+            frame = next(container.decode(video=0))
+            np.testing.assert_array_equal(frame.to_ndarray(format="rgb48le"), rgb)
+
+    def test_round_trip(self):
+        # 16-bit RGB is fine enough for 10-bit 4:4:4 to come back exactly;
+        # 4:2:0 chroma is also resampled both ways
+        for pix_fmt, tolerance in (("yuv444p10le", 0), ("yuv420p10le", 2)):
+            with self.subTest(pix_fmt=pix_fmt):
+                fmt = HLG.with_pix_fmt(pix_fmt)
+                planes = smooth_planes(fmt)
+                writer = open_writer(self.pattern, fmt, WIDTH, HEIGHT)
+                self.assertIsInstance(writer, ImageSequenceWriter)
+                writer.write(*planes)
+                writer.close()
+                self.assertTrue(os.path.exists(self.pattern % 1))
+                self.assertFalse(os.path.exists(self.pattern % (FRAMES + 1)))
+
+                source = open_input(self.pattern, fmt)
+                try:
+                    self.assertIsInstance(source, ImageSequenceSource)
+                    self.assertEqual(source.stream.frames, FRAMES)
+                    self.assertEqual(source.stream.pix_fmt, pix_fmt)
+                    read = decode(source)
+                finally:
+                    source.close()
+                for expected, actual in zip(planes, read):
+                    self.assertEqual(actual.shape, expected.shape)
+                    error = np.abs(actual.astype(int) - expected).max()
+                    self.assertLessEqual(error, tolerance)
+
+    def test_mismatched_size(self):
+        write_image(self.pattern % 1, np.zeros((HEIGHT, WIDTH, 3), np.uint16))
+        write_image(self.pattern % 2, np.zeros((HEIGHT // 2, WIDTH, 3), np.uint16))
+        source = open_input(self.pattern, HLG)
+        try:
+            with self.assertRaises(ValueError):
+                decode(source)
+        finally:
+            source.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
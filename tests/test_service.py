@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+import queue
+import tempfile
+import unittest
+
+from converter import HLG, PQ, SDR
+from service.server import ConversionService
+
+CONVERTERS = {"hlg2sdr": "HLG2SDR", "pq2sdr": "PQ2SDR", "rewrap": "Rewrap"}
+FORMATS = {"sdr": SDR, "pq": PQ, "hlg": HLG}
+
+
+class FakeWriter:
+    """Collects what ``_handle`` sends back."""
+
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class ServiceTest(unittest.TestCase):
+    """The request handler queues, reports and cancels jobs."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.input = os.path.join(tmp.name, "in.mp4")
+        with open(self.input, "wb"):
+            pass
+        self.service = ConversionService(CONVERTERS, FORMATS, workers=1)
+        # What run() sets up, without the event loop and the process pool
+        self.service._queue = queue.PriorityQueue()
+        self.service._progress = {}
+        self.service._cancels = {}
+
+    def submit(self, **fields):
+        request = {
+            "op": "submit",
+            "command": "hlg2sdr",
+            "input": self.input,
+            "output": "out.mp4",
+            **fields,
+        }
+        return self.service.handle_request(request)
+
+    def queued_ids(self):
+        ids = []
+        while not self.service._queue.empty():
+            ids.append(self.service._queue.get_nowait()[-1])
+        return ids
+
+    def test_submit(self):
+        reply = self.submit(batch_size=4, scale=[640, 360])
+        self.assertTrue(reply["ok"])
+        job = reply["job"]
+        self.assertEqual((job["id"], job["state"]), (1, "queued"))
+        self.assertEqual((job["batch_size"], job["threads"]), (4, None))
+        converter_name, kwargs = self.service._specs[job["id"]]
+        self.assertEqual(converter_name, "HLG2SDR")
+        self.assertEqual(kwargs["scale"], (640, 360))
+
+    def test_submit_rejected(self):
+        cases = {
+            "command": {"command": "sdr2sdr"},
+            "input": {"input": self.input + ".missing"},
+            "batch_size": {"batch_size": 0},
+            "threads": {"threads": -1},
+            "scale": {"scale": [641, 360]},
+            "pix_fmt": {"pix_fmt": "rgb24"},
+        }
+        for field, fields in cases.items():
+            with self.subTest(field=field):
+                with self.assertRaises(ValueError):
+                    self.submit(**fields)
+        self.assertEqual(self.service.jobs, {})
+        with self.assertRaises(KeyError):
+            self.service.handle_request({"op": "submit", "command": "hlg2sdr"})
+
+    def test_priority(self):
+        low = self.submit()["job"]["id"]
+        high = self.submit(priority=10)["job"]["id"]
+        later = self.submit()["job"]["id"]
+        # Higher priority first, then in submission order
+        self.assertEqual(self.queued_ids(), [high, low, later])
+
+    def test_cancel(self):
+        queued = self.submit()["job"]["id"]
+        running = self.submit()["job"]["id"]
+        self.service.jobs[running].state = "running"
+
+        reply = self.service.handle_request({"op": "cancel", "job": queued})
+        self.assertEqual(reply["job"]["state"], "cancelled")
+        self.assertNotIn(queued, self.service._specs)
+
+        reply = self.service.handle_request({"op": "cancel", "job": str(running)})
+        self.assertEqual(reply["job"]["state"], "cancelling")
+        self.assertTrue(self.service._cancels[running])
+
+        with self.assertRaises(KeyError):
+            self.service.handle_request({"op": "cancel", "job": 99})
+
+    def test_status(self):
+        first = self.submit()["job"]["id"]
+        self.submit(command="pq2sdr")
+        self.service._progress[first] = (5, 20)
+
+        reply = self.service.handle_request({"op": "status", "job": first})
+        self.assertEqual(
+            (reply["job"]["frames"], reply["job"]["total_frames"]), (5, 20)
+        )
+        reply = self.service.handle_request({"op": "status"})
+        self.assertEqual(
+            [job["command"] for job in reply["jobs"]], ["hlg2sdr", "pq2sdr"]
+        )
+
+        metrics = self.service.handle_request({"op": "metrics"})["metrics"]
+        self.assertEqual((metrics["queue_depth"], metrics["frames_converted"]), (2, 5))
+
+    def test_bad_requests(self):
+        for request in ([], "submit", 3, None, {"op": "restart"}):
+            with self.subTest(request=request):
+                with self.assertRaises(ValueError):
+                    self.service.handle_request(request)
+
+    def test_connection_survives_errors(self):
+        lines = [b"[]", b'"x"', b"not json", b'{"op": "metrics"}']
+
+        async def exchange():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"\n".join(lines) + b"\n")
+            reader.feed_eof()
+            writer = FakeWriter()
+            await self.service._handle(reader, writer)
+            return writer
+
+        writer = asyncio.run(exchange())
+        replies = [json.loads(line) for line in writer.data.splitlines()]
+        self.assertEqual(
+            [reply["ok"] for reply in replies], [False, False, False, True]
+        )
+        self.assertIn("JSON object", replies[0]["error"])
+        self.assertTrue(writer.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 from .colorspace import (
+    compose,
     linear_709_to_2020,
     linear_2020_to_709,
     rgb_to_yuv_709,
@@ -7,11 +8,22 @@ from .colorspace import (
     yuv_to_rgb_2020,
 )
 from .io import (
+    read_plane,
     read_plane_8bit,
     read_plane_10bit,
+    write_plane,
     write_plane_8bit,
     write_plane_10bit,
 )
-from .quantize import normalize_8bit, normalize_10bit, quantize_8bit, quantize_10bit
-from .sample import downsample_chroma, upsample_chroma
+from .light_level import ContentLightLevel
+from .mp4 import write_content_light_level
+from .quantize import (
+    normalize,
+    normalize_8bit,
+    normalize_10bit,
+    quantize,
+    quantize_8bit,
+    quantize_10bit,
+)
+from .sample import downsample_chroma, resize_chroma, resize_plane, upsample_chroma
 from .transfer import eotf_hlg, eotf_pq, eotf_sdr, oetf_hlg, oetf_pq, oetf_sdr
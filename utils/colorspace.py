@@ -1,3 +1,6 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
 import numpy as np
 
 # === Gamut conversion matrices ===
@@ -19,22 +22,6 @@ MAT_2020_TO_709 = np.array(
 )
 
 
-def linear_709_to_2020(rgb: np.ndarray) -> np.ndarray:
-    """Convert linear RGB from BT.709 to BT.2020 primaries."""
-    h, w, c = rgb.shape
-    flat = rgb.reshape(-1, 3)
-    out = flat.dot(MAT_709_TO_2020.T)
-    return out.reshape(h, w, c)
-
-
-def linear_2020_to_709(rgb: np.ndarray) -> np.ndarray:
-    """Convert linear RGB from BT.2020 to BT.709 primaries."""
-    h, w, c = rgb.shape
-    flat = rgb.reshape(-1, 3)
-    out = flat.dot(MAT_2020_TO_709.T)
-    return out.reshape(h, w, c)
-
-
 # === YUV coefficients ===
 
 # BT.709 3 Signal Format
@@ -48,54 +35,182 @@ KB_2020 = 0.0593
 KG_2020 = 1.0 - KR_2020 - KB_2020
 
 
-def yuv_to_rgb_709(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
-    """YCbCr (BT.709 3 Signal Format) to RGB.
+# YCbCr -> RGB on (Y, Cb - 0.5, Cr - 0.5)
+# Conversion factors derived from the coefficients above:
+# 2(1 - KR), 2KB(1 - KB)/KG, 2KR(1 - KR)/KG, 2(1 - KB)
+YUV_TO_RGB_709 = np.array(
+    [
+        [1.0, 0.0, 1.5748],
+        [1.0, -0.1873, -0.4681],
+        [1.0, 1.8556, 0.0],
+    ]
+)
 
-    Parameters:
-        y, u, v: normalized [0-1], U/V centered at 0.5
+YUV_TO_RGB_2020 = np.array(
+    [
+        [1.0, 0.0, 1.4746],
+        [1.0, -0.16455, -0.57135],
+        [1.0, 1.8814, 0.0],
+    ]
+)
 
-    Returns:
-        RGB array (H, W, 3)
+
+def _rgb_to_yuv(kr: float, kb: float) -> np.ndarray:
+    """RGB -> (Y, Cb - 0.5, Cr - 0.5) for luma coefficients ``kr``, ``kb``."""
+    kg = 1.0 - kr - kb
+    luma = np.array([kr, kg, kb])
+    return np.array(
+        [
+            luma,
+            (np.array([0.0, 0.0, 1.0]) - luma) / (2.0 * (1.0 - kb)),
+            (np.array([1.0, 0.0, 0.0]) - luma) / (2.0 * (1.0 - kr)),
+        ]
+    )
+
+
+RGB_TO_YUV_709 = _rgb_to_yuv(KR_709, KB_709)
+RGB_TO_YUV_2020 = _rgb_to_yuv(KR_2020, KB_2020)
+
+# U/V are stored centered at 0.5
+CHROMA_OFFSET = np.array([0.0, 0.5, 0.5])
+
+# === ICtCp (BT.2100 Table 6) ===
+
+# Linear BT.2020 RGB -> LMS
+RGB_2020_TO_LMS = (
+    np.array(
+        [
+            [1688, 2146, 262],
+            [683, 2951, 462],
+            [99, 309, 3688],
+        ]
+    )
+    / 4096.0
+)
+
+# PQ-encoded L'M'S' -> ICtCp
+LMS_TO_ICTCP = (
+    np.array(
+        [
+            [2048, 2048, 0],
+            [6610, -13613, 7003],
+            [17933, -17390, -543],
+        ]
+    )
+    / 4096.0
+)
+
+
+# === Matrix composition ===
+
+
+@dataclass(frozen=True, eq=False)
+class Affine:
+    """``x -> matrix @ x + offset`` on planar (3, ...) data."""
+
+    matrix: np.ndarray
+    offset: np.ndarray
+
+    def then(self, other: "Affine") -> "Affine":
+        """This transform followed by ``other``, as one transform."""
+        return Affine(
+            other.matrix @ self.matrix, other.matrix @ self.offset + other.offset
+        )
+
+    def apply(self, planes: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """Apply to (3, H, W) or batched (3, N, H, W) planes in one matmul.
+
+        ``out`` may be ``planes`` itself. Float32 planes stay float32.
+        """
+        if out is None:
+            out = np.empty(planes.shape, dtype=np.result_type(planes, np.float32))
+        flat = out.reshape(3, -1)
+        np.matmul(self.matrix.astype(out.dtype), planes.reshape(3, -1), out=flat)
+        if self.offset.any():
+            flat += self.offset.astype(out.dtype)[:, None]
+        return out
+
+
+STAGES = {
+    "yuv709_to_rgb": Affine(YUV_TO_RGB_709, -YUV_TO_RGB_709 @ CHROMA_OFFSET),
+    "yuv2020_to_rgb": Affine(YUV_TO_RGB_2020, -YUV_TO_RGB_2020 @ CHROMA_OFFSET),
+    "rgb_to_yuv709": Affine(RGB_TO_YUV_709, CHROMA_OFFSET),
+    "rgb_to_yuv2020": Affine(RGB_TO_YUV_2020, CHROMA_OFFSET),
+    "709_to_2020": Affine(MAT_709_TO_2020, np.zeros(3)),
+    "2020_to_709": Affine(MAT_2020_TO_709, np.zeros(3)),
+    "2020_to_lms": Affine(RGB_2020_TO_LMS, np.zeros(3)),
+    "lms_to_ictcp": Affine(LMS_TO_ICTCP, np.zeros(3)),
+}
+
+
+@lru_cache(maxsize=None)
+def compose(*stages) -> Affine:
+    """Combine pipeline stages, applied left to right, into one ``Affine``.
+
+    Each stage is a name from ``STAGES`` or a number (a uniform scale such as
+    10000 / 100 nits). Results are cached, so converters can call this freely.
+
+    Example:
+        compose(100.0, "2020_to_709").apply(rgb)  # == linear_2020_to_709(rgb * 100)
     """
-    u_shifted = u - 0.5
-    v_shifted = v - 0.5
+    result = Affine(np.eye(3), np.zeros(3))
+    for stage in stages:
+        if isinstance(stage, str):
+            step = STAGES[stage]
+        else:
+            step = Affine(np.eye(3) * float(stage), np.zeros(3))
+        result = result.then(step)
+    return result
 
-    # Conversion factors derived from BT.709 coefficients
-    # 2(1 - KR_709) = 1.5748
-    r = y + 1.5748 * v_shifted
 
-    # 2KB_709 * (1 - KB_709)/KG_709 = 0.1873
-    # 2KR_709 * (1 - KR_709)/KG_709 = 0.4681
-    g = y - 0.1873 * u_shifted - 0.4681 * v_shifted
+# === Interleaved (..., 3) helpers ===
 
-    # 2(1 - KB_709) = 1.8556
-    b = y + 1.8556 * u_shifted
 
-    return np.dstack((r, g, b))
+def _apply_interleaved(transform: Affine, rgb: np.ndarray) -> np.ndarray:
+    planes = transform.apply(np.moveaxis(rgb, -1, 0))
+    return np.moveaxis(planes, 0, -1)
 
 
-def yuv_to_rgb_2020(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
-    """YCbCr (BT.2020 Table 4 and BT.2100 Table 6 Non-Constant Luminance) to RGB.
+def linear_709_to_2020(rgb: np.ndarray) -> np.ndarray:
+    """Convert linear RGB from BT.709 to BT.2020 primaries.
+
+    Accepts (H, W, 3) or batched (N, H, W, 3) arrays.
+    """
+    return _apply_interleaved(STAGES["709_to_2020"], rgb)
+
+
+def linear_2020_to_709(rgb: np.ndarray) -> np.ndarray:
+    """Convert linear RGB from BT.2020 to BT.709 primaries.
+
+    Accepts (H, W, 3) or batched (N, H, W, 3) arrays.
+    """
+    return _apply_interleaved(STAGES["2020_to_709"], rgb)
+
+
+def yuv_to_rgb_709(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """YCbCr (BT.709 3 Signal Format) to RGB.
 
     Parameters:
-        y, u, v: normalized [0-1], U/V centered at 0.5
+        y, u, v: normalized [0-1], U/V centered at 0.5, shape (H, W) or (N, H, W)
 
     Returns:
-        RGB array (H, W, 3)
+        RGB array (H, W, 3) or (N, H, W, 3)
     """
-    u_s = u - 0.5
-    v_s = v - 0.5
+    planes = STAGES["yuv709_to_rgb"].apply(np.stack((y, u, v)))
+    return np.moveaxis(planes, 0, -1)
 
-    # Conversion factors derived from BT.2020 coefficients
-    # 2(1 - KR_2020) = 1.4746
-    r = y + 1.4746 * v_s
-    # 2KB_2020 * (1 - KB_2020)/KG_2020 = 0.16455
-    # 2KR_2020 * (1 - KR_2020)/KG_2020 = 0.57135
-    g = y - 0.16455 * u_s - 0.57135 * v_s
-    # 2(1 - KB_2020) = 1.8814
-    b = y + 1.8814 * u_s
 
-    return np.dstack((r, g, b))
+def yuv_to_rgb_2020(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """YCbCr (BT.2020 Table 4 and BT.2100 Table 6 Non-Constant Luminance) to RGB.
+
+    Parameters:
+        y, u, v: normalized [0-1], U/V centered at 0.5, shape (H, W) or (N, H, W)
+
+    Returns:
+        RGB array (H, W, 3) or (N, H, W, 3)
+    """
+    planes = STAGES["yuv2020_to_rgb"].apply(np.stack((y, u, v)))
+    return np.moveaxis(planes, 0, -1)
 
 
 def rgb_to_yuv_709(rgb: np.ndarray):
@@ -104,17 +219,12 @@ def rgb_to_yuv_709(rgb: np.ndarray):
     BT.709 3 Signal Format
 
     Parameters:
-        rgb: RGB array (H, W, 3) normalized [0-1]
+        rgb: RGB array (H, W, 3) or (N, H, W, 3) normalized [0-1]
 
     Returns:
         y, u, v: normalized [0-1], U/V centered at 0.5
     """
-    r, g, b = rgb[:, :, 0], rgb[:, :, 1], rgb[:, :, 2]
-
-    y = KR_709 * r + KG_709 * g + KB_709 * b
-    u = (b - y) / (2.0 * (1.0 - KB_709)) + 0.5
-    v = (r - y) / (2.0 * (1.0 - KR_709)) + 0.5
-
+    y, u, v = STAGES["rgb_to_yuv709"].apply(np.moveaxis(rgb, -1, 0))
     return y, u, v
 
 
@@ -124,15 +234,10 @@ def rgb_to_yuv_2020(rgb: np.ndarray):
     BT.2020 Table 4 and BT.2100 Table 6 Non-Constant Luminance
 
     Parameters:
-        rgb: RGB array (H, W, 3) normalized [0-1]
+        rgb: RGB array (H, W, 3) or (N, H, W, 3) normalized [0-1]
 
     Returns:
         y, u, v: normalized [0-1], U/V centered at 0.5
     """
-    r, g, b = rgb[:, :, 0], rgb[:, :, 1], rgb[:, :, 2]
-
-    y = KR_2020 * r + KG_2020 * g + KB_2020 * b
-    u = (b - y) / (2.0 * (1.0 - KB_2020)) + 0.5
-    v = (r - y) / (2.0 * (1.0 - KR_2020)) + 0.5
-
+    y, u, v = STAGES["rgb_to_yuv2020"].apply(np.moveaxis(rgb, -1, 0))
     return y, u, v
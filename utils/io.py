@@ -1,31 +1,37 @@
 import numpy as np
 
 
-def read_plane_8bit(plane, width: int, height: int) -> np.ndarray:
-    """Read 8-bit YUV plane from PyAV frame."""
-    raw = np.frombuffer(plane, np.uint8)
-    stride = plane.line_size
+def read_plane(plane, width: int, height: int, bit_depth: int = 8) -> np.ndarray:
+    """Read an 8-bit, or 10/12-bit little-endian, YUV plane from PyAV frame."""
+    raw = np.frombuffer(plane, np.uint8 if bit_depth == 8 else np.uint16)
+    stride = plane.line_size // raw.itemsize
     shaped = raw[: height * stride].reshape(height, stride)
     return shaped[:, :width].astype(np.float32)
 
 
+def write_plane(plane, data: np.ndarray, width: int, height: int, bit_depth: int = 8):
+    """Write an 8-bit, or 10/12-bit little-endian, YUV plane to PyAV frame."""
+    dtype = np.uint8 if bit_depth == 8 else np.uint16
+    out = np.frombuffer(plane, dtype)
+    stride = plane.line_size // out.itemsize
+    out[: height * stride].reshape(height, stride)[:, :width] = data.astype(dtype)
+
+
+def read_plane_8bit(plane, width: int, height: int) -> np.ndarray:
+    """Read 8-bit YUV plane from PyAV frame."""
+    return read_plane(plane, width, height, 8)
+
+
 def read_plane_10bit(plane, width: int, height: int) -> np.ndarray:
     """Read 10-bit YUV plane from PyAV frame."""
-    raw = np.frombuffer(plane, np.uint16)
-    stride = plane.line_size // 2
-    shaped = raw[: height * stride].reshape(height, stride)
-    return shaped[:, :width].astype(np.float32)
+    return read_plane(plane, width, height, 10)
 
 
 def write_plane_8bit(plane, data: np.ndarray, width: int, height: int):
     """Write 8-bit YUV plane to PyAV frame."""
-    stride = plane.line_size
-    out = np.frombuffer(plane, np.uint8)
-    out[: height * stride].reshape(height, stride)[:, :width] = data.astype(np.uint8)
+    write_plane(plane, data, width, height, 8)
 
 
 def write_plane_10bit(plane, data: np.ndarray, width: int, height: int):
     """Write 10-bit YUV plane to PyAV frame."""
-    stride = plane.line_size // 2
-    out = np.frombuffer(plane, np.uint16)
-    out[: height * stride].reshape(height, stride)[:, :width] = data.astype(np.uint16)
+    write_plane(plane, data, width, height, 10)
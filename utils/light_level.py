@@ -0,0 +1,37 @@
+import numpy as np
+
+# === Content light level (CTA-861.3) ===
+
+
+class ContentLightLevel:
+    """Running MaxCLL / MaxFALL over a stream of display-light frames.
+
+    MaxCLL is the brightest max(R, G, B) of any pixel, MaxFALL the highest
+    frame average of max(R, G, B), both in cd/m².
+    """
+
+    def __init__(self):
+        self.max_cll = 0.0
+        self.max_fall = 0.0
+        self.frames = 0
+
+    def update(self, rgb_nits: np.ndarray, peak_nits: np.ndarray | None = None):
+        """Add frames of planar display light in cd/m².
+
+        Parameters:
+            rgb_nits: (3, H, W) or batched (3, N, H, W) array; a subsampled grid
+                is enough for the frame averages
+            peak_nits: optional planes of the brightest pixels around each grid
+                point, used for MaxCLL instead of ``rgb_nits``
+        """
+        max_rgb = rgb_nits.max(axis=0)
+        frame_average = max_rgb.mean(axis=(-2, -1))
+        peak = max_rgb if peak_nits is None else peak_nits.max(axis=0)
+        self.max_cll = max(self.max_cll, float(peak.max()))
+        self.max_fall = max(self.max_fall, float(np.max(frame_average)))
+        self.frames += max_rgb.size // (max_rgb.shape[-2] * max_rgb.shape[-1])
+
+    @property
+    def values(self) -> tuple:
+        """(MaxCLL, MaxFALL) as whole cd/m², as stored in the metadata."""
+        return round(self.max_cll), round(self.max_fall)
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+
+from .colorspace import compose
+from .transfer import oetf_pq
+
+# === Objective quality metrics ===
+
+
+def downscale(plane: np.ndarray, factor) -> np.ndarray:
+    """Box-filter a (H, W) or batched (N, H, W) plane down by an integer factor.
+
+    ``factor`` may also be a (horizontal, vertical) pair, e.g. the chroma
+    subsampling of a format. Edge rows/columns that don't fill a whole block
+    are dropped.
+    """
+    fx, fy = factor if isinstance(factor, tuple) else (factor, factor)
+    if fx == fy == 1:
+        return np.asarray(plane, dtype=np.float32)
+    h, w = plane.shape[-2] // fy, plane.shape[-1] // fx
+    # Summing strided slices is much faster than reducing a reshaped block axis
+    rows = plane[..., 0 : h * fy : fy, :].astype(np.float32)
+    for i in range(1, fy):
+        rows += plane[..., i : h * fy : fy, :]
+    blocks = rows[..., 0 : w * fx : fx].copy()
+    for i in range(1, fx):
+        blocks += rows[..., i : w * fx : fx]
+    blocks *= 1.0 / (fx * fy)
+    return blocks
+
+
+def psnr(a: np.ndarray, b: np.ndarray, peak: float) -> float:
+    """Peak signal-to-noise ratio in dB; ``inf`` for identical planes."""
+    diff = np.subtract(a, b, dtype=np.float32)
+    mse = float(np.mean(np.square(diff, out=diff)))
+    if mse == 0.0:
+        return math.inf
+    return 10.0 * math.log10(peak * peak / mse)
+
+
+def ictcp(rgb_nits: np.ndarray) -> np.ndarray:
+    """Planar linear BT.2020 RGB in cd/m² to planar ICtCp (BT.2100 PQ)."""
+    lms = compose("2020_to_lms", 1.0 / 10000.0).apply(rgb_nits)
+    lms = oetf_pq(lms, out=lms)
+    return compose("lms_to_ictcp").apply(lms, out=lms)
+
+
+def delta_e_itp(ictcp_a: np.ndarray, ictcp_b: np.ndarray) -> np.ndarray:
+    """Per-pixel ΔE ITP (BT.2124) between two planar ICtCp images.
+
+    1.0 is roughly one just-noticeable difference.
+    """
+    d = ictcp_a - ictcp_b
+    # T = 0.5 * Ct, P = Cp
+    d[1] *= 0.5
+    np.square(d, out=d)
+    return 720.0 * np.sqrt(d.sum(axis=0))
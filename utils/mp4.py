@@ -0,0 +1,94 @@
+import os
+import struct
+
+# === MP4 / QuickTime box editing ===
+
+# Boxes between the file root and the video sample entries
+_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+_HEVC_ENTRIES = {b"hvc1", b"hev1"}
+# VisualSampleEntry fields before the child boxes (ISO/IEC 14496-12 12.1.3)
+_VISUAL_ENTRY_FIELDS = 78
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _children(data: bytes):
+    """Yield (kind, box bytes) for the boxes packed in ``data``."""
+    pos = 0
+    while pos + 8 <= len(data):
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        if size < 8:
+            # 64-bit or to-end sizes never occur inside a sample table
+            raise ValueError(f"Unsupported box size {size} for {kind!r}")
+        yield kind, data[pos : pos + size]
+        pos += size
+
+
+def _patch(box: bytes, clli: bytes) -> bytes:
+    """Return ``box`` with ``clli`` set on every HEVC sample entry inside it."""
+    kind = box[4:8]
+    if kind in _CONTAINERS:
+        body = b"".join(_patch(child, clli) for _, child in _children(box[8:]))
+        return _box(kind, body)
+    if kind == b"stsd":
+        # version/flags and entry_count precede the sample entries
+        head = box[8:16]
+        body = b"".join(_patch(child, clli) for _, child in _children(box[16:]))
+        return _box(kind, head + body)
+    if kind in _HEVC_ENTRIES:
+        fields_end = 8 + _VISUAL_ENTRY_FIELDS
+        children = [
+            child
+            for child_kind, child in _children(box[fields_end:])
+            if child_kind != b"clli"
+        ]
+        return _box(kind, box[8:fields_end] + b"".join(children) + clli)
+    return box
+
+
+def write_content_light_level(path: str, max_cll: int, max_fall: int) -> bool:
+    """Store MaxCLL / MaxFALL as a ``clli`` box on the HEVC track of an MP4.
+
+    The encoder has to be configured before the statistics are known, so the
+    box is added once the file is complete. Only a ``moov`` at the end of the
+    file (FFmpeg's default) can grow without moving the media data.
+
+    Returns:
+        True if the file was updated, False if its layout isn't supported
+    """
+    # ContentLightLevelBox: two 16-bit values in cd/m²
+    clli = _box(
+        b"clli", struct.pack(">HH", min(max_cll, 0xFFFF), min(max_fall, 0xFFFF))
+    )
+    file_size = os.path.getsize(path)
+
+    with open(path, "r+b") as f:
+        pos = 0
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            size, kind = struct.unpack(">I4s", f.read(8))
+            if kind == b"moov":
+                break
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+            elif size == 0:
+                size = file_size - pos
+            pos += size
+        else:
+            return False
+        # A 64-bit or to-end size field would make the header longer than 8 bytes
+        if size < 8 or pos + size != file_size:
+            return False
+
+        f.seek(pos)
+        moov = f.read(size)
+        try:
+            patched = _patch(moov, clli)
+        except ValueError:
+            return False
+        f.seek(pos)
+        f.write(patched)
+        f.truncate()
+    return True
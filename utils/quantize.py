@@ -1,5 +1,41 @@
 import numpy as np
 
+# === Limited range at any bit depth (BT.2100 Table 9 Narrow range) ===
+
+# Code values at 8 bits; n-bit codes are these times 2^(n - 8)
+_Y_RANGE_8BIT = (16, 235)
+_UV_RANGE_8BIT = (16, 240)
+
+
+def normalize(y: np.ndarray, u: np.ndarray, v: np.ndarray, bit_depth: int):
+    """Normalize limited-range YUV of ``bit_depth`` bits (8, 10 or 12) to [0-1].
+
+    Ranges are Y: 16-235, UV: 16-240 at 8 bits, scaled by 2^(bit_depth - 8).
+    """
+    shift = bit_depth - 8
+    y_lo, y_hi = (c << shift for c in _Y_RANGE_8BIT)
+    uv_lo, uv_hi = (c << shift for c in _UV_RANGE_8BIT)
+    y_norm = np.clip((y - float(y_lo)) / float(y_hi - y_lo), 0.0, 1.0)
+    u_norm = np.clip((u - float(uv_lo)) / float(uv_hi - uv_lo), 0.0, 1.0)
+    v_norm = np.clip((v - float(uv_lo)) / float(uv_hi - uv_lo), 0.0, 1.0)
+    return y_norm, u_norm, v_norm
+
+
+def quantize(y: np.ndarray, u: np.ndarray, v: np.ndarray, bit_depth: int):
+    """Quantize normalized [0-1] to limited-range YUV of ``bit_depth`` bits.
+
+    Returns uint8 planes at 8 bits and uint16 planes otherwise.
+    """
+    shift = bit_depth - 8
+    y_lo, y_hi = (c << shift for c in _Y_RANGE_8BIT)
+    uv_lo, uv_hi = (c << shift for c in _UV_RANGE_8BIT)
+    dtype = np.uint8 if bit_depth == 8 else np.uint16
+    y_out = np.clip(np.round(y * float(y_hi - y_lo) + float(y_lo)), y_lo, y_hi)
+    u_out = np.clip(np.round(u * float(uv_hi - uv_lo) + float(uv_lo)), uv_lo, uv_hi)
+    v_out = np.clip(np.round(v * float(uv_hi - uv_lo) + float(uv_lo)), uv_lo, uv_hi)
+    return y_out.astype(dtype), u_out.astype(dtype), v_out.astype(dtype)
+
+
 # === 8-bit limited range (BT.709 4 Digital Representation) ===
 
 
@@ -8,10 +44,7 @@ def normalize_8bit(y: np.ndarray, u: np.ndarray, v: np.ndarray):
 
     Standard SDR Video (BT.709 4 Digital Representation) ranges: Y: 16-235, UV: 16-240
     """
-    y_norm = np.clip((y - 16.0) / 219.0, 0.0, 1.0)
-    u_norm = np.clip((u - 16.0) / 224.0, 0.0, 1.0)
-    v_norm = np.clip((v - 16.0) / 224.0, 0.0, 1.0)
-    return y_norm, u_norm, v_norm
+    return normalize(y, u, v, 8)
 
 
 def quantize_8bit(y: np.ndarray, u: np.ndarray, v: np.ndarray):
@@ -19,10 +52,7 @@ def quantize_8bit(y: np.ndarray, u: np.ndarray, v: np.ndarray):
 
     Standard SDR Video (Rec.709 4 Digital Representation) ranges: Y: 16-235, UV: 16-240
     """
-    y_out = np.clip(np.round(y * 219.0 + 16.0), 16, 235).astype(np.uint8)
-    u_out = np.clip(np.round(u * 224.0 + 16.0), 16, 240).astype(np.uint8)
-    v_out = np.clip(np.round(v * 224.0 + 16.0), 16, 240).astype(np.uint8)
-    return y_out, u_out, v_out
+    return quantize(y, u, v, 8)
 
 
 # === 10-bit limited range (BT.2020 Table 5 and BT.2100 Table 9 Narrow range) ===
@@ -33,10 +63,7 @@ def normalize_10bit(y: np.ndarray, u: np.ndarray, v: np.ndarray):
 
     Standard PQ/HLG Video (BT.2020 Table 5 and BT.2100 Table 9 Narrow range) ranges: Y: 64-940, UV: 64-960
     """
-    y_norm = np.clip((y - 64.0) / 876.0, 0.0, 1.0)
-    u_norm = np.clip((u - 64.0) / 896.0, 0.0, 1.0)
-    v_norm = np.clip((v - 64.0) / 896.0, 0.0, 1.0)
-    return y_norm, u_norm, v_norm
+    return normalize(y, u, v, 10)
 
 
 def quantize_10bit(y: np.ndarray, u: np.ndarray, v: np.ndarray):
@@ -44,7 +71,4 @@ def quantize_10bit(y: np.ndarray, u: np.ndarray, v: np.ndarray):
 
     Standard PQ/HLG Video (BT.2020 Table 5 and BT.2100 Table 9 Narrow range) ranges: Y: 64-940, UV: 64-960
     """
-    y_out = np.clip(np.round(y * 876.0 + 64.0), 64, 940).astype(np.uint16)
-    u_out = np.clip(np.round(u * 896.0 + 64.0), 64, 960).astype(np.uint16)
-    v_out = np.clip(np.round(v * 896.0 + 64.0), 64, 960).astype(np.uint16)
-    return y_out, u_out, v_out
+    return quantize(y, u, v, 10)
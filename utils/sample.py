@@ -1,17 +1,331 @@
-import cv2
 import numpy as np
 
+# === Resampling kernels ===
 
-def upsample_chroma(u: np.ndarray, v: np.ndarray, width: int, height: int):
-    """Upsample chroma from 4:2:0 to 4:4:4."""
-    u_up = cv2.resize(u, (width, height), interpolation=cv2.INTER_LINEAR)
-    v_up = cv2.resize(v, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def _bilinear(x):
+    return np.maximum(1.0 - np.abs(x), 0.0)
+
+
+def _catmull_rom(x):
+    # Keys cubic with a = -0.5
+    x = np.abs(x)
+    near = (1.5 * x - 2.5) * x * x + 1.0
+    far = ((-0.5 * x + 2.5) * x - 4.0) * x + 2.0
+    return np.where(x < 1.0, near, np.where(x < 2.0, far, 0.0))
+
+
+def _lanczos3(x):
+    return np.where(np.abs(x) < 3.0, np.sinc(x) * np.sinc(x / 3.0), 0.0)
+
+
+# name: (kernel, support radius in source samples)
+FILTERS = {
+    "bilinear": (_bilinear, 1),
+    "catmull-rom": (_catmull_rom, 2),
+    "lanczos": (_lanczos3, 3),
+}
+
+# Chroma sample position relative to the luma grid (horizontal, vertical), in
+# luma samples. 0.0 is co-sited with the first luma sample, 0.5 is midway.
+SITINGS = {
+    "left": (0.0, 0.5),  # MPEG-2 / BT.2020 4:2:0 default
+    "center": (0.5, 0.5),  # MPEG-1 / JPEG
+    "topleft": (0.0, 0.0),  # co-sited both ways
+}
+
+
+def _taps(filter: str, positions: np.ndarray, scale: float):
+    """Integer tap offsets and normalized weights for sampling at ``positions``.
+
+    ``positions`` are fractional offsets from tap 0 (one entry per phase);
+    ``scale`` stretches the kernel, which is what low-pass filters a downsample.
+    """
+    kernel, support = FILTERS[filter]
+    radius = int(np.ceil(support * scale))
+    offsets = np.arange(-radius, radius + 2)
+    weights = kernel((offsets[None, :] - positions[:, None]) / scale)
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    # Drop taps that are zero for every phase
+    used = np.any(np.abs(weights) > 1e-12, axis=0)
+    return offsets[used], weights[:, used]
+
+
+def _accumulate(dst: np.ndarray, taps, weights, scratch: np.ndarray):
+    """dst = sum(weight * tap) without allocating per-tap temporaries."""
+    # Python floats keep float32 planes in float32
+    pairs = [(tap, float(w)) for tap, w in zip(taps, weights) if abs(w) > 1e-12]
+    (tap, weight), rest = pairs[0], pairs[1:]
+    np.multiply(tap, weight, out=dst)
+    for tap, weight in rest:
+        np.multiply(tap, weight, out=scratch)
+        dst += scratch
+
+
+def _axis(axis: int, index) -> tuple:
+    """Index tuple selecting ``index`` along axis -1 or -2."""
+    return (..., index) if axis == -1 else (..., index, slice(None))
+
+
+def _pad(plane: np.ndarray, axis: int, pad: int) -> np.ndarray:
+    widths = [(0, 0)] * plane.ndim
+    widths[axis] = (pad, pad)
+    return np.pad(plane, widths, mode="edge")
+
+
+def _upsample_axis(plane, out, axis, siting, filter):
+    """Double ``plane`` along ``axis`` into ``out`` (which may be longer by one)."""
+    n_out = out.shape[axis]
+    # Output sample o sits at chroma position (o - siting) / 2
+    positions = np.array([(parity - siting) / 2.0 for parity in (0, 1)])
+    bases = np.floor(positions).astype(int)
+    offsets, weights = _taps(filter, positions - bases, 1.0)
+
+    pad = int(np.abs(offsets).max() + np.abs(bases).max()) + 1
+    src = _pad(plane, axis, pad)
+
+    for parity in (0, 1):
+        count = len(range(parity, n_out, 2))
+        dst = out[_axis(axis, slice(parity, None, 2))]
+        starts = [pad + bases[parity] + offset for offset in offsets]
+        taps = [src[_axis(axis, slice(s, s + count))] for s in starts]
+        _accumulate(dst, taps, weights[parity], np.empty_like(dst))
+    return out
+
+
+def _downsample_axis(plane, out, axis, siting, filter):
+    """Halve ``plane`` along ``axis`` into ``out``."""
+    count = out.shape[axis]
+    # Output sample k sits at source position 2k + siting
+    offsets, weights = _taps(filter, np.array([siting]), 2.0)
+    weights = weights[0]
+
+    pad = int(np.abs(offsets).max()) + 1
+    src = _pad(plane, axis, pad)
+
+    starts = [pad + offset for offset in offsets]
+    taps = [src[_axis(axis, slice(s, s + 2 * count, 2))] for s in starts]
+    _accumulate(out, taps, weights, np.empty_like(out))
+    return out
+
+
+def _resize_axis(plane, out, axis, scale, center, filter):
+    """Resample ``plane`` along ``axis`` into ``out`` by ``scale`` input samples
+    per output sample."""
+    n_in, n_out = plane.shape[axis], out.shape[axis]
+    # Output sample o sits at input position o * scale + center * (scale - 1),
+    # which lines up the first and last samples' footprints
+    positions = np.arange(n_out) * scale + center * (scale - 1.0)
+    bases = np.floor(positions).astype(int)
+    # Stretching the kernel when shrinking low-pass filters the input
+    offsets, weights = _taps(filter, positions - bases, max(scale, 1.0))
+    weights = weights.astype(plane.dtype)
+
+    scratch = np.empty_like(out)
+    for i, offset in enumerate(offsets):
+        # Edge samples repeat past the borders, as in _pad
+        index = np.clip(bases + offset, 0, n_in - 1)
+        weight = weights[:, i] if axis == -1 else weights[:, i, None]
+        if i == 0:
+            np.take(plane, index, axis=axis, out=out)
+            out *= weight
+        else:
+            np.take(plane, index, axis=axis, out=scratch)
+            scratch *= weight
+            out += scratch
+    return out
+
+
+def resize_plane(
+    plane: np.ndarray,
+    width: int,
+    height: int,
+    filter: str = "bilinear",
+    siting: str | None = None,
+    out: np.ndarray | None = None,
+    subsampling: tuple = (2, 2),
+) -> np.ndarray:
+    """Resize a luma or chroma plane.
+
+    Parameters:
+        plane: (H, W) or batched (N, H, W) float plane
+        width, height: output size of this plane
+        filter: one of ``FILTERS``
+        siting: chroma location (one of ``SITINGS``) for a chroma plane, so
+            its samples stay at the same place relative to the resized luma;
+            None for luma
+        out: optional preallocated (…, height, width) output
+        subsampling: chroma (horizontal, vertical) factors, see
+            ``Format.subsampling``
+
+    Returns:
+        Resized plane with the dtype of ``plane``
+    """
+    lead = plane.shape[:-2]
+    h, w = plane.shape[-2:]
+    if out is None:
+        out = np.empty((*lead, height, width), dtype=plane.dtype)
+    if siting is None:
+        h_center = v_center = 0.5
+    else:
+        # A chroma sample sits at luma position s * k + siting, which maps to
+        # input chroma position k * scale + (siting + 1/2) / s * (scale - 1);
+        # along a full-resolution axis it is co-sited, like luma
+        sx, sy = subsampling
+        h_siting, v_siting = SITINGS[siting]
+        h_center = (h_siting * (sx - 1) + 0.5) / sx
+        v_center = (v_siting * (sy - 1) + 0.5) / sy
+
+    # Columns first: shrinking them first leaves fewer rows to filter
+    wide = np.empty((*lead, h, width), dtype=plane.dtype)
+    _resize_axis(plane, wide, -1, w / width, h_center, filter)
+    return _resize_axis(wide, out, -2, h / height, v_center, filter)
+
+
+def upsample_plane(
+    plane: np.ndarray,
+    width: int,
+    height: int,
+    filter: str = "bilinear",
+    siting: str = "left",
+    out: np.ndarray | None = None,
+    subsampling: tuple = (2, 2),
+) -> np.ndarray:
+    """Upsample one chroma plane to ``width`` x ``height``.
+
+    Parameters:
+        plane: (H/sy, W/sx) or batched (N, H/sy, W/sx) float plane
+        width, height: luma size
+        filter: one of ``FILTERS``
+        siting: chroma location, one of ``SITINGS``
+        out: optional preallocated (…, height, width) output
+        subsampling: (sx, sy) factors of the plane, each 1 or 2; an axis at
+            full resolution is not resampled
+
+    Returns:
+        Upsampled plane with the dtype of ``plane``; ``plane`` itself for
+        4:4:4 without ``out``
+    """
+    sx, sy = subsampling
+    if (sx, sy) == (1, 1) and out is None:
+        return plane
+    h_siting, v_siting = SITINGS[siting]
+    lead = plane.shape[:-2]
+    if out is None:
+        out = np.empty((*lead, height, width), dtype=plane.dtype)
+
+    if sx == 1:
+        wide = plane
+    else:
+        wide = (
+            out if sy == 1 else np.empty((*lead, plane.shape[-2], width), plane.dtype)
+        )
+        _upsample_axis(plane, wide, -1, h_siting, filter)
+    if sy == 1:
+        if wide is not out:
+            out[...] = wide
+        return out
+    return _upsample_axis(wide, out, -2, v_siting, filter)
+
+
+def downsample_plane(
+    plane: np.ndarray,
+    filter: str = "bilinear",
+    siting: str = "left",
+    out: np.ndarray | None = None,
+    subsampling: tuple = (2, 2),
+) -> np.ndarray:
+    """Downsample one 4:4:4 chroma plane by ``subsampling``.
+
+    Parameters:
+        plane: (H, W) or batched (N, H, W) float plane
+        filter: one of ``FILTERS``
+        siting: chroma location, one of ``SITINGS``
+        out: optional preallocated (…, H // sy, W // sx) output
+        subsampling: (sx, sy) factors, each 1 or 2; an axis kept at full
+            resolution is not resampled
+
+    Returns:
+        Downsampled plane with the dtype of ``plane``; ``plane`` itself for
+        4:4:4 without ``out``
+    """
+    sx, sy = subsampling
+    if (sx, sy) == (1, 1) and out is None:
+        return plane
+    h_siting, v_siting = SITINGS[siting]
+    lead = plane.shape[:-2]
+    h, w = plane.shape[-2:]
+    if out is None:
+        out = np.empty((*lead, h // sy, w // sx), dtype=plane.dtype)
+
+    if sx == 1:
+        narrow = plane
+    else:
+        narrow = out if sy == 1 else np.empty((*lead, h, w // 2), plane.dtype)
+        _downsample_axis(plane, narrow, -1, h_siting, filter)
+    if sy == 1:
+        if narrow is not out:
+            out[...] = narrow
+        return out
+    return _downsample_axis(narrow, out, -2, v_siting, filter)
+
+
+def upsample_chroma(
+    u: np.ndarray,
+    v: np.ndarray,
+    width: int,
+    height: int,
+    filter: str = "bilinear",
+    siting: str = "left",
+    out=None,
+    subsampling: tuple = (2, 2),
+):
+    """Upsample chroma from 4:2:0 (or 4:2:2, see ``subsampling``) to 4:4:4.
+
+    Accepts (H, W) planes or batched (N, H, W) planes. ``out`` is an optional
+    pair of preallocated output planes.
+    """
+    u_out, v_out = out if out is not None else (None, None)
+    u_up = upsample_plane(u, width, height, filter, siting, u_out, subsampling)
+    v_up = upsample_plane(v, width, height, filter, siting, v_out, subsampling)
     return u_up, v_up
 
 
-def downsample_chroma(u: np.ndarray, v: np.ndarray):
-    """Downsample chroma from 4:4:4 to 4:2:0."""
-    h, w = u.shape[:2]
-    u_down = cv2.resize(u, (w // 2, h // 2), interpolation=cv2.INTER_LINEAR)
-    v_down = cv2.resize(v, (w // 2, h // 2), interpolation=cv2.INTER_LINEAR)
+def downsample_chroma(
+    u: np.ndarray,
+    v: np.ndarray,
+    filter: str = "bilinear",
+    siting: str = "left",
+    out=None,
+    subsampling: tuple = (2, 2),
+):
+    """Downsample chroma from 4:4:4 to 4:2:0 (or 4:2:2, see ``subsampling``).
+
+    Accepts (H, W) planes or batched (N, H, W) planes. ``out`` is an optional
+    pair of preallocated output planes.
+    """
+    u_out, v_out = out if out is not None else (None, None)
+    u_down = downsample_plane(u, filter, siting, u_out, subsampling)
+    v_down = downsample_plane(v, filter, siting, v_out, subsampling)
     return u_down, v_down
+
+
+def resize_chroma(
+    u: np.ndarray,
+    v: np.ndarray,
+    width: int,
+    height: int,
+    filter: str = "bilinear",
+    siting: str = "left",
+    subsampling: tuple = (2, 2),
+):
+    """Resize chroma planes for a ``width`` x ``height`` luma plane.
+
+    Accepts (H, W) planes or batched (N, H, W) planes.
+    """
+    sx, sy = subsampling
+    size = (width // sx, height // sy)
+    u_out = resize_plane(u, *size, filter, siting, subsampling=subsampling)
+    v_out = resize_plane(v, *size, filter, siting, subsampling=subsampling)
+    return u_out, v_out
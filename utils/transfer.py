@@ -1,7 +1,35 @@
+import math
+
 import numpy as np
 
+# Every curve accepts ``out=`` (which may be the input array itself) and keeps
+# float32 input in float32. Piecewise curves are evaluated branch-free over the
+# whole frame: each segment sees its input clamped to its own side of the knee,
+# so the other segment contributes a constant that is subtracted back out. This
+# avoids boolean gathers/scatters and masked ufuncs, which are much slower than
+# plain dense ufuncs.
+
+# BT.2100 (Table 4) PQ constants
+PQ_M1 = 2610 / 16384.0  # 0.1593017578125
+PQ_M2 = 2523 / 4096.0 * 128  # 78.84375
+PQ_C1 = 3424 / 4096.0  # 0.8359375
+PQ_C2 = 2413 / 4096.0 * 32  # 18.8515625
+PQ_C3 = 2392 / 4096.0 * 32  # 18.6875
+
+# BT.2100 (Table 5) HLG constants
+HLG_A = 0.17883277
+HLG_B = 1.0 - 4.0 * HLG_A  # 0.28466892
+HLG_C = 0.5 - HLG_A * math.log(4.0 * HLG_A)  # 0.55991073
+
 
-def eotf_sdr(v, Lw=1.0, Lb=0.0, gamma=2.40):
+def _output(x, out):
+    """Return ``out``, or a new float array shaped like ``x``."""
+    if out is None:
+        out = np.empty(np.shape(x), dtype=np.result_type(x, 1.0))
+    return out
+
+
+def eotf_sdr(v, Lw=1.0, Lb=0.0, gamma=2.40, out=None):
     """SDR -> Linear Light
 
     BT.1886 (Annex 1 Reference electro-optical transfer function)
@@ -11,11 +39,12 @@ def eotf_sdr(v, Lw=1.0, Lb=0.0, gamma=2.40):
         Lw: white luminance (normalized, default 1.0, originally 100.0 cd/m² in BT.1886)
         Lb: black luminance (normalized, default 0.0, originally 0.1 cd/m² in BT.1886)
         gamma: power exponent (2.4)
+        out: optional output array (may be ``v``)
 
     Returns:
         Linear light [0-1]
     """
-    v = np.clip(v, 0, 1)
+    out = _output(v, out)
 
     Lw_g = Lw ** (1 / gamma)
     Lb_g = Lb ** (1 / gamma)
@@ -23,115 +52,155 @@ def eotf_sdr(v, Lw=1.0, Lb=0.0, gamma=2.40):
     a = (Lw_g - Lb_g) ** gamma
     b = Lb_g / (Lw_g - Lb_g)
 
-    L = a * np.maximum(v + b, 0) ** gamma
-    return L
+    np.clip(v, 0, 1, out=out)
+    if b:
+        out += b
+    np.power(out, gamma, out=out)
+    if a != 1.0:
+        out *= a
+    return out
 
 
-def eotf_pq(v):
+def eotf_pq(v, out=None):
     """PQ Signal -> Linear Light
 
     BT.2100 (Table 4)
 
     Parameters:
         v: normalized video signal [0-1]
+        out: optional output array (may be ``v``)
 
     Returns:
         Linear light [0-1] (where 1.0 = 10000 nits)
     """
-    m1 = 2610 / 16384.0  # 0.1593017578125
-    m2 = 2523 / 4096.0 * 128  # 78.84375
-    c1 = 3424 / 4096.0  # 0.8359375
-    c2 = 2413 / 4096.0 * 32  # 18.8515625
-    c3 = 2392 / 4096.0 * 32  # 18.6875
+    out = _output(v, out)
 
-    v = np.clip(v, 0, 1)
-    v_p = np.maximum(v ** (1.0 / m2) - c1, 0)
-    denom = c2 - c3 * v ** (1.0 / m2)
-    L = (v_p / denom) ** (1.0 / m1)
+    np.clip(v, 0, 1, out=out)
+    np.power(out, 1.0 / PQ_M2, out=out)
+    num = np.subtract(out, PQ_C1)
+    np.maximum(num, 0, out=num)
+    # denom = c2 - c3 * v^(1/m2), always >= c2 - c3 > 0
+    out *= -PQ_C3
+    out += PQ_C2
+    np.divide(num, out, out=out)
+    np.power(out, 1.0 / PQ_M1, out=out)
 
-    return np.clip(L, 0, 1)
+    return np.clip(out, 0, 1, out=out)
 
 
-def eotf_hlg(v):
+def eotf_hlg(v, out=None):
     """HLG Signal -> Linear Light
 
     BT.2100 (Table 5)
 
     Parameters:
         v: normalized video signal [0-1]
+        out: optional output array (may be ``v``)
 
     Returns:
         Linear light [0-1] (where 1.0 = 1000 nits nominal)
     """
-    a = 0.17883277
-    b = 1 - 4 * a
-    c = 0.5 - a * np.log(4 * a)
-
-    v = np.clip(v, 0, 1)
-    L = np.where(v <= 0.5, (v**2) / 3.0, (np.exp((v - c) / a) + b) / 12.0)
-    return np.clip(L, 0, 1)
-
-
-def oetf_sdr(L):
+    out = _output(v, out)
+
+    # E' > 1/2: (exp((E' - c) / a) + b) / 12, on max(E', 1/2)
+    high = np.clip(v, 0.5, 1)
+    high -= HLG_C
+    high *= 1.0 / HLG_A
+    np.exp(high, out=high)
+    # 0 <= E' <= 1/2: E'^2 / 3, on min(E', 1/2)
+    np.clip(v, 0, 0.5, out=out)
+    np.square(out, out=out)
+    out *= 1.0 / 3.0
+    # At the knee exp((1/2 - c) / a) = 4a, so the high term adds 4a / 12 below
+    # it; (exp + b) / 12 = exp / 12 + 1/12 - 4a / 12 above it
+    high *= 1.0 / 12.0
+    out += high
+    out -= HLG_A / 3.0
+
+    return np.clip(out, 0, 1, out=out)
+
+
+def oetf_sdr(L, out=None):
     """Linear Light -> SDR Signal
 
     BT.709 (1 Opto-electronic conversion)
 
     Parameters:
         L: linear light [0-1]
+        out: optional output array (may be ``L``)
 
     Returns:
         Video signal [0-1]
     """
-    L = np.clip(L, 0, 1)
-    return np.where(L < 0.018, 4.5 * L, 1.099 * (L**0.45) - 0.099)
-
-
-def oetf_pq(L):
+    out = _output(L, out)
+
+    # The two BT.709 segments don't quite meet at the knee, so blend on the
+    # mask instead of summing clamped segments
+    low = np.less(L, 0.018)
+    # L >= 0.018: 1.099 * L^0.45 - 0.099
+    np.clip(L, 0, 1, out=out)
+    linear = out * 4.5
+    np.power(out, 0.45, out=out)
+    out *= 1.099
+    out -= 0.099
+    # L < 0.018: 4.5 * L
+    linear -= out
+    linear *= low
+    out += linear
+    return out
+
+
+def oetf_pq(L, out=None):
     """Linear Light -> PQ Signal
 
     BT.2100 (Table 4)
 
     Parameters:
         L: linear light [0-1] (where 1.0 = 10000 nits)
+        out: optional output array (may be ``L``)
 
     Returns:
         Video signal [0-1]
     """
-    m1 = 2610 / 16384.0  # 0.1593017578125
-    m2 = 2523 / 4096.0 * 128  # 78.84375
-    c1 = 3424 / 4096.0  # 0.8359375
-    c2 = 2413 / 4096.0 * 32  # 18.8515625
-    c3 = 2392 / 4096.0 * 32  # 18.6875
+    out = _output(L, out)
 
-    L = np.clip(L, 0, 1)
-    L_p = L**m1
-    return ((c1 + c2 * L_p) / (1 + c3 * L_p)) ** m2
+    np.clip(L, 0, 1, out=out)
+    np.power(out, PQ_M1, out=out)
+    # ((c1 + c2 * L^m1) / (1 + c3 * L^m1)) ^ m2
+    denom = np.multiply(out, PQ_C3)
+    denom += 1.0
+    out *= PQ_C2
+    out += PQ_C1
+    out /= denom
+    return np.power(out, PQ_M2, out=out)
 
 
-def oetf_hlg(L):
+def oetf_hlg(L, out=None):
     """Linear Light -> HLG Signal
 
     BT.2100 (Table 5)
 
     Parameters:
         L: linear light [0-1] (where 1.0 = 1000 nits nominal)
+        out: optional output array (may be ``L``)
 
     Returns:
         Video signal [0-1]
     """
-    a = 0.17883277
-    b = 1.0 - (4.0 * a)  # 0.28466892
-    c = 0.5 - a * np.log(4.0 * a)  # 0.55991073
-
-    hlg_out = np.zeros_like(L)
-
-    # 0 <= E <= 1/12
-    mask_low = L <= (1.0 / 12.0)
-    hlg_out[mask_low] = np.sqrt(3.0 * L[mask_low])
-    # E > 1/12
-    mask_high = ~mask_low
-    val_high = np.maximum(L[mask_high], 1e-9)
-    hlg_out[mask_high] = a * np.log(12.0 * val_high - b) + c
-
-    return hlg_out
+    out = _output(L, out)
+
+    # E > 1/12: a * ln(12E - b) + c - 1/2, on max(E, 1/12)
+    high = np.maximum(L, 1.0 / 12.0)
+    high *= 12.0
+    high -= HLG_B
+    np.log(high, out=high)
+    high *= HLG_A
+    # 0 <= E <= 1/12: sqrt(3E), on min(E, 1/12)
+    np.clip(L, 0, 1.0 / 12.0, out=out)
+    out *= 3.0
+    np.sqrt(out, out=out)
+    # Both segments are 1/2 at the knee, where the log term is exactly 1/2 - c
+    out += high
+    out += HLG_C - 0.5
+
+    return out
@@ -1,6 +1,7 @@
-import cv2
 import numpy as np
 
+from .sample import downsample_chroma
+
 
 def yuv_to_rgb_rec709(y, u, v):
     """
@@ -45,8 +46,6 @@ def rgb_to_yuv_rec2020_limited(rgb_hlg):
     Converts RGB to YUV using Rec. 2020-2 Table 4 Rec. 2100-3 Table 6 NCL Matrix (for HDR/HLG).
     Output is 10-bit Limited Range (64-940 for Y, 64-960 for UV in 10-bit scale).
     """
-    height, width, _ = rgb_hlg.shape
-
     # Rec. 2020 Coefficients
     Kr = 0.2627
     Kb = 0.0593
@@ -75,12 +74,11 @@ def rgb_to_yuv_rec2020_limited(rgb_hlg):
     cr_final = np.clip(cr_10, 0, 1023).astype(np.uint16)
 
     # Resize Chroma (4:4:4 -> 4:2:0)
-    cb_half = cv2.resize(
-        cb_final, (width // 2, height // 2), interpolation=cv2.INTER_LINEAR
-    )
-    cr_half = cv2.resize(
-        cr_final, (width // 2, height // 2), interpolation=cv2.INTER_LINEAR
+    cb_half, cr_half = downsample_chroma(
+        cb_final.astype(np.float32), cr_final.astype(np.float32)
     )
+    cb_half = np.round(cb_half).astype(np.uint16)
+    cr_half = np.round(cr_half).astype(np.uint16)
 
     return y_final, cb_half, cr_half
 
@@ -90,8 +88,6 @@ def rgb_to_yuv420_limited(rgb_gamma):
     Converts Gamma-Encoded RGB to YUV420p (Limited Range/TV).
     Implements m=bt709, r=tv, and format=yuv420p.
     """
-    height, width, _ = rgb_gamma.shape
-
     # --- 1. Matrix Conversion (m=bt709) ---
     # Coefficients for Rec.709-6 Table 3
     Kr = 0.2126
@@ -126,13 +122,12 @@ def rgb_to_yuv420_limited(rgb_gamma):
     # --- 3. Chroma Subsampling (format=yuv420p) ---
     # 4:2:0 means Chroma is half resolution of Luma.
     # We resize Cb and Cr to half width and half height.
-    # INTER_LINEAR is standard for downscaling.
+    # Bilinear with left chroma siting is standard for downscaling.
 
-    cb_half = cv2.resize(
-        cb_final, (width // 2, height // 2), interpolation=cv2.INTER_LINEAR
-    )
-    cr_half = cv2.resize(
-        cr_final, (width // 2, height // 2), interpolation=cv2.INTER_LINEAR
+    cb_half, cr_half = downsample_chroma(
+        cb_final.astype(np.float32), cr_final.astype(np.float32)
     )
+    cb_half = np.round(cb_half).astype(np.uint8)
+    cr_half = np.round(cr_half).astype(np.uint8)
 
     return y_final, cb_half, cr_half